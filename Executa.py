@@ -1,17 +1,20 @@
-import pandas as pd
-import numpy as np
-import requests
+# Apenas módulos leves no topo: pandas, requests e as bibliotecas de gráficos
+# são carregados pelos módulos de cada etapa, quando a etapa é executada
 import json
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import importlib
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from instrumentacao import etapa, configurar_instrumentacao, gravar_relatorio
 
-def main():
+def main(forcar=False, output_dir='output'):
     """Script principal para executar todo o processo de extração e caracterização"""
     print("Iniciando processo de extração e caracterização de dados governamentais")
     
     # 1. Criar pasta de saída
-    output_dir = 'output'
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
@@ -30,38 +33,18 @@ def main():
         choice = 2
         print(f"Opção selecionada (padrão): {choice}")
     
-    # Extrair o dataset escolhido
-    df = None
-    dataset_name = ""
-    
-    if choice == 1:
-        df = extrair_dados_ibge_demograficos()
-        dataset_name = "demografia"
-    elif choice == 2:
-        df = extrair_pib_municipios()
-        dataset_name = "pib_municipios"
-    elif choice == 3:
-        df = extrair_dados_servidores()
-        dataset_name = "servidores"
-    elif choice == 4:
-        df = extrair_dados_bcb()
-        dataset_name = "taxa_selic"
-    elif choice == 5:
-        df = extrair_dados_covid()
-        dataset_name = "covid19"
-    else:
+    # Extrair o dataset escolhido (só o módulo do extrator escolhido é importado)
+    opcoes = {1: 'demografia', 2: 'pib_municipios', 3: 'servidores', 4: 'taxa_selic', 5: 'covid19'}
+    if choice not in opcoes:
         print("Opção inválida! Usando PIB Municipal como padrão.")
-        df = extrair_pib_municipios()
-        dataset_name = "pib_municipios"
+    dataset_name = opcoes.get(choice, 'pib_municipios')
+    df, _ = extrair_dataset(dataset_name)
     
     # 3. Caracterizar o dataset
+    # 4. Criar modelo de dashboard (etapas com os mesmos dados da última execução são puladas)
     if df is not None:
-        print(f"\nCaracterizando dataset: {dataset_name}")
-        info = caracterizar_dataset(df, dataset_name, pasta_output=output_dir)
-        
-        # 4. Criar modelo de dashboard
-        print("\nCriando modelo de dashboard para Power BI")
-        modelo = criar_modelo_power_bi(pasta_input=output_dir, nome_dataset=dataset_name)
+        print(f"\nCaracterizando dataset e criando modelo de dashboard: {dataset_name}")
+        processar_dataset(df, dataset_name, output_dir, max_processos=None, forcar=forcar)
         
         print("\nProcesso completo!")
         print(f"Arquivos gerados na pasta: {output_dir}")
@@ -69,21 +52,267 @@ def main():
         
         print("\nPara criar o dashboard no Power BI:")
         print("1. Abra o Power BI Desktop")
-        print("2. Clique em 'Obter Dados' > 'Arquivo' > 'Excel' ou 'CSV'")
-        print(f"3. Navegue até a pasta {output_dir} e selecione o arquivo {dataset_name}_para_bi.xlsx ou {dataset_name}_para_bi.csv")
+        print("2. Clique em 'Obter Dados' > 'Arquivo' > 'Parquet' ou 'Texto/CSV'")
+        print(f"3. Navegue até a pasta {output_dir} e selecione o arquivo {dataset_name}_para_bi.parquet ou {dataset_name}_para_bi.csv")
         print("4. Carregue os dados no Power BI")
         print("5. Crie as visualizações conforme o modelo sugerido")
     else:
         print("Erro: Não foi possível extrair o dataset selecionado.")
 
-if __name__ == "__main__":
-    # Importar as funções definidas anteriormente
-    from extrai_dados_ibge import extrair_dados_ibge_demograficos, extrair_pib_municipios
-    from extrai_transparencia import extrair_dados_servidores
-    from extrai_bcb import extrair_dados_bcb
-    from extrai_covid import extrair_dados_covid
+# Extratores disponíveis no modo em lote: nome do dataset -> (módulo, função)
+EXTRATORES = {
+    'demografia': ('extrai_dados_ibge', 'extrair_dados_ibge_demograficos'),
+    'pib_municipios': ('extrai_dados_ibge', 'extrair_pib_municipios'),
+    'indicadores_ibge': ('extrai_dados_ibge', 'extrair_indicadores_ibge'),
+    'servidores': ('extrai_transparencia', 'extrair_dados_servidores'),
+    'taxa_selic': ('extrai_bcb', 'extrair_dados_bcb'),
+    'covid19': ('extrai_covid', 'extrair_dados_covid')
+}
+# Extratores que aceitam carregar=False: publicam o dataset no lago sem montar o DataFrame
+EXTRATORES_SO_LAGO = {'pib_municipios'}
+
+# Códigos de saída para agendadores (cron, Airflow...)
+SAIDA_SUCESSO = 0
+SAIDA_FALHA_PARCIAL = 1
+SAIDA_FALHA_TOTAL = 2
+
+def extrair_dataset(nome_dataset, compactar=True, carregar=True):
+    """
+    Executa o extrator de um dataset e compacta os tipos do resultado (se compactar)
+
+    Retorna (DataFrame, tempos), com os segundos gastos na extração e na compactação.
+    Com carregar=False, os extratores de EXTRATORES_SO_LAGO que publicam o dataset no
+    lago retornam a entrada dele no catálogo (dict) no lugar do DataFrame.
+    """
+    modulo, funcao = EXTRATORES[nome_dataset]
+    extrator = getattr(importlib.import_module(modulo), funcao)
+    parametros = {'carregar': False} if not carregar and nome_dataset in EXTRATORES_SO_LAGO else {}
+    tempos = {}
+    with etapa('extracao', dataset=nome_dataset) as medicao:
+        df = extrator(**parametros)
+        if isinstance(df, dict):
+            medicao.registrar(linhas=df['num_registros'])
+        elif df is not None:
+            medicao.registrar(linhas=len(df))
+    tempos['extracao'] = medicao.segundos
+
+    if df is not None and not isinstance(df, dict) and compactar:
+        df, tempos['compactacao'] = compactar_dataset(df, nome_dataset)
+    return df, tempos
+
+def compactar_dataset(df, nome_dataset):
+    """Compacta os tipos do DataFrame; retorna (DataFrame, segundos)"""
+    from otimiza_tipos import compactar_tipos
+    with etapa('compactacao', dataset=nome_dataset) as medicao:
+        df, _ = compactar_tipos(df)
+        medicao.registrar(linhas=len(df))
+    return df, medicao.segundos
+
+def publicado_no_lago(nome_dataset, df, entrada_anterior):
+    """Se a extração que retornou df acabou de gravar o dataset no lago (a entrada do catálogo mudou)"""
+    from armazena_dados import ler_catalogo
+    entrada = ler_catalogo().get(nome_dataset)
+    return (entrada is not None and entrada != entrada_anterior and entrada['num_registros'] == len(df)
+            and list(entrada['colunas']) == [str(col) for col in df.columns])
+
+def processar_dataset(df, nome_dataset, pasta_output, max_processos=1, forcar=False, compactar=False):
+    """
+    Caracteriza o dataset e cria o modelo de dashboard, retornando o tempo de cada etapa
+
+    Com df None, o dataset é lido do armazenamento colunar (armazena_dados.ler_dataset)
+    e tem os tipos compactados; com compactar, o df recebido é compactado antes.
+
+    A impressão digital do DataFrame é calculada uma vez; etapas cujos dados e
+    parâmetros não mudaram desde a última execução são puladas (forcar refaz todas).
+    Datasets de COVID-19 também geram as métricas epidemiológicas por local e dia
+    (calcula_metricas_covid), caracterizadas e exportadas como {nome}_metricas.
+    No modo em lote os gráficos são renderizados em série (max_processos=1): o
+    paralelismo fica entre os datasets.
+    """
     from caracteriza_dataset import caracterizar_dataset
     from cria_dashboard import criar_modelo_power_bi
-    
+    from pipeline_incremental import hashes_linhas, impressao_digital, caminho_manifesto, executar_grafo
+    from calcula_metricas_covid import esquema_covid, metricas_covid_incrementais
+
+    tempos = {}
+    if df is None:
+        from armazena_dados import ler_dataset
+        with etapa('leitura_lago', dataset=nome_dataset) as medicao:
+            df = ler_dataset(nome_dataset)
+            medicao.registrar(linhas=len(df))
+        tempos['leitura_lago'] = medicao.segundos
+        compactar = True
+    if compactar:
+        df, tempos['compactacao'] = compactar_dataset(df, nome_dataset)
+
+    with etapa('impressao_digital', dataset=nome_dataset) as medicao:
+        hashes = hashes_linhas(df)
+        impressao = impressao_digital(df, hashes)
+        medicao.registrar(linhas=len(df))
+    tempos['impressao_digital'] = medicao.segundos
+
+    with etapa('caracterizacao', dataset=nome_dataset) as medicao:
+        caracterizar_dataset(df, nome_dataset, pasta_output=pasta_output, max_processos=max_processos,
+                             forcar=forcar, hashes=hashes)
+        medicao.registrar(linhas=len(df))
+    tempos['caracterizacao'] = medicao.segundos
+
+    nomes_dashboard = [nome_dataset]
+    if esquema_covid(df) is not None:
+        # Só as datas novas desde a última execução são calculadas
+        with etapa('metricas_covid', dataset=nome_dataset) as medicao:
+            metricas = metricas_covid_incrementais(df, os.path.join(pasta_output, f'.metricas_{nome_dataset}'),
+                                                   hashes=hashes, forcar=forcar)
+            medicao.registrar(linhas=len(metricas))
+        tempos['metricas'] = medicao.segundos
+
+        nome_metricas = f'{nome_dataset}_metricas'
+        with etapa('caracterizacao', dataset=nome_metricas) as medicao:
+            caracterizar_dataset(metricas, nome_metricas, pasta_output=pasta_output, max_processos=max_processos,
+                                 forcar=forcar)
+            medicao.registrar(linhas=len(metricas))
+        tempos['caracterizacao_metricas'] = medicao.segundos
+        nomes_dashboard.append(nome_metricas)
+
+    def etapa_dashboard(df):
+        return [criar_modelo_power_bi(pasta_input=pasta_output, nome_dataset=nome) for nome in nomes_dashboard]
+
+    with etapa('dashboard', dataset=nome_dataset) as medicao:
+        executar_grafo({'dashboard': {'funcao': etapa_dashboard, 'depende_de': ['df'], 'gera_arquivos': True,
+                                      'parametros': nomes_dashboard}},
+                       {'df': df}, caminho_manifesto(pasta_output, nome_dataset),
+                       impressoes={'df': impressao}, forcar=forcar)
+    tempos['dashboard'] = medicao.segundos
+    return tempos
+
+def _contexto_processos():
+    # Processos iniciados sem fork: um fork durante as extrações copiaria travas seguradas pelas
+    # threads (instrumentacao, catálogo do lago, cliente HTTP) e o processo filho poderia travar
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+
+def executar_lote(datasets, pasta_output='output', max_workers=None, forcar=False):
+    """
+    Processa vários datasets sem interação
+
+    As extrações (limitadas por E/S de rede) rodam em paralelo em threads; cada
+    dataset extraído segue para caracterização e criação do dashboard em um pool
+    de processos (iniciados por forkserver ou spawn, nunca por fork, porque as
+    threads de extração continuam rodando). Datasets que a extração gravou no lago
+    são lidos de lá pelo processo de caracterização, em vez de serializados para
+    ele, e os de EXTRATORES_SO_LAGO nem são montados na thread de extração; a
+    compactação dos tipos também roda nesse processo. Retorna o relatório com o
+    status e os tempos por etapa.
+    Com forcar, refaz todas as etapas mesmo que os dados não tenham mudado.
+    """
+    if not os.path.exists(pasta_output):
+        os.makedirs(pasta_output)
+
+    datasets = list(dict.fromkeys(datasets))
+    relatorio = {nome: {'status': 'pendente', 'tempos': {}} for nome in datasets}
+    inicio_total = time.perf_counter()
+
+    from armazena_dados import ler_catalogo
+    catalogo_anterior = ler_catalogo()
+
+    with ThreadPoolExecutor(max_workers=len(datasets)) as extracao, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=_contexto_processos()) as processamento:
+        futuros_extracao = {extracao.submit(extrair_dataset, nome, compactar=False, carregar=False): nome
+                            for nome in datasets}
+        futuros_processamento = {}
+
+        for futuro in as_completed(futuros_extracao):
+            nome = futuros_extracao[futuro]
+            try:
+                df, tempos = futuro.result()
+            except Exception as e:
+                relatorio[nome].update(status='falha', erro=f"extração: {e}")
+                continue
+            relatorio[nome]['tempos'].update(tempos)
+            if df is None:
+                relatorio[nome].update(status='falha', erro="extração não retornou dados")
+                continue
+            # Publicado no lago (ou só publicado, sem DataFrame): o processo de caracterização lê de lá
+            if isinstance(df, dict) or publicado_no_lago(nome, df, catalogo_anterior.get(nome)):
+                df = None
+            futuros_processamento[processamento.submit(processar_dataset, df, nome, pasta_output,
+                                                        forcar=forcar, compactar=True)] = nome
+
+        for futuro in as_completed(futuros_processamento):
+            nome = futuros_processamento[futuro]
+            try:
+                relatorio[nome]['tempos'].update(futuro.result())
+                relatorio[nome]['status'] = 'sucesso'
+            except Exception as e:
+                relatorio[nome].update(status='falha', erro=f"processamento: {e}")
+
+    relatorio = {'datasets': relatorio, 'tempo_total': time.perf_counter() - inicio_total}
+    with open(os.path.join(pasta_output, 'relatorio_execucao.json'), 'w') as f:
+        json.dump(relatorio, f, indent=4)
+    return relatorio
+
+def imprimir_relatorio(relatorio):
+    """Mostra o status e os tempos por etapa de cada dataset"""
+    print("\n** Relatório da execução em lote **")
+    for nome, resultado in relatorio['datasets'].items():
+        tempos = ', '.join(f"{etapa}: {segundos:.1f}s" for etapa, segundos in resultado['tempos'].items())
+        linha = f"{nome}: {resultado['status']}"
+        if tempos:
+            linha += f" ({tempos})"
+        if 'erro' in resultado:
+            linha += f" - {resultado['erro']}"
+        print(linha)
+    print(f"Tempo total: {relatorio['tempo_total']:.1f}s")
+
+def codigo_saida(relatorio):
+    """0 se todos os datasets foram processados, 1 se alguns falharam, 2 se todos falharam"""
+    status = [resultado['status'] for resultado in relatorio['datasets'].values()]
+    if all(s == 'sucesso' for s in status):
+        return SAIDA_SUCESSO
+    if any(s == 'sucesso' for s in status):
+        return SAIDA_FALHA_PARCIAL
+    return SAIDA_FALHA_TOTAL
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extração e caracterização de dados governamentais. Sem --datasets, roda no modo interativo.")
+    parser.add_argument('--datasets', nargs='+', metavar='DATASET',
+                        help=f"Datasets a processar ({', '.join(EXTRATORES)}) ou 'all'")
+    parser.add_argument('--output-dir', default='output', help="Pasta de saída (padrão: output)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processos para caracterização (padrão: número de CPUs)")
+    parser.add_argument('--perfilar', nargs='+', default=[], metavar='ETAPA',
+                        help="Etapas a perfilar (por exemplo parse grafico exportacao, ou '*' para todas)")
+    parser.add_argument('--perfilador', choices=['cprofile', 'pyinstrument'], default='cprofile',
+                        help="Perfilador usado com --perfilar (padrão: cprofile)")
+    parser.add_argument('--forcar', action='store_true',
+                        help="Refaz todas as etapas, mesmo as que não mudaram desde a última execução")
+    args = parser.parse_args(argv)
+
+    if args.datasets:
+        if 'all' in args.datasets:
+            args.datasets = list(EXTRATORES)
+        # Nomes repetidos rodariam o mesmo dataset duas vezes na mesma pasta; mantém a ordem pedida
+        args.datasets = list(dict.fromkeys(args.datasets))
+        invalidos = [nome for nome in args.datasets if nome not in EXTRATORES]
+        if invalidos:
+            parser.error(f"Datasets desconhecidos: {', '.join(invalidos)}")
+    return args
+
+if __name__ == "__main__":
+    args = ler_argumentos()
+
+    # Métricas de cada etapa em <output>/metricas_execucao.jsonl, resumidas em relatorio_etapas.json
+    configurar_instrumentacao(args.output_dir, perfilar=args.perfilar, perfilador=args.perfilador)
+
+    if args.datasets:
+        # Modo em lote, não interativo
+        relatorio = executar_lote(args.datasets, pasta_output=args.output_dir, max_workers=args.workers,
+                                  forcar=args.forcar)
+        imprimir_relatorio(relatorio)
+        gravar_relatorio(args.output_dir)
+        sys.exit(codigo_saida(relatorio))
+
     # Executar script principal
-    main() 
\ No newline at end of file
+    main(forcar=args.forcar, output_dir=args.output_dir)
+    gravar_relatorio(args.output_dir) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+import pandas as pd
+
+def converter_datas(serie):
+    """Converte a coluna para datetime uma única vez (sem alterar o DataFrame de origem)"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, errors='coerce')
+
+def analisar_coluna_data(df, col_data, colunas_numericas):
+    """
+    Agregações temporais de uma coluna de data em um único groupby mensal
+
+    Retorna um dict com:
+    contagem_ano (DataFrame ano, contagem)
+    contagem_mes (DataFrame mes, contagem) do último ano
+    medias_mensais (DataFrame) com a média mensal de cada coluna numérica,
+        indexada pelo fim do mês e com os meses sem registros como NaN, como em resample('ME')
+    """
+    datas = converter_datas(df[col_data])
+    periodos = datas.dt.to_period('M')
+
+    # Contagem de registros e médias de todas as colunas numéricas por mês, de uma vez
+    agrupado = df[list(colunas_numericas)].groupby(periodos)
+    contagem_periodo = agrupado.size()
+    medias = agrupado.mean()
+
+    if len(contagem_periodo) == 0:
+        raise ValueError("coluna sem datas válidas")
+
+    anos = contagem_periodo.index.year
+    contagem_ano = contagem_periodo.groupby(anos).sum()
+    contagem_ano = contagem_ano.rename_axis('ano').reset_index(name='contagem')
+
+    ultimo_ano = anos.max()
+    contagem_mes = contagem_periodo[anos == ultimo_ano]
+    contagem_mes.index = contagem_mes.index.month
+    contagem_mes = contagem_mes.rename_axis('mes').reset_index(name='contagem')
+
+    todos_meses = pd.period_range(contagem_periodo.index.min(), contagem_periodo.index.max(), freq='M')
+    medias = medias.reindex(todos_meses)
+    medias.index = medias.index.to_timestamp(how='end').normalize()
+    medias.index.name = col_data
+
+    return {
+        'contagem_ano': contagem_ano,
+        'contagem_mes': contagem_mes,
+        'medias_mensais': medias
+    }
+
+def analisar_temporal(df, colunas_data, colunas_numericas):
+    """
+    Analisa todas as colunas de data sem copiar nem modificar o DataFrame
+
+    Retorna um dict coluna -> resultado de analisar_coluna_data; colunas que
+    não puderem ser analisadas ficam de fora, com o erro impresso.
+    """
+    resultados = {}
+    for col_data in colunas_data:
+        try:
+            resultados[col_data] = analisar_coluna_data(df, col_data, colunas_numericas)
+        except Exception as e:
+            print(f"Erro na análise temporal da coluna {col_data}: {e}")
+    return resultados
+
+def sufixo_coluna_data(col_data, colunas_data):
+    """A primeira coluna de data mantém os nomes de arquivo originais; as demais recebem o nome da coluna"""
+    return '' if col_data == colunas_data[0] else f'_{col_data}'
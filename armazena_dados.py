@@ -0,0 +1,240 @@
+import pandas as pd
+import json
+import os
+import shutil
+import threading
+import time
+from urllib.parse import quote
+from instrumentacao import etapa
+
+# Armazenamento colunar local compartilhado pelos extratores
+PASTA_LAGO = 'lago_dados'
+ARQUIVO_CATALOGO = 'catalogo.json'
+
+# Extratores rodam em threads no modo em lote; o catálogo é atualizado um de cada vez
+_trava_catalogo = threading.Lock()
+
+# Colunas de partição de cada dataset (chaves naturais usadas nos filtros)
+PARTICOES_PADRAO = {
+    'pib_municipios': ['ano'],
+    'indicadores_ibge': ['ano'],
+    'covid19': ['state'],
+    'servidores': ['orgao'],
+    'taxa_selic': ['ano'],
+    'series_bcb': ['serie'],
+    'demografia': []
+}
+
+def ler_catalogo(pasta_lago=PASTA_LAGO):
+    """Lê o catálogo com colunas, tipos, partições e tamanho de cada dataset gravado"""
+    caminho = os.path.join(pasta_lago, ARQUIVO_CATALOGO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho) as f:
+        return json.load(f)
+
+def tamanho_pasta(caminho):
+    """Soma do tamanho dos arquivos de um dataset gravado"""
+    return sum(os.path.getsize(os.path.join(raiz, arquivo))
+               for raiz, _, arquivos in os.walk(caminho) for arquivo in arquivos)
+
+def _gravar_catalogo(catalogo, pasta_lago):
+    caminho_tmp = os.path.join(pasta_lago, ARQUIVO_CATALOGO + '.tmp')
+    with open(caminho_tmp, 'w') as f:
+        json.dump(catalogo, f, indent=4)
+    os.replace(caminho_tmp, os.path.join(pasta_lago, ARQUIVO_CATALOGO))
+
+def _publicar_dataset(nome_dataset, particoes, pasta_lago, escrever, colunas):
+    # Grava numa pasta temporária e troca no final, para leitores nunca verem um dataset pela metade;
+    # escrever(destino, particoes) grava os dados e retorna o número de registros
+    caminho = os.path.join(pasta_lago, nome_dataset)
+    caminho_tmp = caminho + '.tmp'
+    if os.path.exists(caminho_tmp):
+        shutil.rmtree(caminho_tmp)
+
+    with etapa('gravar_dataset', dataset=nome_dataset) as medicao:
+        try:
+            if particoes:
+                num_registros = escrever(caminho_tmp, particoes)
+            else:
+                os.makedirs(caminho_tmp)
+                num_registros = escrever(os.path.join(caminho_tmp, 'dados.parquet'), particoes)
+        except BaseException:
+            shutil.rmtree(caminho_tmp, ignore_errors=True)
+            raise
+        if os.path.exists(caminho):
+            shutil.rmtree(caminho)
+        os.replace(caminho_tmp, caminho)
+        medicao.registrar(linhas=num_registros, bytes_saida=tamanho_pasta(caminho))
+
+    with _trava_catalogo:
+        catalogo = ler_catalogo(pasta_lago)
+        catalogo[nome_dataset] = {
+            'caminho': nome_dataset,
+            'particoes': particoes,
+            'colunas': colunas,
+            'num_registros': num_registros,
+            'atualizado_em': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        _gravar_catalogo(catalogo, pasta_lago)
+    print(f"Dataset '{nome_dataset}' gravado em '{caminho}' ({num_registros} registros)")
+    return caminho
+
+def gravar_dataset(df, nome_dataset, particoes=None, pasta_lago=PASTA_LAGO):
+    """
+    Grava o dataset como Parquet particionado (hive: coluna=valor/) e atualiza o catálogo
+
+    Parâmetros:
+    df (DataFrame): Dados extraídos
+    nome_dataset (str): Nome do dataset no lago
+    particoes (list): Colunas de partição (padrão: PARTICOES_PADRAO do dataset)
+    pasta_lago (str): Pasta raiz do armazenamento
+    """
+    if particoes is None:
+        particoes = PARTICOES_PADRAO.get(nome_dataset, [])
+    particoes = [col for col in particoes if col in df.columns]
+
+    def escrever(destino, particoes):
+        df.to_parquet(destino, partition_cols=particoes or None, index=False)
+        return len(df)
+
+    colunas = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    return _publicar_dataset(nome_dataset, particoes, pasta_lago, escrever, colunas)
+
+def gravar_blocos_dataset(blocos, nome_dataset, particoes=None, pasta_lago=PASTA_LAGO):
+    """
+    Grava no lago um dataset recebido em blocos de DataFrame (por exemplo, decodificado em streaming)
+
+    Cada bloco é gravado assim que chega, com os tipos do primeiro bloco: a memória
+    fica limitada a um bloco, sem montar o DataFrame completo. Um bloco que não
+    pode ser convertido para esses tipos levanta ValueError e nada é publicado.
+    Sem nenhum bloco, grava um dataset vazio.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    blocos = iter(blocos)
+    primeiro = next(blocos, None)
+    if primeiro is None:
+        return gravar_dataset(pd.DataFrame(), nome_dataset, particoes, pasta_lago)
+    if particoes is None:
+        particoes = PARTICOES_PADRAO.get(nome_dataset, [])
+    particoes = [col for col in particoes if col in primeiro.columns]
+    esquema = pa.Schema.from_pandas(primeiro.drop(columns=particoes), preserve_index=False).remove_metadata()
+
+    def escrever(destino, particoes):
+        # Um arquivo por partição (ou um só, sem partições), com um grupo de linhas por bloco
+        escritores = {}
+        num_registros = 0
+        try:
+            for bloco in _encadear(primeiro, blocos):
+                partes = bloco.groupby(particoes, sort=False, dropna=False) if particoes else [((), bloco)]
+                for chave, parte in partes:
+                    if particoes:
+                        chave = chave if isinstance(chave, tuple) else (chave,)
+                        pasta = os.path.join(destino, *[f'{col}={_valor_particao(valor)}'
+                                                        for col, valor in zip(particoes, chave)])
+                        caminho = os.path.join(pasta, 'dados.parquet')
+                    else:
+                        pasta, caminho = None, destino
+                    try:
+                        tabela = pa.Table.from_pandas(parte.drop(columns=particoes), schema=esquema,
+                                                      preserve_index=False)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                        raise ValueError(f"Bloco com tipos diferentes dos do primeiro bloco: {e}") from e
+                    if caminho not in escritores:
+                        if pasta is not None:
+                            os.makedirs(pasta, exist_ok=True)
+                        escritores[caminho] = pq.ParquetWriter(caminho, esquema)
+                    escritores[caminho].write_table(tabela)
+                    num_registros += tabela.num_rows
+        finally:
+            for escritor in escritores.values():
+                escritor.close()
+            # Devolve ao sistema a memória dos blocos já gravados antes de o chamador ler o dataset
+            pa.default_memory_pool().release_unused()
+        return num_registros
+
+    colunas = {col: str(dtype) for col, dtype in primeiro.dtypes.items()}
+    return _publicar_dataset(nome_dataset, particoes, pasta_lago, escrever, colunas)
+
+def gravar_e_juntar_blocos(blocos, nome_dataset, particoes=None, pasta_lago=PASTA_LAGO):
+    """
+    Grava os blocos no lago (gravar_blocos_dataset) e retorna o DataFrame com todos eles
+
+    Para chamadores que precisam do dataset completo: os blocos já decodificados são
+    mantidos e juntados no fim, sem ler de novo o que acabou de ser gravado.
+    """
+    retidos = []
+
+    def reter(blocos):
+        for bloco in blocos:
+            retidos.append(bloco)
+            yield bloco
+
+    gravar_blocos_dataset(reter(blocos), nome_dataset, particoes, pasta_lago)
+    return pd.concat(retidos, ignore_index=True) if retidos else pd.DataFrame()
+
+def _valor_particao(valor):
+    # Mesmos nomes de pasta do pyarrow: valores codificados como URI e nulos na partição padrão do hive
+    return '__HIVE_DEFAULT_PARTITION__' if pd.isna(valor) else quote(str(valor), safe='')
+
+def _encadear(primeiro, demais):
+    yield primeiro
+    yield from demais
+
+def _restaurar_esquema(df, entrada, colunas):
+    # Colunas de partição voltam do Parquet como categorias e no fim; restaurar ordem e tipo
+    ordem = [col for col in entrada['colunas'] if col in df.columns and (colunas is None or col in colunas)]
+    df = df[ordem]
+    for col in entrada['particoes']:
+        if col in df.columns:
+            try:
+                df[col] = _converter_categoria(df[col], entrada['colunas'][col])
+            except (TypeError, ValueError):
+                pass
+    return df
+
+def _converter_categoria(serie, tipo):
+    # Converte só as categorias e repete pelos códigos: converter valor a valor
+    # (astype direto) cria um objeto Python por linha
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        if len(codigos) == 0 or codigos.min() >= 0:
+            valores = serie.cat.categories.astype(tipo).array.take(codigos)
+            return pd.Series(valores, index=serie.index, name=serie.name)
+    return serie.astype(tipo)
+
+def ler_dataset(nome_dataset, colunas=None, filtros=None, pasta_lago=PASTA_LAGO):
+    """
+    Lê um dataset do lago, só com as colunas e partições pedidas
+
+    Parâmetros:
+    colunas (list): Projeção de colunas (None para todas)
+    filtros (list): Filtros no formato do pyarrow, por exemplo [('ano', '>=', 2015)]
+        ou [('state', 'in', ['SP', 'RJ'])]; filtros em colunas de partição
+        evitam a leitura das demais partições
+    """
+    catalogo = ler_catalogo(pasta_lago)
+    if nome_dataset not in catalogo:
+        raise KeyError(f"Dataset '{nome_dataset}' não encontrado em '{pasta_lago}'")
+    entrada = catalogo[nome_dataset]
+    caminho = os.path.join(pasta_lago, entrada['caminho'])
+    df = pd.read_parquet(caminho, columns=colunas, filters=filtros)
+    return _restaurar_esquema(df, entrada, colunas)
+
+def blocos_dataset(nome_dataset, colunas=None, filtros=None, linhas_por_bloco=500000, pasta_lago=PASTA_LAGO):
+    """Lê o dataset do lago em blocos de DataFrame (para caracterizar_dataset_em_blocos)"""
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    catalogo = ler_catalogo(pasta_lago)
+    if nome_dataset not in catalogo:
+        raise KeyError(f"Dataset '{nome_dataset}' não encontrado em '{pasta_lago}'")
+    entrada = catalogo[nome_dataset]
+    dataset = ds.dataset(os.path.join(pasta_lago, entrada['caminho']), format='parquet',
+                         partitioning='hive' if entrada['particoes'] else None)
+    expressao = pq.filters_to_expression(filtros) if filtros else None
+    for lote in dataset.to_batches(columns=colunas, filter=expressao, batch_size=linhas_por_bloco):
+        if lote.num_rows > 0:
+            yield _restaurar_esquema(lote.to_pandas(), entrada, colunas)
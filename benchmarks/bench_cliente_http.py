@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cliente_http
+from cliente_http import requisitar, baixar_para_arquivo
+
+TAMANHO_CORPO_GRANDE = 64 * 1024 * 1024
+LIMITE_HOST_TESTE = 2
+TIMEOUT_TESTE = (1, 0.5)
+
+class ManipuladorFalhas(BaseHTTPRequestHandler):
+    """Servidor local que injeta falhas: 503, 429 com Retry-After, lentidão e corpo cortado"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, corpo, status=200, headers=None):
+        self.send_response(status)
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        try:
+            self.wfile.write(corpo)
+        except BrokenPipeError:
+            pass  # O cliente desistiu por timeout
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        servidor = self.server
+        with servidor.trava:
+            servidor.chamadas[self.path] = servidor.chamadas.get(self.path, 0) + 1
+            chamada = servidor.chamadas[self.path]
+        falhas = int(params.get('falhas', 0))
+
+        if url.path == '/instavel':
+            if chamada <= falhas:
+                return self.responder(b'', status=503)
+            return self.responder(b'{"ok": true}')
+        if url.path == '/limite':
+            if chamada <= falhas:
+                return self.responder(b'', status=429, headers={'Retry-After': '1'})
+            return self.responder(b'{"ok": true}')
+        if url.path == '/lento':
+            if chamada <= falhas:
+                time.sleep(2)
+            return self.responder(b'{"ok": true}')
+        if url.path == '/cortado':
+            if chamada <= falhas:
+                # Promete o corpo inteiro e fecha a conexão na metade
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(servidor.corpo_grande)))
+                self.end_headers()
+                self.wfile.write(servidor.corpo_grande[:len(servidor.corpo_grande) // 2])
+                self.close_connection = True
+                return
+            return self.responder(servidor.corpo_grande)
+        if url.path == '/gzip':
+            return self.responder(gzip.compress(servidor.corpo_texto), headers={'Content-Encoding': 'gzip'})
+        if url.path == '/concorrencia':
+            with servidor.trava:
+                servidor.em_andamento += 1
+                servidor.maximo_simultaneo = max(servidor.maximo_simultaneo, servidor.em_andamento)
+            time.sleep(0.1)
+            with servidor.trava:
+                servidor.em_andamento -= 1
+            return self.responder(b'{"ok": true}')
+        self.responder(b'', status=404)
+
+def iniciar_stub():
+    """Sobe o servidor local em uma porta livre e retorna (servidor, url base)"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ManipuladorFalhas)
+    servidor.trava = threading.Lock()
+    servidor.chamadas = {}
+    servidor.em_andamento = 0
+    servidor.maximo_simultaneo = 0
+    servidor.corpo_grande = os.urandom(TAMANHO_CORPO_GRANDE)
+    servidor.corpo_texto = b'data,valor\n' + b'01/01/2024,10.50\n' * 100_000
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}'
+
+def verificar(nome, condicao, detalhe=''):
+    print(f"{'OK   ' if condicao else 'FALHA'} {nome}{f' ({detalhe})' if detalhe else ''}")
+    return condicao
+
+def main():
+    # Backoff curto para o teste não passar a maior parte do tempo dormindo
+    cliente_http.ESPERA_BASE_SEGUNDOS = 0.05
+    cliente_http.LIMITES_POR_HOST['127.0.0.1'] = LIMITE_HOST_TESTE
+    servidor, base = iniciar_stub()
+    resultados = []
+
+    response = requisitar(f'{base}/instavel', params={'falhas': 3}, timeout=TIMEOUT_TESTE)
+    resultados.append(verificar('503 repetido até o sucesso', response.status_code == 200,
+                                f"{servidor.chamadas['/instavel?falhas=3']} chamadas"))
+
+    response = requisitar(f'{base}/instavel', params={'falhas': 10}, timeout=TIMEOUT_TESTE, max_tentativas=3)
+    resultados.append(verificar('503 persistente devolvido após max_tentativas', response.status_code == 503,
+                                f"{servidor.chamadas['/instavel?falhas=10']} chamadas"))
+
+    inicio = time.perf_counter()
+    response = requisitar(f'{base}/limite', params={'falhas': 1}, timeout=TIMEOUT_TESTE)
+    espera = time.perf_counter() - inicio
+    resultados.append(verificar('429 respeita Retry-After', response.status_code == 200 and espera >= 1,
+                                f'{espera:.2f}s'))
+
+    response = requisitar(f'{base}/lento', params={'falhas': 1}, timeout=TIMEOUT_TESTE)
+    resultados.append(verificar('timeout de leitura repetido', response.status_code == 200))
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'corpo')
+        inicio = time.perf_counter()
+        response, total_bytes, sha256 = baixar_para_arquivo(f'{base}/cortado', caminho, params={'falhas': 1},
+                                                            timeout=TIMEOUT_TESTE)
+        segundos = time.perf_counter() - inicio
+        integro = sha256 == hashlib.sha256(servidor.corpo_grande).hexdigest() and os.path.getsize(caminho) == total_bytes
+        resultados.append(verificar('corpo cortado baixado de novo em streaming', integro,
+                                    f'{total_bytes / 1024 ** 2:.0f} MiB, {segundos:.2f}s'))
+        resultados.append(verificar('sem arquivo temporário restante', not os.path.exists(caminho + '.tmp')))
+
+    response = requisitar(f'{base}/gzip', timeout=TIMEOUT_TESTE)
+    resultados.append(verificar('gzip negociado e descomprimido', response.content == servidor.corpo_texto,
+                                f"Accept-Encoding: {cliente_http.codificacoes_aceitas()}"))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: requisitar(f'{base}/concorrencia', params={'i': i}, timeout=(1, 5)), range(16)))
+    resultados.append(verificar(f'no máximo {LIMITE_HOST_TESTE} requisições simultâneas por host',
+                                servidor.maximo_simultaneo <= LIMITE_HOST_TESTE,
+                                f'máximo observado: {servidor.maximo_simultaneo}'))
+
+    servidor.shutdown()
+    if not all(resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extrai_dados_ibge import achatar_resultados_indicadores
+
+def gerar_payload_pais(num_municipios=5570, anos=range(2002, 2022), fracao_nulos=0.05, seed=42):
+    """Gera um payload sintético no formato da API de indicadores do IBGE para todo o país"""
+    rng = np.random.default_rng(seed)
+    localidades = []
+    for i in range(num_municipios):
+        serie = {}
+        for ano in anos:
+            serie[str(ano)] = None if rng.random() < fracao_nulos else str(round(rng.uniform(1e4, 1e8), 2))
+        localidades.append({
+            'id': str(1100015 + i),
+            'nome': f'Município {i}',
+            'series': [{'serie': serie}]
+        })
+    return [{'indicador': 'PIB Municipal', 'resultados': [{'localidades': localidades}]}]
+
+def achatar_com_laco(data):
+    """Implementação original: um dict por ponto em cinco laços aninhados"""
+    pib_data = []
+    for item in data:
+        indicador = item['indicador']
+        for resultado in item['resultados']:
+            for localidade in resultado['localidades']:
+                for serie in localidade['series']:
+                    for data_point in serie['serie'].items():
+                        if data_point[1] is not None:
+                            pib_data.append({
+                                'indicador': indicador,
+                                'localidade_id': localidade['id'],
+                                'localidade_nome': localidade['nome'],
+                                'ano': data_point[0],
+                                'valor': data_point[1]
+                            })
+    return pd.DataFrame(pib_data)
+
+def medir(funcao, data, repeticoes=5):
+    """Retorna o menor tempo de execução entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(data)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def main():
+    data = gerar_payload_pais()
+
+    tempo_laco, df_laco = medir(achatar_com_laco, data)
+    tempo_vetorizado, df_vetorizado = medir(achatar_resultados_indicadores, data)
+
+    pd.testing.assert_frame_equal(df_laco, df_vetorizado)
+
+    print(f"Pontos: {len(df_laco)}")
+    print(f"Laço aninhado: {tempo_laco:.3f}s")
+    print(f"Vetorizado:    {tempo_vetorizado:.3f}s")
+    print(f"Aceleração:    {tempo_laco / tempo_vetorizado:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Orçamento de tempo de importação (segundos) de cada módulo em um interpretador novo
+ORCAMENTO_IMPORTACAO = {
+    'Executa': 0.15,
+    'cria_dashboard': 0.15,
+    'gera_graficos': 0.15,
+    'caracteriza_dataset': 1.5,
+    'extrai_covid': 1.5
+}
+
+# Módulos pesados que nenhum destes imports pode carregar: só a etapa de gráficos os usa
+MODULOS_PROIBIDOS = ['matplotlib', 'seaborn', 'openpyxl']
+
+CODIGO_MEDICAO = """
+import sys, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = time.perf_counter() - inicio
+carregados = [m for m in {proibidos!r} if m in sys.modules]
+print(duracao)
+print(','.join(carregados))
+"""
+
+def medir_importacao(modulo, repeticoes=3):
+    """Menor tempo de importação do módulo em interpretadores novos e os módulos pesados carregados"""
+    tempos = []
+    carregados = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO_MEDICAO.format(modulo=modulo, proibidos=MODULOS_PROIBIDOS)],
+            cwd=RAIZ, capture_output=True, text=True, check=True).stdout.splitlines()
+        tempos.append(float(saida[0]))
+        carregados = [m for m in saida[1].split(',') if m] if len(saida) > 1 else []
+    return min(tempos), carregados
+
+def main():
+    falhas = 0
+    for modulo, orcamento in ORCAMENTO_IMPORTACAO.items():
+        duracao, carregados = medir_importacao(modulo)
+        status = 'ok'
+        if duracao > orcamento:
+            status = 'ACIMA DO ORÇAMENTO'
+            falhas += 1
+        if carregados:
+            status = f"carrega {', '.join(carregados)}"
+            falhas += 1
+        print(f"{modulo:22s} {duracao * 1000:8.1f} ms (orçamento {orcamento * 1000:.0f} ms) {status}")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
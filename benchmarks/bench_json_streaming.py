@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_ibge_achatamento import gerar_payload_pais
+
+METODOS = ['arvore', 'streaming', 'blocos', 'lago', 'publicacao']
+
+def pico_memoria_mb():
+    """
+    Pico de memória residente do processo
+
+    VmHWM é zerado no exec; o ru_maxrss de um filho herdaria o pico do processo que
+    gerou o payload.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def decodificar(metodo, arquivo_json, arquivo_saida):
+    """Decodifica o payload com um dos métodos e grava o DataFrame para comparação"""
+    from extrai_dados_ibge import achatar_resultados_indicadores
+    from decodifica_json import ler_indicadores_ibge, blocos_indicadores_ibge
+
+    inicio = time.perf_counter()
+    if metodo == 'arvore':
+        with open(arquivo_json, 'rb') as f:
+            df = achatar_resultados_indicadores(json.load(f))
+    elif metodo == 'streaming':
+        with open(arquivo_json, 'rb') as f:
+            df = ler_indicadores_ibge(f)
+    elif metodo == 'lago':
+        # Como extrair_pib_municipios: cada bloco vai para o lago e o DataFrame é lido de lá
+        from armazena_dados import gravar_blocos_dataset, ler_dataset
+        pasta_lago = os.path.join(os.path.dirname(arquivo_saida), 'lago_dados')
+        with open(arquivo_json, 'rb') as f:
+            gravar_blocos_dataset(blocos_indicadores_ibge(f), 'pib_municipios', pasta_lago=pasta_lago)
+        df = ler_dataset('pib_municipios', pasta_lago=pasta_lago)
+    elif metodo == 'publicacao':
+        # Como extrair_pib_municipios(carregar=False) no modo em lote: só grava no lago, sem ler de volta
+        from armazena_dados import gravar_blocos_dataset
+        pasta_lago = os.path.join(os.path.dirname(arquivo_saida), 'lago_dados_publicacao')
+        with open(arquivo_json, 'rb') as f:
+            gravar_blocos_dataset(blocos_indicadores_ibge(f), 'pib_municipios', pasta_lago=pasta_lago)
+        df = pd.DataFrame({'linhas': [ler_catalogo_linhas(pasta_lago)]})
+    else:
+        # Consumidor que processa um bloco por vez: a memória fica limitada ao tamanho do bloco
+        with open(arquivo_json, 'rb') as f:
+            df = pd.DataFrame({'linhas': [sum(len(bloco) for bloco in blocos_indicadores_ibge(f))]})
+    segundos = time.perf_counter() - inicio
+    # Pico medido antes de gravar o DataFrame para a comparação, que também aloca memória
+    pico_mb = pico_memoria_mb()
+    df.to_pickle(arquivo_saida)
+    print(json.dumps({'segundos': segundos, 'pico_mb': pico_mb,
+                      'linhas': int(df['linhas'].iloc[0]) if metodo in ('blocos', 'publicacao') else len(df)}))
+
+def ler_catalogo_linhas(pasta_lago):
+    from armazena_dados import ler_catalogo
+    return ler_catalogo(pasta_lago)['pib_municipios']['num_registros']
+
+def medir(metodo, arquivo_json, arquivo_saida):
+    """Roda o método em um processo próprio, para o pico de memória não se misturar"""
+    saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--metodo', metodo,
+                            '--arquivo', arquivo_json, '--saida', arquivo_saida],
+                           capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Pico de memória da decodificação do JSON de indicadores do IBGE')
+    parser.add_argument('--indicadores', type=int, default=10, help='Indicadores no payload (5570 municípios cada)')
+    parser.add_argument('--metodo', choices=METODOS, help=argparse.SUPPRESS)
+    parser.add_argument('--arquivo', help=argparse.SUPPRESS)
+    parser.add_argument('--saida', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.metodo:
+        return decodificar(args.metodo, args.arquivo, args.saida)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_json = os.path.join(pasta, 'indicadores.json')
+        payload = []
+        for i in range(args.indicadores):
+            item = gerar_payload_pais(seed=i)[0]
+            item['indicador'] = f'Indicador {i}'
+            payload.append(item)
+        with open(arquivo_json, 'w') as f:
+            json.dump(payload, f)
+        del payload
+        print(f"Payload: {os.path.getsize(arquivo_json) / 1024 ** 2:.0f} MB")
+
+        resultados = {metodo: medir(metodo, arquivo_json, os.path.join(pasta, f'{metodo}.pkl')) for metodo in METODOS}
+        arvore = pd.read_pickle(os.path.join(pasta, 'arvore.pkl'))
+        pd.testing.assert_frame_equal(arvore, pd.read_pickle(os.path.join(pasta, 'streaming.pkl')))
+        # O lago devolve as linhas agrupadas por partição (ano)
+        colunas = list(arvore.columns)
+        pd.testing.assert_frame_equal(arvore.sort_values(colunas, ignore_index=True),
+                                      pd.read_pickle(os.path.join(pasta, 'lago.pkl')).sort_values(colunas, ignore_index=True))
+
+    for metodo, resultado in resultados.items():
+        print(f"{metodo:<10} {resultado['segundos']:6.2f}s  pico {resultado['pico_mb']:6.0f} MB")
+    print(f"DataFrames idênticos ({resultados['blocos']['linhas']} linhas)")
+    if resultados['publicacao']['linhas'] != resultados['blocos']['linhas']:
+        print("Publicação no lago com número de linhas diferente")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
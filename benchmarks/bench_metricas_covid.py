@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_cliente_http import verificar
+from extrai_covid import JANELA_DIAS
+
+DIAS = JANELA_DIAS + 20
+COLUNAS_METRICAS = ['casos_novos', 'casos_acumulados', 'casos_media_7d', 'casos_media_14d',
+                    'crescimento_casos_7d', 'obitos_media_7d', 'incidencia_100k']
+
+def gerar_covid(num_locais, acumulados, seed=0):
+    """
+    Dados de COVID-19 com um registro por local e dia, com dias faltando em alguns locais
+
+    acumulados=True gera o esquema do caso.csv do Brasil.io; False, o dos dados de exemplo.
+    """
+    rng = np.random.default_rng(seed)
+    dias = pd.date_range('2023-01-01', periods=DIAS)
+    partes = []
+    for i in range(num_locais):
+        inicio = int(rng.integers(0, 10))
+        datas = dias[inicio:]
+        if i % 3 == 0:
+            # Buracos de um a três dias seguidos
+            datas = datas[rng.random(len(datas)) > 0.1]
+        casos = rng.integers(0, 50, len(datas)).astype('float64')
+        obitos = rng.integers(0, 3, len(datas)).astype('float64')
+        populacao = float(rng.integers(1000, 1000000))
+        if acumulados:
+            partes.append(pd.DataFrame({'date': datas, 'state': f'E{i % 5}', 'city': f'C{i}',
+                                        'place_type': 'city', 'confirmed': np.cumsum(casos),
+                                        'deaths': np.cumsum(obitos), 'estimated_population': populacao}))
+        else:
+            partes.append(pd.DataFrame({'data': datas, 'estado': f'E{i}', 'casos': casos,
+                                        'obitos': obitos, 'populacao': populacao}))
+    return pd.concat(partes, ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+def referencia(df, esquema):
+    """Métricas por local com a série reindexada por dia corrido (implementação direta com pandas)"""
+    chaves, coluna_data = esquema['chaves'], esquema['data']
+    resultados = []
+    for chave, grupo in df.groupby(chaves, dropna=False, observed=True):
+        grupo = grupo.set_index(coluna_data).sort_index()
+        diario = grupo.reindex(pd.date_range(grupo.index.min(), grupo.index.max()))
+        casos = diario[esquema['casos']].astype('float64')
+        obitos = diario[esquema['obitos']].astype('float64')
+        if esquema['acumulados']:
+            casos_acumulados, casos_novos, obitos_novos = casos, casos.diff(), obitos.diff()
+        else:
+            casos_acumulados, casos_novos, obitos_novos = casos.cumsum(), casos, obitos
+        media_7d = casos_novos.rolling(7).sum() / 7
+        anterior = media_7d.shift(7)
+        metricas = pd.DataFrame({
+            'casos_novos': casos_novos,
+            'casos_acumulados': casos_acumulados,
+            'casos_media_7d': media_7d,
+            'casos_media_14d': casos_novos.rolling(14).sum() / 14,
+            'crescimento_casos_7d': (media_7d / anterior - 1).where(anterior > 0),
+            'obitos_media_7d': obitos_novos.rolling(7).sum() / 7,
+            'incidencia_100k': casos_acumulados / diario[esquema['populacao']] * 100000
+        }).loc[grupo.index]
+        for col, valor in zip(chaves, chave if isinstance(chave, tuple) else (chave,)):
+            metricas[col] = valor
+        resultados.append(metricas.rename_axis('data').reset_index())
+    return ordenar(pd.concat(resultados, ignore_index=True), chaves)
+
+def ordenar(metricas, chaves):
+    """Métricas em ordem de local e data, com as chaves como texto, para comparação"""
+    metricas = metricas.assign(**{col: metricas[col].astype(str) for col in chaves})
+    return metricas.sort_values(chaves + ['data']).reset_index(drop=True)
+
+def iguais(a, b, chaves, colunas=None):
+    a, b = ordenar(a, chaves), ordenar(b, chaves)
+    colunas = colunas or list(a.columns)
+    if len(a) != len(b) or not (a[chaves + ['data']] == b[chaves + ['data']]).all().all():
+        return False
+    return all(np.allclose(a[col].to_numpy('float64'), b[col].to_numpy('float64'), rtol=1e-9, equal_nan=True)
+               for col in colunas if col not in chaves + ['data'])
+
+def janela_rolante(df, esquema, passos):
+    """
+    Avança a janela de JANELA_DIAS dias (a de ler_covid_em_blocos) a cada execução e
+    compara o resultado incremental com o completo
+
+    Retorna se todas as execuções foram iguais ao cálculo completo, se todas depois
+    da primeira foram incrementais e o tempo médio de cada modo (o completo com
+    forcar=True, que também grava o estado).
+    """
+    from calcula_metricas_covid import metricas_covid_incrementais
+    from pipeline_incremental import hashes_linhas
+
+    datas = pd.to_datetime(df[esquema['data']])
+    primeira = datas.min()
+    todas_iguais, todas_incrementais = True, True
+    tempos_incremental, tempos_completo = [], []
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta_incremental = os.path.join(pasta, 'incremental')
+        inicio = 0
+        for numero, passo in enumerate(passos):
+            inicio += passo
+            janela = df[(datas >= primeira + pd.Timedelta(days=inicio))
+                        & (datas < primeira + pd.Timedelta(days=inicio + JANELA_DIAS))]
+            # Como em Executa.processar_dataset, os hashes das linhas são calculados uma vez por execução
+            hashes = hashes_linhas(janela)
+            saida = io.StringIO()
+            t = time.perf_counter()
+            with contextlib.redirect_stdout(saida):
+                incremental = metricas_covid_incrementais(janela, pasta_incremental, hashes)
+            tempos_incremental.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                completo = metricas_covid_incrementais(janela, os.path.join(pasta, 'completo'), hashes,
+                                                       forcar=True)
+            tempos_completo.append(time.perf_counter() - t)
+            todas_iguais &= iguais(incremental, completo, esquema['chaves'])
+            if numero > 0:
+                todas_incrementais &= 'removidas' in saida.getvalue()
+    return todas_iguais, todas_incrementais, np.mean(tempos_incremental[1:]), np.mean(tempos_completo[1:])
+
+def sem_estado(df):
+    """Se um dataset abaixo de LINHAS_MINIMAS_INCREMENTAL é recalculado sem gravar estado"""
+    from calcula_metricas_covid import metricas_covid_incrementais
+
+    with tempfile.TemporaryDirectory() as pasta:
+        with contextlib.redirect_stdout(io.StringIO()):
+            metricas_covid_incrementais(df, pasta)
+        return not os.listdir(pasta)
+
+def main():
+    parser = argparse.ArgumentParser(description='Métricas de COVID-19 por dia corrido e com janela de datas rolante')
+    # Acima de LINHAS_MINIMAS_INCREMENTAL registros na janela, como o caso.csv do Brasil.io
+    parser.add_argument('--locais', type=int, default=1000, help='Locais por conjunto de dados')
+    args = parser.parse_args()
+
+    from calcula_metricas_covid import calcular_metricas_covid, esquema_covid
+
+    resultados = []
+    # Um dia por execução, depois saltos de vários dias (entra e sai mais de uma data)
+    passos = [0, 1, 1, 1, 3, 1, 5, 2]
+    for acumulados in (True, False):
+        nome = 'acumulados' if acumulados else 'diários'
+        df = gerar_covid(args.locais, acumulados)
+        esquema = esquema_covid(df)
+        resultados.append(verificar(f'médias por dia corrido, com dias faltando ({nome})',
+                                    iguais(calcular_metricas_covid(df), referencia(df, esquema),
+                                           esquema['chaves'], COLUNAS_METRICAS)))
+        resultados.append(verificar(f'dataset pequeno recalculado sem estado ({nome})',
+                                    sem_estado(gerar_covid(60, acumulados))))
+        todas_iguais, todas_incrementais, incremental, completo = janela_rolante(df, esquema, passos)
+        resultados.append(verificar(f'janela rolante igual ao cálculo completo ({nome})', todas_iguais))
+        resultados.append(verificar(f'janela rolante calculada de forma incremental ({nome})', todas_incrementais,
+                                    f'{incremental * 1000:.0f} ms por execução, '
+                                    f'{completo * 1000:.0f} ms no cálculo completo'))
+
+    if not all(resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
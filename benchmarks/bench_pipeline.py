@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Tamanhos dos datasets sintéticos (linhas)
+TAMANHOS = {'10k': 10_000, '1M': 1_000_000, '10M': 10_000_000}
+TAMANHOS_PADRAO = ['10k', '1M']
+
+# Cada caso roda em um interpretador novo, para o pico de RSS ser só dele
+CASOS = ['covid19', 'pib_municipios', 'demografia', 'taxa_selic', 'servidores', 'pipeline']
+
+ARQUIVO_RESULTADO = os.path.join(RAIZ, 'benchmarks', 'resultado_pipeline.json')
+ARQUIVO_BASELINE = os.path.join(RAIZ, 'benchmarks', 'baseline_pipeline.json')
+
+# Uma métrica regride se piorar mais que a tolerância e mais que o piso (abaixo dele é ruído)
+TOLERANCIA = 0.25
+PISO_SEGUNDOS = 0.25
+PISO_MEMORIA_MB = 20
+
+# As APIs de IBGE, BCB e Transparência são pequenas por natureza; as fixtures param nestes limites
+MAX_PONTOS_IBGE = 1_000_000
+MAX_SERIES_BCB = 50
+MAX_LINHAS_TRANSPARENCIA = 200_000
+LINHAS_POR_PAGINA_TRANSPARENCIA = 1000
+ANOS_IBGE = range(2002, 2022)
+DIAS_COVID = 365
+
+# Excel é exportado só em datasets que o openpyxl escreve em tempo razoável
+MAX_LINHAS_EXCEL = 100_000
+
+def pico_rss_mb():
+    """Pico de memória residente do processo e dos filhos já encerrados (ru_maxrss em KiB no Linux)"""
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(proprio, filhos) / divisor
+
+# Fixtures servidas pelo servidor HTTP local
+
+def gerar_caso_covid(num_linhas, arquivo):
+    """caso.csv.gz no formato do Brasil.io: num_linhas / DIAS_COVID municípios com um registro por dia"""
+    import numpy as np
+    import pandas as pd
+    from extrai_covid import ESTADOS
+
+    rng = np.random.default_rng(42)
+    linhas = np.arange(num_linhas)
+    lugares = linhas // DIAS_COVID
+    datas = pd.Timestamp('2023-12-31') - pd.to_timedelta(linhas % DIAS_COVID, unit='D')
+    populacao = rng.integers(5000, 12_000_000, lugares[-1] + 1).astype(float)[lugares]
+    confirmados = rng.integers(0, 100_000, num_linhas)
+    obitos = (confirmados * rng.uniform(0.005, 0.03, num_linhas)).astype(np.int64)
+    pd.DataFrame({
+        'date': datas.strftime('%Y-%m-%d'),
+        'state': np.array(ESTADOS)[lugares % len(ESTADOS)],
+        'city': pd.Series(lugares).map('Cidade {}'.format),
+        'place_type': 'city',
+        'confirmed': confirmados,
+        'deaths': obitos,
+        'order_for_place': DIAS_COVID - linhas % DIAS_COVID,
+        'is_last': linhas % DIAS_COVID == 0,
+        'estimated_population_2019': populacao,
+        'estimated_population': populacao,
+        'city_ibge_code': (1_100_000 + lugares).astype(float),
+        'confirmed_per_100k_inhabitants': confirmados / populacao * 100_000,
+        'death_rate': obitos / np.maximum(confirmados, 1)
+    }).to_csv(arquivo, index=False, compression='gzip')
+
+def gerar_fixtures(caso, num_linhas, pasta):
+    """Respostas pré-gravadas do caso: caminho -> bytes, ou dados para as rotas calculadas"""
+    fixtures = {}
+    if caso == 'covid19':
+        arquivo = os.path.join(pasta, 'caso.csv.gz')
+        gerar_caso_covid(num_linhas, arquivo)
+        with open(arquivo, 'rb') as f:
+            fixtures['/covid/caso.csv.gz'] = f.read()
+    elif caso == 'pib_municipios':
+        from bench_ibge_achatamento import gerar_payload_pais
+        num_municipios = max(1, min(num_linhas, MAX_PONTOS_IBGE) // len(ANOS_IBGE))
+        payload = gerar_payload_pais(num_municipios=num_municipios, anos=ANOS_IBGE)
+        fixtures['/ibge/pib'] = json.dumps(payload).encode()
+    elif caso == 'demografia':
+        projecao = [{'data': f'{ano}-07-01', 'populacao': 190_000_000 + 1_500_000 * (ano - 2000),
+                     'periodo': str(ano)} for ano in range(2000, 2061)]
+        fixtures['/ibge/projecao'] = json.dumps({'projecao': projecao}).encode()
+    elif caso == 'servidores':
+        from extrai_transparencia import criar_dados_servidores_exemplo
+        df = criar_dados_servidores_exemplo(num_linhas=min(num_linhas, MAX_LINHAS_TRANSPARENCIA),
+                                            arquivo=os.path.join(pasta, 'servidores_fixture.csv'))
+        df['data_ingresso'] = df['data_ingresso'].dt.strftime('%Y-%m-%d')
+        fixtures['servidores'] = df.astype(object).to_dict('records')
+    return fixtures
+
+class ManipuladorStub(BaseHTTPRequestHandler):
+    """Servidor local com as rotas das APIs usadas pelos extratores"""
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, corpo, tipo='application/json'):
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        fixtures = self.server.fixtures
+
+        if url.path in fixtures:
+            return self.responder(fixtures[url.path])
+        if url.path.startswith('/bcb/'):
+            import pandas as pd
+            datas = pd.date_range(pd.to_datetime(params['dataInicial'], format='%d/%m/%Y'),
+                                  pd.to_datetime(params['dataFinal'], format='%d/%m/%Y'))
+            valores = (10 + (datas.dayofyear % 50) / 10).round(2)
+            corpo = [{'data': d, 'valor': f'{v:.2f}'} for d, v in zip(datas.strftime('%d/%m/%Y'), valores)]
+            return self.responder(json.dumps(corpo).encode())
+        if url.path == '/transparencia/servidores':
+            pagina, tamanho = int(params['pagina']), int(params['tamanhoPagina'])
+            registros = fixtures['servidores'][(pagina - 1) * tamanho:pagina * tamanho]
+            return self.responder(json.dumps(registros).encode())
+        self.send_response(404)
+        self.end_headers()
+
+def iniciar_stub(fixtures):
+    """Sobe o servidor local em uma porta livre e retorna (servidor, url base)"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ManipuladorStub)
+    servidor.fixtures = fixtures
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}'
+
+# Execução de um caso (em um interpretador próprio)
+
+def executar_extrator(caso, num_linhas, url_base):
+    """Roda o extrator do caso contra o servidor local e retorna o DataFrame"""
+    if caso == 'covid19':
+        from extrai_covid import extrair_dados_covid
+        return extrair_dados_covid(url=f'{url_base}/covid/caso.csv.gz')
+    if caso == 'pib_municipios':
+        from extrai_dados_ibge import extrair_pib_municipios
+        return extrair_pib_municipios(url=f'{url_base}/ibge/pib')
+    if caso == 'demografia':
+        from extrai_dados_ibge import extrair_dados_ibge_demograficos
+        return extrair_dados_ibge_demograficos(url=f'{url_base}/ibge/projecao')
+    if caso == 'taxa_selic':
+        from extrai_bcb import extrair_dados_bcb
+        # Uma série diária desde 1986 tem cerca de 14 mil observações
+        num_series = max(1, min(num_linhas // 14_000, MAX_SERIES_BCB))
+        return extrair_dados_bcb(codigos=list(range(1, num_series + 1)),
+                                 url_sgs=f'{url_base}/bcb/bcdata.sgs.{{codigo}}/dados')
+    if caso == 'servidores':
+        from extrai_transparencia import extrair_dados_servidores
+        return extrair_dados_servidores(url=f'{url_base}/transparencia/servidores',
+                                        tamanho_pagina=LINHAS_POR_PAGINA_TRANSPARENCIA,
+                                        requisicoes_por_segundo=None)
+    raise ValueError(f"Caso desconhecido: {caso}")
+
+def executar_pipeline(num_linhas):
+    """Gera o dataset, compacta os tipos, calcula as métricas, caracteriza e cria o modelo de dashboard, etapa por etapa"""
+    from extrai_covid import criar_dados_covid_exemplo
+    from otimiza_tipos import compactar_tipos
+    from calcula_metricas_covid import calcular_metricas_covid
+    from caracteriza_dataset import caracterizar_dataset
+    from cria_dashboard import criar_modelo_power_bi
+
+    detalhes = {}
+    inicio = time.perf_counter()
+    df = criar_dados_covid_exemplo(num_linhas=num_linhas, arquivo='bench_covid.parquet')
+    detalhes['geracao'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df, _ = compactar_tipos(df, verbose=False)
+    detalhes['compactacao'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    calcular_metricas_covid(df)
+    detalhes['metricas_covid'] = time.perf_counter() - inicio
+
+    formatos = ('csv', 'parquet', 'excel') if num_linhas <= MAX_LINHAS_EXCEL else ('csv', 'parquet')
+    tempos = {}
+    inicio = time.perf_counter()
+    caracterizar_dataset(df, 'bench', pasta_output='output', formatos_exportacao=formatos,
+                         max_processos=1, pular_graficos_inalterados=False, tempos=tempos)
+    detalhes['caracterizacao'] = time.perf_counter() - inicio
+    detalhes['etapas_caracterizacao'] = tempos
+
+    inicio = time.perf_counter()
+    criar_modelo_power_bi(pasta_input='output', nome_dataset='bench')
+    detalhes['dashboard'] = time.perf_counter() - inicio
+    return len(df), detalhes
+
+def executar_caso(caso, nome_tamanho):
+    """Executa um caso em uma pasta temporária e retorna suas métricas"""
+    num_linhas = TAMANHOS[nome_tamanho]
+    pasta = tempfile.mkdtemp(prefix='bench_pipeline_')
+    os.chdir(pasta)
+    servidor = None
+    try:
+        if caso == 'pipeline':
+            inicio = time.perf_counter()
+            linhas, detalhes = executar_pipeline(num_linhas)
+        else:
+            servidor, url_base = iniciar_stub(gerar_fixtures(caso, num_linhas, pasta))
+            inicio = time.perf_counter()
+            df = executar_extrator(caso, num_linhas, url_base)
+            # Detalhamento pelas etapas instrumentadas do extrator (download, parse, gravação)
+            from instrumentacao import medicoes, resumir_medicoes
+            detalhes = {caminho: total['segundos'] for caminho, total in resumir_medicoes(medicoes()).items()}
+            linhas = 0 if df is None else len(df)
+        return {
+            'segundos': time.perf_counter() - inicio,
+            'pico_rss_mb': pico_rss_mb(),
+            'linhas': linhas,
+            'detalhes': detalhes
+        }
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+        os.chdir(RAIZ)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+def medir_caso(caso, nome_tamanho):
+    """Roda o caso em um interpretador novo; a última linha da saída traz as métricas em JSON"""
+    processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--caso', caso, nome_tamanho],
+                              cwd=RAIZ, capture_output=True, text=True)
+    if processo.returncode != 0:
+        return {'erro': processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else 'falhou'}
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+# Comparação com a baseline
+
+def achatar_metricas(resultados):
+    """Métricas numéricas comparáveis: 'tamanho/caso/metrica[/etapa...]' -> valor"""
+    metricas = {}
+
+    def visitar(prefixo, valor):
+        if isinstance(valor, dict):
+            for chave, sub in valor.items():
+                visitar(f'{prefixo}/{chave}', sub)
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            metricas[prefixo] = valor
+
+    for nome_tamanho, casos in resultados.items():
+        for caso, metricas_caso in casos.items():
+            visitar(f'{nome_tamanho}/{caso}/segundos', metricas_caso.get('segundos'))
+            visitar(f'{nome_tamanho}/{caso}/pico_rss_mb', metricas_caso.get('pico_rss_mb'))
+            visitar(f'{nome_tamanho}/{caso}/detalhes', metricas_caso.get('detalhes', {}))
+    return metricas
+
+def comparar_baseline(resultados, baseline, tolerancia=TOLERANCIA):
+    """Lista (métrica, baseline, atual) das métricas que pioraram além da tolerância e do piso"""
+    atuais = achatar_metricas(resultados)
+    anteriores = achatar_metricas(baseline['resultados'])
+    regressoes = []
+    for metrica, atual in atuais.items():
+        anterior = anteriores.get(metrica)
+        if anterior is None:
+            continue
+        piso = PISO_MEMORIA_MB if metrica.endswith('pico_rss_mb') else PISO_SEGUNDOS
+        if atual > anterior * (1 + tolerancia) and atual - anterior > piso:
+            regressoes.append((metrica, anterior, atual))
+    return regressoes
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta: extração, caracterização e dashboard")
+    parser.add_argument('--tamanhos', nargs='+', choices=list(TAMANHOS), default=TAMANHOS_PADRAO,
+                        help=f"Tamanhos dos datasets (padrão: {' '.join(TAMANHOS_PADRAO)})")
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=CASOS, help="Casos a medir (padrão: todos)")
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADO, help="JSON com os resultados")
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE, help="JSON de referência para a comparação")
+    parser.add_argument('--gravar-baseline', action='store_true', help="Grava os resultados como nova baseline")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help=f"Piora relativa aceita antes de acusar regressão (padrão: {TOLERANCIA})")
+    parser.add_argument('--caso', nargs=2, metavar=('CASO', 'TAMANHO'), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main():
+    args = ler_argumentos()
+    if args.caso:
+        caso, nome_tamanho = args.caso
+        print(json.dumps(executar_caso(caso, nome_tamanho)))
+        return 0
+
+    resultados = {}
+    for nome_tamanho in args.tamanhos:
+        resultados[nome_tamanho] = {}
+        for caso in args.casos:
+            metricas = medir_caso(caso, nome_tamanho)
+            resultados[nome_tamanho][caso] = metricas
+            if 'erro' in metricas:
+                print(f"{nome_tamanho:4s} {caso:15s} ERRO: {metricas['erro']}")
+            else:
+                print(f"{nome_tamanho:4s} {caso:15s} {metricas['segundos']:9.2f}s "
+                      f"{metricas['pico_rss_mb']:9.0f} MB  {metricas['linhas']} linhas")
+
+    relatorio = {
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'resultados': resultados
+    }
+    with open(args.saida, 'w') as f:
+        json.dump(relatorio, f, indent=4)
+    print(f"Resultados gravados em '{args.saida}'")
+
+    if args.gravar_baseline:
+        shutil.copyfile(args.saida, args.baseline)
+        print(f"Baseline gravada em '{args.baseline}'")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sem baseline para comparar; use --gravar-baseline para criar uma")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressoes = comparar_baseline(resultados, baseline, args.tolerancia)
+    for metrica, anterior, atual in regressoes:
+        print(f"REGRESSÃO {metrica}: {anterior:.3f} -> {atual:.3f}")
+    if not regressoes:
+        print("Nenhuma regressão em relação à baseline")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
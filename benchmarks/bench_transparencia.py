@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cliente_http
+from bench_cliente_http import verificar
+
+NUM_PAGINAS = 12
+TAMANHO_PAGINA = 50
+PAGINA_LIMITADA = 2  # Responde 429 (Retry-After: 0) nas primeiras chamadas
+PAGINA_INSTAVEL = 7  # Responde 503 enquanto o servidor estiver em modo de falha
+
+class ManipuladorServidores(BaseHTTPRequestHandler):
+    """API de servidores paginada com limite de taxa e uma página que falha sob demanda"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, corpo, status=200, headers=None):
+        self.send_response(status)
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        pagina = int(params['pagina'][0])
+        tamanho = int(params['tamanhoPagina'][0])
+        servidor = self.server
+        with servidor.trava:
+            servidor.chamadas[pagina] = servidor.chamadas.get(pagina, 0) + 1
+            chamada = servidor.chamadas[pagina]
+
+        if pagina == PAGINA_LIMITADA and chamada <= 2:
+            return self.responder(b'', status=429, headers={'Retry-After': '0'})
+        if pagina == PAGINA_INSTAVEL and servidor.falhar:
+            return self.responder(b'', status=503)
+
+        inicio = (pagina - 1) * tamanho
+        fim = min(inicio + tamanho, NUM_PAGINAS * TAMANHO_PAGINA) if pagina <= NUM_PAGINAS else inicio
+        registros = [{'id': i + 1, 'nome': f'Servidor {i + 1}', 'orgao': 'Ministério da Saúde',
+                      'salario': 1000.0 + i} for i in range(inicio, fim)]
+        self.responder(json.dumps(registros).encode())
+
+def iniciar_stub():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ManipuladorServidores)
+    servidor.trava = threading.Lock()
+    servidor.chamadas = {}
+    servidor.falhar = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}/servidores'
+
+def main():
+    # Backoff curto para o teste não passar a maior parte do tempo dormindo
+    cliente_http.ESPERA_BASE_SEGUNDOS = 0.01
+    servidor, url = iniciar_stub()
+    resultados = []
+    pasta_original = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        try:
+            import extrai_transparencia
+            from extrai_transparencia import extrair_dados_servidores
+            from armazena_dados import ler_dataset
+            parametros = dict(url=url, tamanho_pagina=TAMANHO_PAGINA, requisicoes_por_segundo=None)
+
+            # 1. Página instável: extração interrompida, sem publicar o conjunto parcial
+            df = extrair_dados_servidores(**parametros)
+            with open('servidores_federais_checkpoint.json') as f:
+                checkpoint = json.load(f)
+            resultados.append(verificar('429 repetido com backoff até o sucesso',
+                                        servidor.chamadas.get(PAGINA_LIMITADA) == 3,
+                                        f'{servidor.chamadas.get(PAGINA_LIMITADA)} chamadas'))
+            resultados.append(verificar('falha no meio retorna os dados de exemplo',
+                                        'cargo' in df.columns and len(df) != (PAGINA_INSTAVEL - 1) * TAMANHO_PAGINA))
+            resultados.append(verificar('conjunto parcial não publicado no lago',
+                                        not os.path.exists(os.path.join('lago_dados', 'servidores'))))
+            resultados.append(verificar('checkpoint na última página contígua',
+                                        checkpoint['ultima_pagina'] == PAGINA_INSTAVEL - 1 and not checkpoint['concluido'],
+                                        f"página {checkpoint['ultima_pagina']}"))
+
+            # 2. API recuperada: retoma da página seguinte ao checkpoint e publica o CSV em vários blocos
+            servidor.falhar = False
+            extrai_transparencia.LINHAS_POR_BLOCO_PUBLICACAO = TAMANHO_PAGINA
+            chamadas_antes = dict(servidor.chamadas)
+            df = extrair_dados_servidores(**parametros)
+            repetidas = [p for p in range(1, PAGINA_INSTAVEL) if servidor.chamadas.get(p) != chamadas_antes.get(p)]
+            resultados.append(verificar('retomada não baixa de novo as páginas gravadas', not repetidas,
+                                        f'repetidas: {repetidas}' if repetidas else ''))
+            ids = df['id'].tolist()
+            resultados.append(verificar('todos os registros, sem duplicatas',
+                                        ids == list(range(1, NUM_PAGINAS * TAMANHO_PAGINA + 1)),
+                                        f'{len(ids)} registros'))
+            lago = ler_dataset('servidores')
+            resultados.append(verificar('conjunto completo publicado no lago em blocos',
+                                        lago['id'].tolist() == ids and list(lago.columns) == list(df.columns),
+                                        f'{len(lago)} registros'))
+        finally:
+            os.chdir(pasta_original)
+
+    servidor.shutdown()
+    if not all(resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
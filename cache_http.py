@@ -0,0 +1,192 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import shutil
+import time
+from cliente_http import baixar_para_arquivo
+
+# Configuração padrão do cache em disco
+PASTA_CACHE = 'cache_http'
+TTL_PADRAO = 7 * 24 * 3600  # Entradas sem acesso há mais de 7 dias são removidas
+TAMANHO_MAXIMO_CACHE = 2 * 1024 ** 3  # 2 GiB
+
+class RespostaCache:
+    """Resposta HTTP servida a partir do corpo gravado no cache em disco"""
+
+    def __init__(self, status_code, caminho=None, nao_modificado=False, pasta_entrada=None):
+        self.status_code = status_code
+        self.caminho = caminho
+        self.nao_modificado = nao_modificado
+        self.pasta_entrada = pasta_entrada
+
+    @property
+    def content(self):
+        with open(self.caminho, 'rb') as f:
+            return f.read()
+
+    def json(self):
+        with open(self.caminho, 'rb') as f:
+            return json.load(f)
+
+def chave_cache(url, params=None):
+    """Gera a chave da entrada de cache a partir da URL e dos parâmetros"""
+    params_ordenados = sorted((params or {}).items())
+    texto = url + '?' + '&'.join(f'{k}={v}' for k, v in params_ordenados)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _ler_metadados(pasta_entrada):
+    caminho_meta = os.path.join(pasta_entrada, 'meta.json')
+    if not os.path.exists(caminho_meta):
+        return None
+    try:
+        with open(caminho_meta) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _gravar_metadados(pasta_entrada, meta):
+    caminho_tmp = os.path.join(pasta_entrada, 'meta.json.tmp')
+    with open(caminho_tmp, 'w') as f:
+        json.dump(meta, f, indent=4)
+    os.replace(caminho_tmp, os.path.join(pasta_entrada, 'meta.json'))
+
+def requisitar_com_cache(url, params=None, headers=None, pasta_cache=PASTA_CACHE,
+                         ttl=TTL_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_CACHE):
+    """
+    Faz um GET condicional usando o cache em disco
+
+    Envia If-None-Match/If-Modified-Since com os validadores da última resposta.
+    Em um 304, ou quando o corpo baixado tem o mesmo hash do anterior, a resposta
+    volta com nao_modificado=True e o DataFrame já processado pode ser reaproveitado.
+    """
+    pasta_entrada = os.path.join(pasta_cache, chave_cache(url, params))
+    caminho_corpo = os.path.join(pasta_entrada, 'corpo')
+    meta = _ler_metadados(pasta_entrada)
+    if meta is not None and not os.path.exists(caminho_corpo):
+        meta = None
+
+    headers_requisicao = dict(headers or {})
+    if meta is not None:
+        if meta.get('etag'):
+            headers_requisicao['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers_requisicao['If-Modified-Since'] = meta['last_modified']
+
+    # Corpo gravado em blocos, com repetições e hash calculado durante a escrita
+    os.makedirs(pasta_entrada, exist_ok=True)
+    response, total_bytes, sha256 = baixar_para_arquivo(url, caminho_corpo, params=params,
+                                                        headers=headers_requisicao)
+
+    if response.status_code == 304 and meta is not None:
+        meta['acessado_em'] = time.time()
+        _gravar_metadados(pasta_entrada, meta)
+        return RespostaCache(200, caminho_corpo, nao_modificado=True, pasta_entrada=pasta_entrada)
+
+    if response.status_code != 200:
+        return RespostaCache(response.status_code)
+
+    nao_modificado = meta is not None and meta.get('sha256') == sha256
+    if not nao_modificado:
+        # Corpo novo: o DataFrame processado anterior deixa de valer
+        caminho_df = os.path.join(pasta_entrada, 'dados.parquet')
+        if os.path.exists(caminho_df):
+            os.remove(caminho_df)
+
+    agora = time.time()
+    _gravar_metadados(pasta_entrada, {
+        'url': url,
+        'params': params or {},
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'sha256': sha256,
+        'bytes': total_bytes,
+        'baixado_em': agora,
+        'acessado_em': agora
+    })
+
+    limpar_cache(pasta_cache, ttl=ttl, tamanho_maximo=tamanho_maximo, preservar=pasta_entrada)
+    return RespostaCache(200, caminho_corpo, nao_modificado=nao_modificado, pasta_entrada=pasta_entrada)
+
+def carregar_dataframe_cache(resposta):
+    """Retorna o DataFrame processado em cache se o corpo não mudou, senão None"""
+    if not resposta.nao_modificado or resposta.pasta_entrada is None:
+        return None
+    caminho_df = os.path.join(resposta.pasta_entrada, 'dados.parquet')
+    if not os.path.exists(caminho_df):
+        return None
+    try:
+        df = pd.read_parquet(caminho_df)
+        print("Dados não modificados desde a última execução, reutilizando cache")
+        return df
+    except Exception as e:
+        print(f"Erro ao ler DataFrame do cache: {e}")
+        return None
+
+def salvar_dataframe_cache(resposta, df):
+    """Grava o DataFrame processado junto da entrada de cache (requer pyarrow)"""
+    if resposta.pasta_entrada is None:
+        return
+    try:
+        df.to_parquet(os.path.join(resposta.pasta_entrada, 'dados.parquet'), index=False)
+    except Exception as e:
+        print(f"Erro ao salvar DataFrame no cache, tente instalar pyarrow: {e}")
+
+def _tamanho_pasta(pasta):
+    total = 0
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        if os.path.isfile(caminho):
+            total += os.path.getsize(caminho)
+    return total
+
+def _em_andamento(pasta_entrada):
+    """Download em andamento (ou abandonado): sem metadados, ou com o corpo ainda em arquivo temporário"""
+    return (not os.path.exists(os.path.join(pasta_entrada, 'meta.json'))
+            or os.path.exists(os.path.join(pasta_entrada, 'corpo.tmp')))
+
+def limpar_cache(pasta_cache=PASTA_CACHE, ttl=TTL_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_CACHE, preservar=None):
+    """
+    Remove entradas expiradas pelo TTL e, se preciso, as menos acessadas até caber no limite
+
+    Entradas com download em andamento em outra thread ou processo nunca são
+    removidas pelo limite de tamanho; pelo TTL, só se a pasta não foi alterada
+    no período (download abandonado).
+    """
+    if not os.path.exists(pasta_cache):
+        return
+
+    agora = time.time()
+    entradas = []
+    total = 0
+    for nome in os.listdir(pasta_cache):
+        pasta_entrada = os.path.join(pasta_cache, nome)
+        if not os.path.isdir(pasta_entrada):
+            continue
+        if pasta_entrada == preservar or _em_andamento(pasta_entrada):
+            try:
+                if pasta_entrada != preservar and agora - os.path.getmtime(pasta_entrada) > ttl:
+                    shutil.rmtree(pasta_entrada, ignore_errors=True)
+                    continue
+                total += _tamanho_pasta(pasta_entrada)
+            except OSError:
+                pass  # Removida ou renomeada por outra thread durante a varredura
+            continue
+        meta = _ler_metadados(pasta_entrada)
+        acessado_em = meta.get('acessado_em', 0) if meta else 0
+        if agora - acessado_em > ttl:
+            shutil.rmtree(pasta_entrada, ignore_errors=True)
+            continue
+        try:
+            tamanho = _tamanho_pasta(pasta_entrada)
+        except OSError:
+            continue
+        entradas.append((acessado_em, pasta_entrada, tamanho))
+        total += tamanho
+
+    # Só entradas completas entram no descarte das menos acessadas
+    for acessado_em, pasta_entrada, tamanho in sorted(entradas):
+        if total <= tamanho_maximo:
+            break
+        shutil.rmtree(pasta_entrada, ignore_errors=True)
+        total -= tamanho
@@ -0,0 +1,85 @@
+import pandas as pd
+import numpy as np
+
+# Acima deste número de linhas a correlação é calculada sobre uma amostra
+MAX_LINHAS_CORRELACAO = 200000
+LIMIAR_ALTA_CORRELACAO = 0.5
+NUM_PARES = 10
+BINS_DISPERSAO = 100
+MAX_ESTRATOS = 30  # Categorias da coluna de estratificação da amostra (os 27 estados cabem)
+
+def amostrar_linhas(df, max_linhas=MAX_LINHAS_CORRELACAO, coluna_estrato=None, seed=42):
+    """
+    Amostra aleatória simples (ou estratificada) das linhas quando o DataFrame passa de max_linhas
+
+    Com coluna_estrato, cada grupo contribui com a mesma fração de linhas,
+    preservando a proporção entre os grupos (por exemplo, estados).
+    """
+    if len(df) <= max_linhas:
+        return df
+    if coluna_estrato is None:
+        return df.sample(n=max_linhas, random_state=seed)
+    fracao = max_linhas / len(df)
+    # Linhas sem valor na coluna formam um grupo próprio, em vez de ficarem fora da amostra:
+    # o código -1 que o factorize dá aos nulos é uma chave como as outras no groupby
+    codigos, _ = pd.factorize(df[coluna_estrato])
+    return df.groupby(codigos, group_keys=False).sample(frac=fracao, random_state=seed)
+
+def escolher_coluna_estrato(perfil, max_estratos=MAX_ESTRATOS):
+    """
+    Coluna categórica principal para estratificar a amostra (por exemplo, o estado)
+
+    Entre as colunas categóricas (exceto datas) com 2 a max_estratos valores distintos,
+    a de mais valores; None se nenhuma se encaixar.
+    """
+    candidatas = [(col, cardinalidade) for col, cardinalidade in perfil['cardinalidade'].items()
+                  if col not in perfil['colunas_data'] and 2 <= cardinalidade <= max_estratos]
+    if not candidatas:
+        return None
+    return max(candidatas, key=lambda candidata: candidata[1])[0]
+
+def matriz_correlacao(df, colunas, metodo='pearson', max_linhas=MAX_LINHAS_CORRELACAO, coluna_estrato=None):
+    """
+    Matriz de correlação (Pearson ou Spearman) das colunas numéricas, sobre uma amostra se necessário
+
+    Spearman é calculado como Pearson sobre os postos da amostra, o que aproxima
+    os postos do dataset completo.
+    """
+    amostra = amostrar_linhas(df, max_linhas, coluna_estrato)[list(colunas)].astype(float)
+    if metodo == 'spearman':
+        amostra = amostra.rank()
+    elif metodo != 'pearson':
+        raise ValueError(f"Método de correlação desconhecido: {metodo}")
+    return amostra.corr()
+
+def pares_mais_correlacionados(corr, num_pares=NUM_PARES):
+    """Pares distintos de colunas ordenados pelo valor absoluto da correlação"""
+    colunas = list(corr.columns)
+    linhas, cols = np.triu_indices(len(colunas), k=1)
+    valores = corr.to_numpy()[linhas, cols]
+    pares = pd.DataFrame({
+        'coluna_a': [colunas[i] for i in linhas],
+        'coluna_b': [colunas[j] for j in cols],
+        'correlacao': valores
+    })
+    pares['correlacao_abs'] = pares['correlacao'].abs()
+    pares = pares.dropna(subset=['correlacao'])
+    return pares.sort_values('correlacao_abs', ascending=False).head(num_pares).reset_index(drop=True)
+
+def agregar_dispersao(df, coluna_x, coluna_y, bins=BINS_DISPERSAO):
+    """
+    Histograma 2D de um par de colunas, usado no lugar de um gráfico de dispersão ponto a ponto
+
+    Percorre todas as linhas uma vez (np.histogram2d) e devolve uma grade de
+    bins x bins contagens, de tamanho fixo qualquer que seja o dataset.
+    """
+    pares = df[[coluna_x, coluna_y]].astype(float).dropna().to_numpy()
+    pares = pares[np.isfinite(pares).all(axis=1)]
+    contagens, bordas_x, bordas_y = np.histogram2d(pares[:, 0], pares[:, 1], bins=bins)
+    return {
+        'contagens': contagens,
+        'bordas_x': bordas_x,
+        'bordas_y': bordas_y,
+        'coluna_x': coluna_x,
+        'coluna_y': coluna_y
+    }
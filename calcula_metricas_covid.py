@@ -0,0 +1,412 @@
+import numpy as np
+import pandas as pd
+import os
+import shutil
+from analisa_temporal import converter_datas
+from pipeline_incremental import (hashes_linhas, impressoes_particoes, impressao_parametros,
+                                  ler_manifesto, gravar_manifesto)
+
+# Esquemas reconhecidos: caso.csv do Brasil.io (contagens acumuladas por estado ou município)
+# e os dados de exemplo de extrai_covid (contagens diárias por estado)
+ESQUEMAS_COVID = [
+    {'chaves': ['place_type', 'state', 'city'], 'data': 'date', 'casos': 'confirmed', 'obitos': 'deaths',
+     'populacao': 'estimated_population', 'acumulados': True},
+    {'chaves': ['estado'], 'data': 'data', 'casos': 'casos', 'obitos': 'obitos',
+     'populacao': 'populacao', 'acumulados': False}
+]
+
+JANELAS_MEDIA_MOVEL = (7, 14)
+DIAS_CRESCIMENTO = 7
+POR_HABITANTES = 100000
+
+# Dias anteriores de cada local necessários para calcular as métricas de uma data: a média
+# de 14 dias usa 14 casos novos, e cada caso novo de dados acumulados usa o dia anterior
+DIAS_HISTORICO = max(max(JANELAS_MEDIA_MOVEL), 2 * DIAS_CRESCIMENTO)
+# Dias corridos por arquivo no estado das métricas incrementais
+DIAS_POR_ARQUIVO = DIAS_HISTORICO
+# Abaixo disso, ler e gravar o estado custa mais que recalcular todas as datas
+LINHAS_MINIMAS_INCREMENTAL = 50000
+
+def esquema_covid(df):
+    """Esquema de ESQUEMAS_COVID cujas colunas estão no DataFrame, ou None"""
+    for esquema in ESQUEMAS_COVID:
+        colunas = esquema['chaves'] + [esquema['data'], esquema['casos'], esquema['obitos']]
+        if all(col in df.columns for col in colunas):
+            return esquema
+    return None
+
+def _codigos_chaves(frame, chaves):
+    # Códigos das categorias de cada chave, com os nulos depois de todas as categorias
+    codigos = []
+    for col in chaves:
+        valores = frame[col].cat.codes.to_numpy().astype('int64')
+        codigos.append(np.where(valores < 0, len(frame[col].cat.categories), valores))
+    return codigos
+
+def _inicio_locais(codigos):
+    # Marca a primeira linha de cada local em um frame ordenado por local
+    n = len(codigos[0]) if codigos else 0
+    inicio = np.ones(n, dtype=bool)
+    if n > 1:
+        inicio[1:] = np.logical_or.reduce([c[1:] != c[:-1] for c in codigos])
+    return inicio
+
+def consolidar(df, esquema, datas=None):
+    """
+    Uma linha por local e data, ordenada por local e data, com chaves categóricas
+
+    Em dados acumulados, registros repetidos do mesmo dia ficam com o maior valor;
+    em contagens diárias, são somados. Retorna as chaves, 'data', 'casos', 'obitos' e 'populacao'.
+    """
+    chaves = esquema['chaves']
+    base = pd.DataFrame({col: df[col] if isinstance(df[col].dtype, pd.CategoricalDtype)
+                         else df[col].astype('category') for col in chaves})
+    base['data'] = converter_datas(df[esquema['data']]) if datas is None else datas
+    for destino in ('casos', 'obitos', 'populacao'):
+        coluna = esquema[destino]
+        base[destino] = (pd.to_numeric(df[coluna], errors='coerce').astype('float64')
+                         if coluna in df.columns else np.nan)
+    base = base[base['data'].notna()]
+
+    # Ordenação pelas chaves categóricas e pela data, sem groupby (nulos das chaves por último)
+    consolidado = base.sort_values(chaves + ['data']).reset_index(drop=True)
+    inicio = _inicio_locais(_codigos_chaves(consolidado, chaves) + [consolidado['data'].to_numpy()])
+    if inicio.all():
+        return consolidado
+
+    # Registros repetidos do mesmo local e dia
+    posicoes = np.flatnonzero(inicio)
+    linhas = consolidado.iloc[posicoes].reset_index(drop=True)
+    for medida in ('casos', 'obitos', 'populacao'):
+        valores = consolidado[medida].to_numpy()
+        if medida == 'populacao' or esquema['acumulados']:
+            linhas[medida] = np.fmax.reduceat(valores, posicoes)
+        else:
+            # Soma dos preenchidos; nulo se todos forem nulos
+            preenchidos = np.add.reduceat((~np.isnan(valores)).astype('int64'), posicoes)
+            somas = np.add.reduceat(np.nan_to_num(valores), posicoes)
+            linhas[medida] = np.where(preenchidos > 0, somas, np.nan)
+    return linhas
+
+def _chaves_dias(consolidado, codigo):
+    # Chave crescente no frame ordenado por local e data: local * escala + dia, com uma escala
+    # maior que o período mais o maior deslocamento, para buscas de outro dia não caírem em outro local
+    dias = consolidado['data'].to_numpy().astype('datetime64[D]').astype('int64')
+    if len(dias) == 0:
+        return dias
+    dias = dias - dias.min()
+    return codigo.astype('int64') * (int(dias.max()) + DIAS_HISTORICO + 2) + dias
+
+def _linha_dias_antes(chave, dias):
+    # Linha do mesmo local `dias` dias corridos antes de cada linha, ou -1 se não houver
+    alvo = chave - dias
+    linha = np.searchsorted(chave, alvo)
+    encontrada = np.zeros(len(chave), dtype=bool)
+    dentro = linha < len(chave)
+    encontrada[dentro] = chave[linha[dentro]] == alvo[dentro]
+    return np.where(encontrada, linha, -1)
+
+def _soma_movel(valores, chave, janela):
+    # Soma dos últimos `janela` dias corridos de cada local por somas acumuladas (NaN se faltar
+    # algum dia na janela ou se ela tiver nulos)
+    nulos = np.isnan(valores)
+    somas = np.concatenate([[0.0], np.cumsum(np.where(nulos, 0.0, valores))])
+    contagem_nulos = np.concatenate([[0], np.cumsum(nulos)])
+    fim = np.arange(1, len(valores) + 1)
+    # Primeira linha do mesmo local a partir do dia inicial da janela; há uma linha por local e dia
+    inicio = np.searchsorted(chave, chave - (janela - 1))
+    completa = (fim - inicio == janela) & (contagem_nulos[fim] == contagem_nulos[inicio])
+    return np.where(completa, somas[fim] - somas[inicio], np.nan)
+
+def _anterior(valores, chave, dias):
+    # Valor do mesmo local `dias` dias corridos antes (NaN se o local não tiver esse dia)
+    linha = _linha_dias_antes(chave, dias)
+    return np.where(linha >= 0, valores[np.maximum(linha, 0)], np.nan)
+
+def _taxa_crescimento(atual, anterior):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(anterior > 0, atual / anterior - 1, np.nan)
+
+def _derivar(consolidado, chaves, acumulados):
+    """Métricas de cada linha de um frame consolidado (ordenado por local e data)"""
+    codigo = np.cumsum(_inicio_locais(_codigos_chaves(consolidado, chaves)))
+    chave = _chaves_dias(consolidado, codigo)
+
+    metricas = consolidado[chaves + ['data', 'populacao']].copy()
+    for medida in ('casos', 'obitos'):
+        valores = consolidado[medida].to_numpy(dtype='float64')
+        if acumulados:
+            acumulado = valores
+            novos = valores - _anterior(valores, chave, 1)
+        else:
+            novos = valores
+            acumulado = pd.Series(valores).groupby(codigo, sort=False).cumsum().to_numpy()
+        metricas[f'{medida}_acumulados'] = acumulado
+        metricas[f'{medida}_novos'] = novos
+        for janela in JANELAS_MEDIA_MOVEL:
+            metricas[f'{medida}_media_{janela}d'] = _soma_movel(novos, chave, janela) / janela
+        media = metricas[f'{medida}_media_{DIAS_CRESCIMENTO}d'].to_numpy()
+        metricas[f'crescimento_{medida}_{DIAS_CRESCIMENTO}d'] = _taxa_crescimento(
+            media, _anterior(media, chave, DIAS_CRESCIMENTO))
+
+    return _taxas_por_habitantes(metricas)
+
+def _taxas_por_habitantes(metricas):
+    populacao = metricas['populacao'].to_numpy()
+    populacao = np.where(populacao > 0, populacao, np.nan)
+    metricas['incidencia_100k'] = metricas['casos_acumulados'].to_numpy() / populacao * POR_HABITANTES
+    metricas['mortalidade_100k'] = metricas['obitos_acumulados'].to_numpy() / populacao * POR_HABITANTES
+    return metricas
+
+def calcular_metricas_covid(df, esquema=None, datas=None):
+    """
+    Métricas epidemiológicas diárias por local (estado ou município)
+
+    - casos/óbitos novos: diferença dos acumulados entre dias consecutivos do local
+      (ou as próprias contagens, se já forem diárias, com os acumulados somados)
+    - médias móveis de 7 e 14 dias corridos dos casos e óbitos novos
+    - incidência e mortalidade acumuladas por 100 mil habitantes
+    - crescimento da média de 7 dias em relação à de 7 dias antes (fração)
+
+    Tudo é calculado de forma vetorizada sobre o frame ordenado por local e data.
+    As janelas contam dias corridos: se faltar algum dia do local na janela, a
+    média fica nula, e em dados acumulados o caso novo é a diferença para o dia
+    anterior (nulo se ele faltar).
+    Retorna None se o DataFrame não tiver as colunas de um esquema conhecido.
+    """
+    esquema = esquema or esquema_covid(df)
+    if esquema is None:
+        return None
+    return _derivar(consolidar(df, esquema, datas), esquema['chaves'], esquema['acumulados'])
+
+def _dias(datas):
+    return datas.to_numpy().astype('datetime64[D]').astype('int64')
+
+def _numero_local(frame, chaves):
+    # Um inteiro por local, na ordem dos códigos das categorias das chaves (nulos por último)
+    local = np.zeros(len(frame), dtype='int64')
+    for col, codigos in zip(chaves, _codigos_chaves(frame, chaves)):
+        local = local * (len(frame[col].cat.categories) + 1) + codigos
+    return local
+
+def _ordenar(frame, chaves, por_data):
+    # Ordem de data e local (por_data) ou de local e data
+    local, dias = _numero_local(frame, chaves), _dias(frame['data'])
+    ordem = np.lexsort((local, dias) if por_data else (dias, local))
+    return frame.take(ordem).reset_index(drop=True)
+
+def _consolidado_das_metricas(metricas, esquema):
+    # Frame consolidado (como o de consolidar) refeito a partir das métricas já calculadas
+    contexto = pd.DataFrame({col: metricas[col] for col in esquema['chaves'] + ['data', 'populacao']})
+    for medida in ('casos', 'obitos'):
+        contexto[medida] = metricas[f'{medida}_acumulados' if esquema['acumulados'] else f'{medida}_novos']
+    return contexto
+
+def _acumulados_diarios(metricas, chaves):
+    # Em contagens diárias, os acumulados são a soma, por local, das datas presentes
+    local = _numero_local(metricas, chaves)
+    for medida in ('casos', 'obitos'):
+        metricas[f'{medida}_acumulados'] = metricas[f'{medida}_novos'].groupby(local).cumsum().to_numpy()
+    return _taxas_por_habitantes(metricas)
+
+def atualizar_metricas_covid(metricas, df_novos, esquema, datas=None, primeira_data=None):
+    """
+    Atualiza as métricas já calculadas, ordenadas por data e local, sem recalcular o histórico
+
+    - primeira_data: as datas anteriores, que saíram da janela de datas lida, já foram
+      removidas das métricas; só os primeiros DIAS_HISTORICO dias, cujas janelas
+      alcançavam essas datas, são recalculados
+    - df_novos: registros de datas posteriores às das métricas, calculados junto com os
+      últimos DIAS_HISTORICO dias de cada local
+
+    Os dois trechos (no início e no fim das métricas) são recalculados de uma vez. O
+    resultado é igual ao de calcular_metricas_covid sobre as datas restantes mais as
+    novas, ordenado por data e local.
+    """
+    chaves = esquema['chaves']
+    novos = consolidar(df_novos, esquema, datas) if df_novos is not None else None
+    if novos is not None and novos.empty:
+        novos = None
+    if novos is None and primeira_data is None:
+        return metricas
+
+    dias = _dias(metricas['data'])
+    # Linhas recalculadas do início (até fim_inicio) e as só usadas como histórico das datas novas
+    fim_inicio = 0
+    if primeira_data is not None:
+        fim_inicio = np.searchsorted(dias, _dias(pd.Series([primeira_data]))[0] + DIAS_HISTORICO)
+    inicio_historico = len(metricas)
+    partes = []
+    if novos is not None:
+        # Locais novos entram no fim das categorias, sem mudar os códigos dos já gravados
+        metricas = metricas.copy(deep=False)
+        for col in chaves:
+            faltantes = novos[col].cat.categories.difference(metricas[col].cat.categories)
+            if len(faltantes):
+                metricas[col] = metricas[col].cat.add_categories(faltantes)
+            novos[col] = novos[col].cat.set_categories(metricas[col].cat.categories)
+        inicio_historico = max(np.searchsorted(dias, _dias(novos['data']).min() - DIAS_HISTORICO), fim_inicio)
+        partes.append(novos.assign(_recalcular=True))
+    contexto = _consolidado_das_metricas(metricas.iloc[np.r_[0:fim_inicio, inicio_historico:len(metricas)]], esquema)
+    contexto['_recalcular'] = np.arange(len(contexto)) < fim_inicio
+    combinado = _ordenar(pd.concat([contexto] + partes, ignore_index=True), chaves, por_data=False)
+
+    recalculadas = _derivar(combinado, chaves, esquema['acumulados'])
+    recalculadas = _ordenar(recalculadas[combinado['_recalcular'].to_numpy()], chaves, por_data=True)
+    # Em ordem de data, as primeiras fim_inicio linhas recalculadas são as do início
+    resultado = pd.concat([recalculadas.iloc[:fim_inicio], metricas.iloc[fim_inicio:], recalculadas.iloc[fim_inicio:]],
+                          ignore_index=True)
+    if not esquema['acumulados']:
+        resultado = _acumulados_diarios(resultado, chaves)
+    return resultado
+
+def _bloco_dias(dias):
+    # Bloco de DIAS_POR_ARQUIVO dias corridos (desde 1970-01-01) de cada dia
+    return dias // DIAS_POR_ARQUIVO
+
+def _arquivo_bloco(pasta_datas, bloco):
+    return os.path.join(pasta_datas, f'{bloco}.arrow')
+
+def _gravar_blocos(metricas, pasta_datas, chaves):
+    """
+    Grava as métricas (ordenadas por data) em um arquivo Arrow por bloco de DIAS_POR_ARQUIVO dias
+
+    Sem compressão, para gravar e ler rápido; as chaves vão como os códigos das
+    categorias, que ficam no estado (as categorias de arquivos diferentes não precisam
+    ser unificadas na leitura). Cada bloco deve vir completo: o arquivo é substituído.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    if metricas.empty:
+        return
+    os.makedirs(pasta_datas, exist_ok=True)
+    codigos = {col: metricas[col].cat.codes.astype('int32') for col in chaves}
+    tabela = pa.Table.from_pandas(metricas.assign(**codigos), preserve_index=False).replace_schema_metadata(None)
+    blocos = _bloco_dias(_dias(metricas['data']))
+    limites = np.flatnonzero(np.r_[True, blocos[1:] != blocos[:-1], True])
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        feather.write_feather(tabela.slice(inicio, fim - inicio), _arquivo_bloco(pasta_datas, blocos[inicio]),
+                              compression='uncompressed')
+
+def _ler_blocos(pasta_datas, blocos, esquema, categorias):
+    # Métricas dos blocos gravados por _gravar_blocos, ordenadas por data e local
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    tabelas = [feather.read_table(_arquivo_bloco(pasta_datas, b), memory_map=True) for b in sorted(blocos)]
+    metricas = pa.concat_tables(tabelas).to_pandas()
+    for col in esquema['chaves']:
+        metricas[col] = pd.Categorical.from_codes(metricas[col].to_numpy(), categories=categorias[col])
+    return metricas
+
+def _dias_particoes(particoes):
+    # Dias corridos das partições AAAAMMDD
+    return _dias(pd.Series(pd.to_datetime([str(p) for p in particoes], format='%Y%m%d')))
+
+def metricas_covid_incrementais(df, pasta_estado, hashes=None, forcar=False):
+    """
+    Métricas do dataset de COVID-19, recalculando só as datas que mudaram desde a última execução
+
+    As métricas ficam em pasta_estado, um arquivo por bloco de DIAS_POR_ARQUIVO dias,
+    junto com a impressão digital de cada data. Se as datas já processadas que
+    continuam no df não mudaram, as que saíram dele são anteriores a elas (janela de
+    datas que avança, como a de ler_covid_em_blocos) e as novas são posteriores (dias
+    anexados ao fim), só os blocos das datas mantidas são lidos, os primeiros
+    DIAS_HISTORICO dias e as datas novas são recalculados (atualizar_metricas_covid)
+    e só os blocos com esses dias são gravados. Qualquer outra mudança recalcula
+    tudo. Com menos de LINHAS_MINIMAS_INCREMENTAL registros, tudo é recalculado sem
+    estado (ler e gravar os blocos custaria mais).
+
+    Parâmetros:
+    hashes (ndarray): Hashes das linhas já calculados (pipeline_incremental.hashes_linhas)
+    forcar (bool): Recalcula todas as datas
+
+    Retorna o DataFrame de métricas ordenado por data e local, ou None se o df não
+    tiver um esquema conhecido.
+    """
+    esquema = esquema_covid(df)
+    if esquema is None:
+        return None
+    chaves = esquema['chaves']
+    datas = converter_datas(df[esquema['data']])
+    if len(df) < LINHAS_MINIMAS_INCREMENTAL:
+        print(f"Métricas de COVID-19: {len(df)} registros calculados, sem estado incremental")
+        return _ordenar(calcular_metricas_covid(df, esquema, datas), chaves, por_data=True)
+    particao = (datas.dt.year * 10000 + datas.dt.month * 100 + datas.dt.day).fillna(-1).astype('int64')
+    impressoes = impressoes_particoes(hashes if hashes is not None else hashes_linhas(df), particao)
+
+    # 'dias_corridos': métricas gravadas quando as janelas contavam registros não são reaproveitadas
+    assinatura = impressao_parametros(list(map(str, df.columns)), esquema, JANELAS_MEDIA_MOVEL, DIAS_CRESCIMENTO,
+                                      'dias_corridos', 'blocos', DIAS_POR_ARQUIVO)
+    arquivo_estado = os.path.join(pasta_estado, 'datas.json')
+    pasta_datas = os.path.join(pasta_estado, 'datas')
+    estado = ler_manifesto(arquivo_estado)
+    anteriores = {}
+    if not forcar and estado.get('assinatura') == assinatura:
+        anteriores = estado['particoes']
+
+    # Linhas sem data não entram nas métricas
+    atuais = {p: impressao for p, impressao in impressoes.items() if int(p) >= 0}
+    anteriores = {p: impressao for p, impressao in anteriores.items() if int(p) >= 0}
+    mantidas = [p for p in anteriores if p in atuais]
+    descartadas = [p for p in anteriores if p not in atuais]
+    novas = [p for p in atuais if p not in anteriores]
+    metricas = None
+    if (mantidas and all(atuais[p] == anteriores[p] for p in mantidas)
+            and all(int(p) < min(map(int, mantidas)) for p in descartadas)
+            and all(int(p) > max(map(int, mantidas)) for p in novas)):
+        dias_mantidas = _dias_particoes(mantidas)
+        primeiro_dia = dias_mantidas.min()
+        try:
+            metricas = _ler_blocos(pasta_datas, set(_bloco_dias(dias_mantidas)), esquema, estado['categorias'])
+            # O primeiro bloco ainda pode ter datas descartadas
+            metricas = metricas.iloc[np.searchsorted(_dias(metricas['data']), primeiro_dia):]
+            metricas = metricas.reset_index(drop=True)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Métricas incrementais indisponíveis: {e}")
+            metricas = None
+    if metricas is not None:
+        if not novas and not descartadas:
+            print(f"Métricas de COVID-19: {len(mantidas)} datas reaproveitadas")
+            # Os acumulados de blocos não regravados podem ser de uma janela que já avançou
+            return metricas if esquema['acumulados'] else _acumulados_diarios(metricas, chaves)
+        # Dias recalculados: os primeiros DIAS_HISTORICO, se há datas descartadas, e os novos
+        recalculados = []
+        primeira_data, novos, datas_novas = None, None, None
+        if descartadas:
+            primeira_data = pd.Timestamp(np.datetime64(int(primeiro_dia), 'D'))
+            recalculados.extend(range(primeiro_dia, primeiro_dia + DIAS_HISTORICO))
+        if novas:
+            mascara = particao.isin([int(p) for p in novas]).to_numpy()
+            novos, datas_novas = df[mascara], datas[mascara]
+            recalculados.extend(_dias_particoes(novas))
+        metricas = atualizar_metricas_covid(metricas, novos, esquema, datas_novas, primeira_data)
+        # Só os blocos com dias recalculados são regravados
+        blocos = _bloco_dias(_dias(metricas['data']))
+        alteradas = metricas[np.isin(blocos, _bloco_dias(np.asarray(recalculados)))]
+        removidos = set(_bloco_dias(_dias_particoes(descartadas))) - set(blocos)
+        print(f"Métricas de COVID-19: {len(novas)} datas novas calculadas, {len(descartadas)} removidas, "
+              f"{len(mantidas)} reaproveitadas")
+    else:
+        metricas = _ordenar(calcular_metricas_covid(df, esquema, datas), chaves, por_data=True)
+        alteradas = metricas
+        removidos = set()
+        print(f"Métricas de COVID-19: {len(atuais)} datas calculadas")
+
+    os.makedirs(pasta_estado, exist_ok=True)
+    try:
+        # Sem estado durante a gravação: uma execução interrompida recalcula tudo na próxima
+        if os.path.exists(arquivo_estado):
+            os.remove(arquivo_estado)
+        if alteradas is metricas and os.path.exists(pasta_datas):
+            shutil.rmtree(pasta_datas)
+        _gravar_blocos(alteradas, pasta_datas, chaves)
+        for bloco in removidos:
+            if os.path.exists(_arquivo_bloco(pasta_datas, bloco)):
+                os.remove(_arquivo_bloco(pasta_datas, bloco))
+        gravar_manifesto(arquivo_estado, {'assinatura': assinatura, 'particoes': impressoes,
+                                          'categorias': {col: metricas[col].cat.categories.tolist() for col in chaves}})
+    except ImportError as e:
+        print(f"Métricas incrementais indisponíveis, tente instalar pyarrow: {e}")
+    return metricas
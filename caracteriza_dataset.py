@@ -1,11 +1,101 @@
 import pandas as pd
-import numpy as np
 import json
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from contextlib import contextmanager
+from exporta_bi import exportar_para_bi, FORMATOS_PADRAO
+from perfila_dataset import calcular_perfil, perfil_para_info, mapa_completude
+from estatisticas_streaming import acumular_blocos, perfil_dos_acumuladores
+from analisa_temporal import analisar_temporal, sufixo_coluna_data
+from calcula_correlacao import (matriz_correlacao, pares_mais_correlacionados, agregar_dispersao,
+                                escolher_coluna_estrato, LIMIAR_ALTA_CORRELACAO)
+from cria_cubos_bi import criar_cubos_bi
+from pipeline_incremental import (hashes_linhas, impressao_digital, impressao_coluna, caminho_manifesto,
+                                  executar_grafo)
+from instrumentacao import etapa
+from gera_graficos import tarefa_grafico, renderizar_graficos, DPI_PADRAO, FORMATO_PADRAO
 
-def caracterizar_dataset(df, nome_dataset, pasta_output='output'):
+# Acima deste número de linhas o perfil é calculado em blocos, com quantis e cardinalidades aproximados
+LIMIAR_PERFIL_EM_BLOCOS = 5000000
+LINHAS_POR_BLOCO_PERFIL = 500000
+
+@contextmanager
+def _cronometro(tempos, nome_etapa):
+    # Mede o bloco como uma etapa da instrumentação e soma os segundos em tempos[nome_etapa], se informado
+    medicao = None
+    try:
+        with etapa(nome_etapa) as medicao:
+            yield medicao
+    finally:
+        if tempos is not None and medicao is not None:
+            tempos[nome_etapa] = tempos.get(nome_etapa, 0.0) + medicao.segundos
+
+def salvar_perfil(perfil, nome_dataset, pasta_output='output', tempos=None):
+    """Grava _info.json, _estatisticas.csv e _distribuicao_<coluna>.csv a partir do perfil"""
+    # 1. Informações gerais do dataset
+    with _cronometro(tempos, 'info'):
+        info = perfil_para_info(perfil)
+        
+        # Salvar informações em JSON
+        with open(f'{pasta_output}/{nome_dataset}_info.json', 'w') as f:
+            json.dump(info, f, indent=4)
+    
+    # 2. Estatísticas descritivas para colunas numéricas
+    with _cronometro(tempos, 'estatisticas'):
+        if perfil['estatisticas'] is not None:
+            estatisticas = perfil['estatisticas'].reset_index()
+            estatisticas.rename(columns={'index': 'coluna'}, inplace=True)
+            estatisticas.to_csv(f'{pasta_output}/{nome_dataset}_estatisticas.csv', index=False)
+    
+    # 3. Distribuição de valores para colunas categóricas
+    with _cronometro(tempos, 'distribuicoes'):
+        for col, contagens in perfil['contagem_categorias'].items():
+            dist = contagens.reset_index()
+            dist.columns = [col, 'contagem']
+            dist.to_csv(f'{pasta_output}/{nome_dataset}_distribuicao_{col}.csv', index=False)
+    
+    return info
+
+def salvar_cardinalidade(perfil, nome_dataset, pasta_output='output'):
+    """Grava _cardinalidade.csv com o número aproximado de valores distintos de um perfil em blocos"""
+    cardinalidade = pd.DataFrame(list(perfil['valores_distintos_aprox'].items()),
+                                 columns=['coluna', 'valores_distintos_aprox'])
+    arquivo = f'{pasta_output}/{nome_dataset}_cardinalidade.csv'
+    cardinalidade.to_csv(arquivo, index=False)
+    return arquivo
+
+def fatias_dataframe(df, linhas_por_bloco=LINHAS_POR_BLOCO_PERFIL):
+    """Percorre o DataFrame em fatias de linhas, sem copiá-lo"""
+    for inicio in range(0, len(df), linhas_por_bloco):
+        yield df.iloc[inicio:inicio + linhas_por_bloco]
+
+def caracterizar_dataset_em_blocos(blocos, nome_dataset, pasta_output='output'):
+    """
+    Caracteriza um dataset que não cabe em memória a partir de um iterador de blocos
+    
+    Parâmetros:
+    blocos (iterable): DataFrames com as mesmas colunas, por exemplo
+        pd.read_csv(..., chunksize=...) ou estatisticas_streaming.blocos_parquet(...)
+    nome_dataset (str): Nome do dataset para uso nos arquivos de saída
+    pasta_output (str): Pasta onde os arquivos serão salvos
+    
+    Gera os mesmos _info.json e _estatisticas.csv de caracterizar_dataset, com
+    quantis aproximados; as distribuições só são gravadas quando exatas. O número
+    aproximado de valores distintos por coluna vai para _cardinalidade.csv.
+    """
+    if not os.path.exists(pasta_output):
+        os.makedirs(pasta_output)
+    
+    perfil = perfil_dos_acumuladores(acumular_blocos(blocos))
+    info = salvar_perfil(perfil, nome_dataset, pasta_output)
+    salvar_cardinalidade(perfil, nome_dataset, pasta_output)
+    
+    print(f"Caracterização em blocos do dataset '{nome_dataset}' concluída. Arquivos salvos em '{pasta_output}'")
+    return info
+
+def caracterizar_dataset(df, nome_dataset, pasta_output='output', formatos_exportacao=FORMATOS_PADRAO,
+                         dpi=DPI_PADRAO, formato_graficos=FORMATO_PADRAO, max_processos=None,
+                         pular_graficos_inalterados=True, metodo_correlacao='pearson', tempos=None,
+                         incremental=True, forcar=False, hashes=None, perfil_em_blocos=None):
     """
     Realiza análise exploratória para caracterizar o dataset
     
@@ -13,141 +103,167 @@ def caracterizar_dataset(df, nome_dataset, pasta_output='output'):
     df (DataFrame): DataFrame a ser analisado
     nome_dataset (str): Nome do dataset para uso nos arquivos de saída
     pasta_output (str): Pasta onde os arquivos serão salvos
+    formatos_exportacao (iterable): Formatos do arquivo para BI ('csv', 'parquet', 'feather', 'excel')
+    dpi (int): Resolução dos gráficos
+    formato_graficos (str): Formato dos gráficos ('png', 'svg', ...)
+    max_processos (int): Processos usados na renderização dos gráficos (1 para renderizar em série)
+    pular_graficos_inalterados (bool): Não renderiza gráficos cujos dados não mudaram desde a última execução
+    metodo_correlacao (str): 'pearson' ou 'spearman' (calculada sobre amostra em datasets grandes)
+    tempos (dict): Se informado, recebe os segundos de cada etapa ('perfil', 'info', 'estatisticas',
+        'distribuicoes', 'temporal', 'tarefas_graficos', 'cubos', e os dicts 'graficos' por arquivo
+        e 'exportacao' por formato)
+    incremental (bool): Pula as etapas cujos dados e parâmetros não mudaram desde a última
+        execução (manifesto .manifesto_<nome>.json na pasta de saída) e agrega os cubos só
+        nas partições alteradas
+    forcar (bool): Refaz todas as etapas, mesmo no modo incremental
+    hashes (ndarray): Hashes das linhas já calculados (pipeline_incremental.hashes_linhas)
+    perfil_em_blocos (bool): Calcula o perfil em blocos, como caracterizar_dataset_em_blocos,
+        e grava também _cardinalidade.csv (None: só acima de LIMIAR_PERFIL_EM_BLOCOS linhas)
     """
+    tempos_graficos = tempos_exportacao = None
+    if tempos is not None:
+        tempos_graficos = tempos.setdefault('graficos', {})
+        tempos_exportacao = tempos.setdefault('exportacao', {})
+    
     # Criar pasta de output se não existir
     if not os.path.exists(pasta_output):
         os.makedirs(pasta_output)
     
-    # 1. Informações gerais do dataset
-    info = {
-        'num_registros': len(df),
-        'num_colunas': len(df.columns),
-        'colunas': list(df.columns),
-        'tipos_dados': {col: str(df[col].dtype) for col in df.columns},
-        'valores_nulos': {col: int(df[col].isna().sum()) for col in df.columns},
-        'percentual_nulos': {col: float(df[col].isna().mean()*100) for col in df.columns}
-    }
+    def caminho(arquivo):
+        return f'{pasta_output}/{arquivo}'
     
-    # Salvar informações em JSON
-    with open(f'{pasta_output}/{nome_dataset}_info.json', 'w') as f:
-        json.dump(info, f, indent=4)
+    # Perfil calculado uma única vez e reutilizado pelos arquivos e gráficos
+    if perfil_em_blocos is None:
+        perfil_em_blocos = len(df) > LIMIAR_PERFIL_EM_BLOCOS
     
-    # 2. Estatísticas descritivas para colunas numéricas
-    colunas_numericas = df.select_dtypes(include=['number']).columns
-    if len(colunas_numericas) > 0:
-        estatisticas = df[colunas_numericas].describe().transpose().reset_index()
-        estatisticas.rename(columns={'index': 'coluna'}, inplace=True)
-        estatisticas.to_csv(f'{pasta_output}/{nome_dataset}_estatisticas.csv', index=False)
+    def etapa_perfil(df):
+        with _cronometro(tempos, 'perfil'):
+            if perfil_em_blocos:
+                return perfil_dos_acumuladores(acumular_blocos(fatias_dataframe(df)))
+            return calcular_perfil(df)
     
-    # 3. Distribuição de valores para colunas categóricas
-    colunas_categoricas = df.select_dtypes(exclude=['number']).columns
-    for col in colunas_categoricas:
-        if df[col].nunique() <= 30:  # Limitar para colunas com não muitas categorias
-            dist = df[col].value_counts().reset_index()
-            dist.columns = [col, 'contagem']
-            dist.to_csv(f'{pasta_output}/{nome_dataset}_distribuicao_{col}.csv', index=False)
+    # 1-3. Informações gerais, estatísticas descritivas e distribuições
+    def etapa_arquivos_perfil(perfil):
+        salvar_perfil(perfil, nome_dataset, pasta_output, tempos)
+        arquivos = [caminho(f'{nome_dataset}_info.json')]
+        if perfil['estatisticas'] is not None:
+            arquivos.append(caminho(f'{nome_dataset}_estatisticas.csv'))
+        arquivos += [caminho(f'{nome_dataset}_distribuicao_{col}.csv') for col in perfil['contagem_categorias']]
+        if 'valores_distintos_aprox' in perfil:
+            arquivos.append(salvar_cardinalidade(perfil, nome_dataset, pasta_output))
+        return arquivos
+    
+    # 4. Análise temporal (se aplicável), sem copiar nem alterar o df
+    def etapa_temporal(df, perfil):
+        with _cronometro(tempos, 'temporal'):
+            return analisar_temporal(df, perfil['colunas_data'], perfil['colunas_numericas'])
     
-    # 4. Análise temporal (se aplicável)
-    colunas_data = [col for col in df.columns if 'data' in col.lower() or 'date' in col.lower() or df[col].dtype == 'datetime64[ns]']
+    def etapa_arquivos_temporal(perfil, temporal):
+        arquivos = []
+        with _cronometro(tempos, 'temporal'):
+            for col_data, resultado in temporal.items():
+                sufixo = sufixo_coluna_data(col_data, perfil['colunas_data'])
+                for tabela in ('contagem_ano', 'contagem_mes'):
+                    arquivo = caminho(f"{nome_dataset}_contagem_por_{tabela.split('_')[1]}{sufixo}.csv")
+                    resultado[tabela].to_csv(arquivo, index=False)
+                    arquivos.append(arquivo)
+        return arquivos
     
-    for col_data in colunas_data:
+    # 5. Gerar visualizações úteis para o dashboard
+    def etapa_graficos(df, perfil, temporal):
+        colunas_numericas = perfil['colunas_numericas']
+        colunas_data = perfil['colunas_data']
+        arquivos = []
         try:
-            # Converter para datetime se ainda não estiver
-            if df[col_data].dtype != 'datetime64[ns]':
-                df[col_data] = pd.to_datetime(df[col_data], errors='coerce')
-            
-            # Extrair ano e mês
-            df['ano'] = df[col_data].dt.year
-            df['mes'] = df[col_data].dt.month
-            
-            # Contagem por ano
-            contagem_ano = df.groupby('ano').size().reset_index(name='contagem')
-            contagem_ano.to_csv(f'{pasta_output}/{nome_dataset}_contagem_por_ano.csv', index=False)
-            
-            # Contagem por mês (último ano)
-            ultimo_ano = df['ano'].max()
-            contagem_mes = df[df['ano'] == ultimo_ano].groupby('mes').size().reset_index(name='contagem')
-            contagem_mes.to_csv(f'{pasta_output}/{nome_dataset}_contagem_por_mes.csv', index=False)
-            
-            # Remover colunas temporárias
-            df.drop(['ano', 'mes'], axis=1, inplace=True, errors='ignore')
+            with _cronometro(tempos, 'tarefas_graficos'):
+                tarefas = []
+                
+                # a. Completude dos dados (fração de nulos por bloco de linhas)
+                tarefas.append(tarefa_grafico('valores_ausentes', f'{nome_dataset}_valores_ausentes',
+                                              'Mapa de Valores Ausentes no Dataset', mapa_completude(df)))
+                
+                # b. Histogramas para variáveis numéricas
+                for col in colunas_numericas[:5]:  # Limitar a 5 colunas para não gerar muitos gráficos
+                    # Hash da coluna (vetorizado) no lugar da serialização dos valores
+                    tarefas.append(tarefa_grafico('histograma', f'{nome_dataset}_histograma_{col}',
+                                                  f'Distribuição de {col}', df[col].dropna(),
+                                                  impressao=impressao_coluna(df[col])))
+                
+                # c. Barplot para variáveis categóricas
+                for col, contagens in perfil['contagem_categorias'].items():
+                    if perfil['cardinalidade'][col] <= 10:  # Limitar para colunas com poucas categorias
+                        tarefas.append(tarefa_grafico('barras', f'{nome_dataset}_barplot_{col}',
+                                                      f'Top 10 Categorias em {col}', contagens.nlargest(10)))
+                
+                # d. Correlação entre variáveis numéricas (se tiver mais de uma)
+                if len(colunas_numericas) > 1:
+                    # Amostra estratificada pela coluna categórica principal (por exemplo, o estado)
+                    corr = matriz_correlacao(df, colunas_numericas, metodo=metodo_correlacao,
+                                             coluna_estrato=escolher_coluna_estrato(perfil))
+                    tarefas.append(tarefa_grafico('correlacao', f'{nome_dataset}_correlacao',
+                                                  'Matriz de Correlação das Variáveis Numéricas', corr, figsize=(12, 10)))
+                
+                    # Pares mais correlacionados e dispersão (histograma 2D) dos mais fortes
+                    pares = pares_mais_correlacionados(corr)
+                    arquivos.append(caminho(f'{nome_dataset}_pares_correlacionados.csv'))
+                    pares.to_csv(arquivos[-1], index=False)
+                    for par in pares[pares['correlacao_abs'] >= LIMIAR_ALTA_CORRELACAO].head(3).itertuples():
+                        tarefas.append(tarefa_grafico('dispersao', f'{nome_dataset}_dispersao_{par.coluna_a}_{par.coluna_b}',
+                                                      f'{par.coluna_a} x {par.coluna_b} (r = {par.correlacao:.2f})',
+                                                      agregar_dispersao(df, par.coluna_a, par.coluna_b)))
+                
+                # e. Séries temporais (se aplicável), a partir das médias mensais já agregadas
+                for col_data, resultado in temporal.items():
+                    sufixo = sufixo_coluna_data(col_data, colunas_data)
+                    for col_num in colunas_numericas[:3]:  # Limitar a 3 colunas numéricas
+                        tarefas.append(tarefa_grafico('serie_temporal', f'{nome_dataset}_serie_temporal{sufixo}_{col_num}',
+                                                      f'Série Temporal de {col_num} (Média Mensal)',
+                                                      resultado['medias_mensais'][col_num], figsize=(12, 6)))
             
+            arquivos += renderizar_graficos(tarefas, pasta_output, dpi=dpi, formato=formato_graficos,
+                                            max_processos=max_processos, pular_inalterados=pular_graficos_inalterados,
+                                            arquivo_hashes=caminho(f'.graficos_hash_{nome_dataset}.json'),
+                                            tempos=tempos_graficos)
+        
         except Exception as e:
-            print(f"Erro na análise temporal da coluna {col_data}: {e}")
+            print(f"Erro ao gerar visualizações: {e}")
+            return None
+        return arquivos
     
-    # 5. Gerar visualizações úteis para o dashboard
-    try:
-        # Configurar estilo
-        plt.style.use('seaborn-v0_8-whitegrid')
-        
-        # a. Completude dos dados (heatmap de valores nulos)
-        plt.figure(figsize=(10, 6))
-        sns.heatmap(df.isnull(), cbar=False, yticklabels=False, cmap='viridis')
-        plt.title('Mapa de Valores Ausentes no Dataset')
-        plt.tight_layout()
-        plt.savefig(f'{pasta_output}/{nome_dataset}_valores_ausentes.png', dpi=300)
-        plt.close()
-        
-        # b. Histogramas para variáveis numéricas
-        for col in colunas_numericas[:5]:  # Limitar a 5 colunas para não gerar muitos gráficos
-            plt.figure(figsize=(10, 6))
-            sns.histplot(df[col].dropna(), kde=True)
-            plt.title(f'Distribuição de {col}')
-            plt.tight_layout()
-            plt.savefig(f'{pasta_output}/{nome_dataset}_histograma_{col}.png', dpi=300)
-            plt.close()
-        
-        # c. Barplot para variáveis categóricas
-        for col in colunas_categoricas:
-            if df[col].nunique() <= 10:  # Limitar para colunas com poucas categorias
-                plt.figure(figsize=(10, 6))
-                top_cats = df[col].value_counts().nlargest(10)
-                sns.barplot(x=top_cats.index, y=top_cats.values)
-                plt.title(f'Top 10 Categorias em {col}')
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                plt.savefig(f'{pasta_output}/{nome_dataset}_barplot_{col}.png', dpi=300)
-                plt.close()
-        
-        # d. Correlação entre variáveis numéricas (se tiver mais de uma)
-        if len(colunas_numericas) > 1:
-            plt.figure(figsize=(12, 10))
-            corr = df[colunas_numericas].corr()
-            mask = np.triu(np.ones_like(corr, dtype=bool))
-            sns.heatmap(corr, mask=mask, annot=True, cmap='coolwarm', linewidths=.5)
-            plt.title('Matriz de Correlação das Variáveis Numéricas')
-            plt.tight_layout()
-            plt.savefig(f'{pasta_output}/{nome_dataset}_correlacao.png', dpi=300)
-            plt.close()
-        
-        # e. Séries temporais (se aplicável)
-        for col_data in colunas_data:
-            for col_num in colunas_numericas[:3]:  # Limitar a 3 colunas numéricas
-                try:
-                    plt.figure(figsize=(12, 6))
-                    df_temp = df.copy()
-                    df_temp[col_data] = pd.to_datetime(df_temp[col_data], errors='coerce')
-                    df_temp = df_temp.sort_values(col_data)
-                    df_temp = df_temp.set_index(col_data)
-                    df_temp[col_num].resample('M').mean().plot()
-                    plt.title(f'Série Temporal de {col_num} (Média Mensal)')
-                    plt.tight_layout()
-                    plt.savefig(f'{pasta_output}/{nome_dataset}_serie_temporal_{col_num}.png', dpi=300)
-                    plt.close()
-                except Exception as e:
-                    print(f"Erro ao criar série temporal para {col_num}: {e}")
-    
-    except Exception as e:
-        print(f"Erro ao gerar visualizações: {e}")
-    
-    # 6. Preparar arquivo para Power BI ou Tableau
-    # Salvar dataset completo em formato adequado para BI
-    df.to_csv(f'{pasta_output}/{nome_dataset}_para_bi.csv', index=False)
+    # 6. Tabelas pré-agregadas lidas pelo dashboard (no lugar do dataset completo)
+    def etapa_cubos(df, perfil):
+        pasta_parciais = caminho(f'.parciais_cubos_{nome_dataset}') if incremental else None
+        with _cronometro(tempos, 'cubos'):
+            cubos = criar_cubos_bi(df, nome_dataset, perfil, pasta_output, pasta_parciais, hashes)
+        return [caminho(arquivo) for arquivo in cubos.values()]
     
-    try:
-        df.to_excel(f'{pasta_output}/{nome_dataset}_para_bi.xlsx', index=False)
-    except Exception as e:
-        print(f"Erro ao salvar em Excel, tente instalar openpyxl: {e}")
+    # 7. Preparar arquivo para Power BI ou Tableau
+    # Salvar dataset completo em formato adequado para BI (Excel só se pedido)
+    def etapa_exportacao(df):
+        arquivos = exportar_para_bi(df, nome_dataset, pasta_output, formatos=formatos_exportacao,
+                                    tempos=tempos_exportacao)
+        return list(arquivos.values())
+    
+    etapas = {
+        'perfil': {'funcao': etapa_perfil, 'depende_de': ['df'], 'parametros': [perfil_em_blocos]},
+        'arquivos_perfil': {'funcao': etapa_arquivos_perfil, 'depende_de': ['perfil'], 'gera_arquivos': True},
+        'temporal': {'funcao': etapa_temporal, 'depende_de': ['df', 'perfil']},
+        'arquivos_temporal': {'funcao': etapa_arquivos_temporal, 'depende_de': ['perfil', 'temporal'],
+                              'gera_arquivos': True},
+        'graficos': {'funcao': etapa_graficos, 'depende_de': ['df', 'perfil', 'temporal'], 'gera_arquivos': True,
+                     'parametros': [dpi, formato_graficos, metodo_correlacao]},
+        'cubos': {'funcao': etapa_cubos, 'depende_de': ['df', 'perfil'], 'gera_arquivos': True},
+        'exportacao': {'funcao': etapa_exportacao, 'depende_de': ['df'], 'gera_arquivos': True,
+                       'parametros': sorted(formatos_exportacao)}
+    }
+    
+    impressoes = None
+    if incremental:
+        hashes = hashes if hashes is not None else hashes_linhas(df)
+        impressoes = {'df': impressao_digital(df, hashes)}
+    executar_grafo(etapas, {'df': df}, caminho_manifesto(pasta_output, nome_dataset), impressoes=impressoes,
+                   forcar=forcar or not incremental)
     
     print(f"Caracterização do dataset '{nome_dataset}' concluída. Arquivos salvos em '{pasta_output}'")
-    return info 
\ No newline at end of file
+    with open(caminho(f'{nome_dataset}_info.json')) as f:
+        return json.load(f)
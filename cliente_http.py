@@ -0,0 +1,178 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentacao import etapa
+
+# Tempo máximo para conectar e entre dois pacotes recebidos (segundos)
+TIMEOUT_PADRAO = (10, 60)
+
+# Repetições com backoff exponencial e jitter
+MAX_TENTATIVAS = 5
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAXIMA_SEGUNDOS = 60.0
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# Requisições simultâneas por host (as demais esperam a vez); hosts não listados usam o padrão
+MAX_CONEXOES_POR_HOST = 8
+LIMITES_POR_HOST = {
+    'api.portaldatransparencia.gov.br': 4,
+    'servicodados.ibge.gov.br': 4,
+    'api.bcb.gov.br': 8,
+    'data.brasil.io': 2
+}
+
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024  # 1 MiB por escrita em disco
+INTERVALO_PROGRESSO_BYTES = 50 * 1024 * 1024  # Mostra o progresso a cada 50 MiB baixados
+
+_trava = threading.Lock()
+_sessao = None
+_pid_sessao = None
+_semaforos = {}
+
+def codificacoes_aceitas():
+    """gzip e deflate sempre; br quando brotli (ou brotlicffi) está instalado, pois o urllib3 precisa dele"""
+    codificacoes = ['gzip', 'deflate']
+    for modulo in ('brotli', 'brotlicffi'):
+        try:
+            __import__(modulo)
+        except ImportError:
+            continue
+        codificacoes.append('br')
+        break
+    return ', '.join(codificacoes)
+
+def obter_sessao():
+    """Sessão compartilhada com pool de conexões keep-alive (uma por processo)"""
+    global _sessao, _pid_sessao
+    with _trava:
+        # Processos filhos (fork) não reaproveitam as conexões do pai
+        if _sessao is None or _pid_sessao != os.getpid():
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=16, pool_maxsize=MAX_CONEXOES_POR_HOST)
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            sessao.headers['Accept-Encoding'] = codificacoes_aceitas()
+            _sessao, _pid_sessao = sessao, os.getpid()
+        return _sessao
+
+def semaforo_host(url):
+    """Semáforo que limita as requisições simultâneas ao host da URL"""
+    host = urlparse(url).hostname or ''
+    with _trava:
+        if host not in _semaforos:
+            _semaforos[host] = threading.BoundedSemaphore(LIMITES_POR_HOST.get(host, MAX_CONEXOES_POR_HOST))
+        return _semaforos[host]
+
+def espera_repeticao(tentativa, response=None):
+    """Segundos até a próxima tentativa: Retry-After do servidor ou backoff exponencial com jitter"""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        if retry_after.isdigit():
+            return min(int(retry_after), ESPERA_MAXIMA_SEGUNDOS)
+        try:
+            segundos = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            return min(max(segundos, 0), ESPERA_MAXIMA_SEGUNDOS)
+        except (TypeError, ValueError):
+            pass
+    return min(ESPERA_BASE_SEGUNDOS * 2 ** tentativa, ESPERA_MAXIMA_SEGUNDOS) * (0.5 + random.random())
+
+def _executar_com_repeticoes(url, funcao, max_tentativas, limitador):
+    # Chama funcao(sessao) até obter uma resposta não retentável; repete em erros de rede e 429/5xx
+    sessao = obter_sessao()
+    for tentativa in range(max_tentativas):
+        if limitador is not None:
+            limitador.aguardar()
+        try:
+            with semaforo_host(url):
+                response = funcao(sessao)
+        except requests.RequestException as e:
+            if tentativa == max_tentativas - 1:
+                raise
+            espera = espera_repeticao(tentativa)
+            print(f"Erro ao acessar {url} ({type(e).__name__}), nova tentativa em {espera:.1f}s")
+        else:
+            if response.status_code not in STATUS_RETENTAVEIS or tentativa == max_tentativas - 1:
+                return response, tentativa + 1
+            espera = espera_repeticao(tentativa, response)
+            response.close()
+            print(f"{url} respondeu {response.status_code}, nova tentativa em {espera:.1f}s")
+        time.sleep(espera)
+
+def requisitar(url, params=None, headers=None, timeout=TIMEOUT_PADRAO, max_tentativas=MAX_TENTATIVAS,
+               limitador=None, **atributos):
+    """
+    GET com a sessão compartilhada, timeouts e repetições
+
+    Erros de rede, timeouts e respostas 429/5xx são repetidos com backoff exponencial
+    e jitter (respeitando Retry-After). O corpo é lido por completo dentro do limite
+    de conexões do host. Retorna a última resposta, qualquer que seja o status; só
+    levanta exceção se a última tentativa falhar na rede.
+
+    Parâmetros:
+    limitador: Objeto com aguardar(), chamado antes de cada tentativa (limite de taxa da API)
+    atributos: Atributos extras da etapa 'download' nas métricas de execução
+    """
+    with etapa('download', url=url, **atributos) as medicao:
+        def obter(sessao):
+            response = sessao.get(url, params=params, headers=headers, timeout=timeout)
+            response.content  # Ler o corpo ainda dentro do limite do host
+            return response
+        response, tentativas = _executar_com_repeticoes(url, obter, max_tentativas, limitador)
+        medicao.registrar(status=response.status_code, tentativas=tentativas, bytes_entrada=len(response.content))
+    return response
+
+def baixar_para_arquivo(url, caminho, params=None, headers=None, timeout=TIMEOUT_PADRAO,
+                        max_tentativas=MAX_TENTATIVAS, limitador=None, **atributos):
+    """
+    GET em streaming gravando o corpo em caminho, em blocos, com progresso e SHA-256
+
+    A gravação vai para caminho + '.tmp' e só substitui o arquivo ao final; uma queda
+    no meio do corpo recomeça o download na próxima tentativa. Respostas diferentes
+    de 200 (por exemplo 304) não gravam nada.
+
+    Retorna (response, bytes gravados, sha256 do corpo ou None).
+    """
+    nome = os.path.basename(urlparse(url).path) or url
+    with etapa('download', url=url, **atributos) as medicao:
+        def baixar(sessao):
+            response = sessao.get(url, params=params, headers=headers, timeout=timeout, stream=True)
+            if response.status_code != 200:
+                response.close()
+                return response
+            # Com Content-Encoding o Content-Length é do corpo comprimido e não serve para o percentual
+            total_esperado = 0 if response.headers.get('Content-Encoding') else int(response.headers.get('Content-Length') or 0)
+            hash_corpo = hashlib.sha256()
+            total_bytes = 0
+            proximo_aviso = INTERVALO_PROGRESSO_BYTES
+            caminho_tmp = caminho + '.tmp'
+            try:
+                with response, open(caminho_tmp, 'wb') as f:
+                    for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                        if bloco:
+                            f.write(bloco)
+                            hash_corpo.update(bloco)
+                            total_bytes += len(bloco)
+                            if total_bytes >= proximo_aviso:
+                                percentual = f" ({100 * total_bytes / total_esperado:.0f}%)" if total_esperado else ""
+                                print(f"Baixando {nome}: {total_bytes / 1024 ** 2:.0f} MiB{percentual}")
+                                proximo_aviso += INTERVALO_PROGRESSO_BYTES
+            except BaseException:
+                if os.path.exists(caminho_tmp):
+                    os.remove(caminho_tmp)
+                raise
+            os.replace(caminho_tmp, caminho)
+            response.total_bytes = total_bytes
+            response.sha256 = hash_corpo.hexdigest()
+            return response
+
+        response, tentativas = _executar_com_repeticoes(url, baixar, max_tentativas, limitador)
+        total_bytes = getattr(response, 'total_bytes', 0)
+        medicao.registrar(status=response.status_code, tentativas=tentativas, bytes_entrada=total_bytes)
+    return response, total_bytes, getattr(response, 'sha256', None)
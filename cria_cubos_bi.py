@@ -0,0 +1,172 @@
+import pandas as pd
+import os
+from analisa_temporal import converter_datas
+from pipeline_incremental import (hashes_linhas, impressoes_particoes, impressao_parametros,
+                                  ler_manifesto, gravar_manifesto)
+
+# Dimensões categóricas com até este número de valores ganham um cubo próprio
+LIMITE_CATEGORIAS_CUBO = 30
+SUFIXOS_PARCIAIS = {'sum': 'soma', 'count': 'n'}
+COLUNA_PARTICAO = '_particao'
+
+def medidas_parciais(df, chaves, colunas_numericas):
+    """
+    Contagem de registros e soma e número de valores preenchidos de cada medida por chave
+
+    Ao contrário da média, essas medidas podem ser somadas entre partições do dataset.
+    Retorna um DataFrame com as chaves como colunas (categorias convertidas para os valores).
+    """
+    agrupado = df[list(colunas_numericas)].groupby(chaves, observed=True)
+    partes = [agrupado.size().rename('contagem')]
+    if colunas_numericas:
+        medidas = agrupado.agg(['sum', 'count'])
+        medidas.columns = [f'{col}_{SUFIXOS_PARCIAIS[agg]}' for col, agg in medidas.columns]
+        partes.append(medidas)
+    parciais = pd.concat(partes, axis=1).reset_index()
+    for col in parciais.columns:
+        if isinstance(parciais[col].dtype, pd.CategoricalDtype):
+            parciais[col] = parciais[col].astype(parciais[col].cat.categories.dtype)
+    return parciais
+
+def combinar_parciais(parciais, nomes_chaves, colunas_numericas):
+    """Soma as medidas parciais por chave e calcula a média de cada medida (soma / preenchidos)"""
+    total = parciais.groupby(list(nomes_chaves), observed=True, dropna=False).sum(numeric_only=True)
+    cubo = total[['contagem']].copy()
+    for col in colunas_numericas:
+        cubo[f'{col}_soma'] = total[f'{col}_soma']
+        cubo[f'{col}_media'] = total[f'{col}_soma'] / total[f'{col}_n'].where(total[f'{col}_n'] > 0)
+    return cubo.reset_index()
+
+def agregar_medidas(df, chaves, colunas_numericas):
+    """Contagem de registros e soma/média de cada medida numérica por chave (Series), em um único groupby"""
+    parciais = medidas_parciais(df, chaves, colunas_numericas)
+    return combinar_parciais(parciais, [chave.name for chave in chaves], colunas_numericas)
+
+def cubo_completude(perfil):
+    """Nulos e preenchimento por coluna, a partir do perfil já calculado"""
+    return pd.DataFrame({
+        'coluna': perfil['colunas'],
+        'valores_nulos': perfil['valores_nulos'].to_numpy(),
+        'percentual_nulos': perfil['percentual_nulos'].to_numpy(),
+        'percentual_preenchido': 100 - perfil['percentual_nulos'].to_numpy()
+    })
+
+def agregar_incremental(df, cubos, particao, colunas_numericas, pasta_parciais, hashes=None):
+    """
+    Agrega os cubos reaproveitando as medidas parciais das partições que não mudaram
+
+    As medidas parciais por partição (mês da coluna de data, ou ano) ficam em
+    pasta_parciais, com a impressão digital de cada partição. Na execução seguinte
+    só as partições alteradas são agregadas de novo: quando dias novos são anexados
+    ao dataset, apenas os meses que os receberam.
+
+    Parâmetros:
+    cubos (dict): nome do cubo -> lista de chaves (Series alinhadas ao df)
+    particao (Series): Partição de cada linha (None para o dataset inteiro como uma partição)
+    hashes (ndarray): Hashes das linhas já calculados (pipeline_incremental.hashes_linhas)
+
+    Retorna um dict nome do cubo -> DataFrame agregado.
+    """
+    if particao is None:
+        particao = pd.Series(0, index=df.index)
+    particao = particao.fillna(-1).astype('int64').rename(COLUNA_PARTICAO)
+    impressoes = impressoes_particoes(hashes if hashes is not None else hashes_linhas(df), particao)
+
+    # Parciais anteriores só valem para os mesmos cubos, chaves e colunas
+    assinatura = impressao_parametros(list(map(str, df.columns)), colunas_numericas,
+                                      {nome: [str(chave.name) for chave in chaves] for nome, chaves in cubos.items()})
+    arquivo_estado = os.path.join(pasta_parciais, 'particoes.json')
+    estado = ler_manifesto(arquivo_estado)
+    anteriores = {}
+    if estado.get('assinatura') == assinatura and all(
+            os.path.exists(os.path.join(pasta_parciais, f'{nome}.parquet')) for nome in cubos):
+        anteriores = estado['particoes']
+    mantidas = [int(p) for p, impressao in impressoes.items() if anteriores.get(p) == impressao]
+    alteradas = len(impressoes) - len(mantidas)
+
+    if mantidas:
+        mascara = ~particao.isin(mantidas).to_numpy()
+        medidas = df.loc[mascara, list(colunas_numericas)]
+        selecionar = lambda serie: serie[mascara]
+    else:
+        medidas = df
+        selecionar = lambda serie: serie
+
+    os.makedirs(pasta_parciais, exist_ok=True)
+    resultados = {}
+    for nome_cubo, chaves in cubos.items():
+        arquivo = os.path.join(pasta_parciais, f'{nome_cubo}.parquet')
+        parciais = medidas_parciais(medidas, [selecionar(chave) for chave in chaves] + [selecionar(particao)],
+                                    colunas_numericas)
+        if mantidas:
+            anteriores_cubo = pd.read_parquet(arquivo)
+            anteriores_cubo = anteriores_cubo[anteriores_cubo[COLUNA_PARTICAO].isin(mantidas)]
+            parciais = pd.concat([anteriores_cubo, parciais], ignore_index=True)
+        parciais.to_parquet(arquivo, index=False)
+        resultados[nome_cubo] = combinar_parciais(parciais, [chave.name for chave in chaves], colunas_numericas)
+
+    gravar_manifesto(arquivo_estado, {'assinatura': assinatura, 'particoes': impressoes})
+    print(f"Cubos: {alteradas} de {len(impressoes)} partições agregadas, {len(mantidas)} reaproveitadas")
+    return resultados
+
+def criar_cubos_bi(df, nome_dataset, perfil, pasta_output='output', pasta_parciais=None, hashes=None):
+    """
+    Grava tabelas-resumo pequenas para cada visualização do dashboard
+
+    - {nome}_cubo_resumo.csv: número de registros e de colunas
+    - {nome}_cubo_completude.csv: nulos e preenchimento por coluna
+    - {nome}_cubo_anual.csv / {nome}_cubo_mensal.csv: contagem e soma/média das
+      medidas por ano e por mês (primeira coluna de data, ou a coluna 'ano')
+    - {nome}_cubo_<coluna>.csv: o mesmo por categoria, para dimensões com poucos valores
+
+    Com pasta_parciais, as medidas são agregadas por partição temporal e só as
+    partições alteradas desde a última execução são recalculadas (agregar_incremental).
+
+    Retorna um dict nome do cubo -> arquivo gravado.
+    """
+    colunas_numericas = [col for col in perfil['colunas_numericas'] if col != 'ano']
+    arquivos = {}
+
+    def gravar(nome_cubo, cubo):
+        arquivo = f'{nome_dataset}_cubo_{nome_cubo}.csv'
+        cubo.to_csv(f'{pasta_output}/{arquivo}', index=False)
+        arquivos[nome_cubo] = arquivo
+
+    gravar('resumo', pd.DataFrame({'num_registros': [perfil['num_registros']],
+                                   'num_colunas': [perfil['num_colunas']]}))
+    gravar('completude', cubo_completude(perfil))
+
+    # Chaves dos cubos temporais; o mês (ou o ano) também é a partição da agregação incremental
+    cubos = {}
+    chave_ano = particao = None
+    if perfil['colunas_data']:
+        datas = converter_datas(df[perfil['colunas_data'][0]])
+        if datas.notna().any():
+            chave_ano = datas.dt.year.rename('ano')
+            chave_mes = datas.dt.month.rename('mes')
+            cubos['mensal'] = [chave_ano, chave_mes]
+            particao = chave_ano * 100 + chave_mes
+    if chave_ano is None and 'ano' in df.columns:
+        chave_ano = pd.to_numeric(df['ano'], errors='coerce').rename('ano')
+        particao = chave_ano
+    if chave_ano is not None:
+        cubos['anual'] = [chave_ano]
+
+    # Cubos por dimensão categórica
+    for col, cardinalidade in perfil['cardinalidade'].items():
+        if col in perfil['colunas_data'] or cardinalidade > LIMITE_CATEGORIAS_CUBO:
+            continue
+        cubos[str(col)] = [df[col]]
+
+    agregados = None
+    if pasta_parciais is not None:
+        try:
+            agregados = agregar_incremental(df, cubos, particao, colunas_numericas, pasta_parciais, hashes)
+        except ImportError as e:
+            print(f"Agregação incremental indisponível, tente instalar pyarrow: {e}")
+    if agregados is None:
+        agregados = {nome_cubo: agregar_medidas(df, chaves, colunas_numericas) for nome_cubo, chaves in cubos.items()}
+
+    for nome_cubo, cubo in agregados.items():
+        gravar(nome_cubo, cubo)
+    return arquivos
@@ -1,9 +1,45 @@
 import json
+import glob
+import os
+from instrumentacao import instrumentar
 
-def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
+# Cubos gerados por cria_cubos_bi que não são por dimensão categórica
+CUBOS_FIXOS = ('resumo', 'completude', 'anual', 'mensal')
+
+def dimensoes_cubos(pasta_input, nome_dataset):
+    """Colunas categóricas que têm um cubo {nome}_cubo_<coluna>.csv na pasta"""
+    prefixo = f'{nome_dataset}_cubo_'
+    dimensoes = []
+    for caminho in sorted(glob.glob(os.path.join(pasta_input, f'{prefixo}*.csv'))):
+        dimensao = os.path.basename(caminho)[len(prefixo):-len('.csv')]
+        if dimensao not in CUBOS_FIXOS:
+            dimensoes.append(dimensao)
+    return dimensoes
+
+# Um modelo por dataset: no Executa, aninhado na etapa 'dashboard' ('dashboard/modelo_dashboard')
+@instrumentar('modelo_dashboard')
+def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios', formato_graficos='png'):
     """
     Cria um modelo conceitual de como seria o dashboard no Power BI
+
+    As visualizações leem as tabelas pré-agregadas (_cubo_*.csv) em vez do
+    dataset completo, que continua exportado para quem quiser explorá-lo.
+    Retorna o caminho do modelo, gravado em pasta_input.
     """
+    # Um gráfico de colunas por dimensão categórica com cubo gerado, abaixo da evolução mensal
+    visualizacoes_dimensoes = []
+    for i, dimensao in enumerate(dimensoes_cubos(pasta_input, nome_dataset)):
+        visualizacoes_dimensoes.append({
+            "title": f"Registros por {dimensao}",
+            "type": "column_chart",
+            "position": {"x": 12 * (i % 2), "y": 12 + 12 * (i // 2), "width": 12, "height": 12},
+            "data": {
+                "source": f"{nome_dataset}_cubo_{dimensao}.csv",
+                "xAxis": dimensao,
+                "yAxis": "contagem"
+            }
+        })
+
     modelo = {
         "dashboardTitle": f"Caracterização do Dataset - {nome_dataset}",
         "pages": [
@@ -15,8 +51,8 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
                         "type": "card",
                         "position": {"x": 0, "y": 0, "width": 8, "height": 4},
                         "data": {
-                            "source": f"{nome_dataset}_para_bi.csv",
-                            "measure": "COUNT()"
+                            "source": f"{nome_dataset}_cubo_resumo.csv",
+                            "measure": "num_registros"
                         }
                     },
                     {
@@ -24,7 +60,7 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
                         "type": "heatmap",
                         "position": {"x": 8, "y": 0, "width": 16, "height": 12},
                         "data": {
-                            "source": f"{nome_dataset}_valores_ausentes.png"
+                            "source": f"{nome_dataset}_valores_ausentes.{formato_graficos}"
                         }
                     },
                     {
@@ -32,10 +68,18 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
                         "type": "column_chart",
                         "position": {"x": 0, "y": 12, "width": 24, "height": 12},
                         "data": {
-                            "source": f"{nome_dataset}_contagem_por_ano.csv",
+                            "source": f"{nome_dataset}_cubo_anual.csv",
                             "xAxis": "ano",
                             "yAxis": "contagem"
                         }
+                    },
+                    {
+                        "title": "Completude por Coluna",
+                        "type": "table",
+                        "position": {"x": 0, "y": 24, "width": 24, "height": 8},
+                        "data": {
+                            "source": f"{nome_dataset}_cubo_completude.csv"
+                        }
                     }
                 ]
             },
@@ -55,7 +99,7 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
                         "type": "image",
                         "position": {"x": 0, "y": 8, "width": 12, "height": 12},
                         "data": {
-                            "source": f"{nome_dataset}_histograma_valor.png"
+                            "source": f"{nome_dataset}_histograma_valor.{formato_graficos}"
                         }
                     },
                     {
@@ -63,16 +107,45 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
                         "type": "image",
                         "position": {"x": 12, "y": 8, "width": 12, "height": 12},
                         "data": {
-                            "source": f"{nome_dataset}_correlacao.png"
+                            "source": f"{nome_dataset}_correlacao.{formato_graficos}"
+                        }
+                    }
+                ]
+            },
+            {
+                "name": "Análise de Correlações",
+                "visualizations": [
+                    {
+                        "title": "Pares Mais Correlacionados",
+                        "type": "table",
+                        "position": {"x": 0, "y": 0, "width": 24, "height": 8},
+                        "data": {
+                            "source": f"{nome_dataset}_pares_correlacionados.csv"
                         }
                     }
                 ]
+            },
+            {
+                "name": "Agregações",
+                "visualizations": [
+                    {
+                        "title": "Evolução Mensal",
+                        "type": "line_chart",
+                        "position": {"x": 0, "y": 0, "width": 24, "height": 12},
+                        "data": {
+                            "source": f"{nome_dataset}_cubo_mensal.csv",
+                            "xAxis": ["ano", "mes"],
+                            "yAxis": "contagem"
+                        }
+                    }
+                ] + visualizacoes_dimensoes
             }
         ]
     }
     
-    # Salvar o modelo como um JSON
-    with open(f'modelo_dashboard_{nome_dataset}.json', 'w') as f:
+    # Salvar o modelo como um JSON, junto com os arquivos que ele referencia
+    arquivo_modelo = os.path.join(pasta_input, f'modelo_dashboard_{nome_dataset}.json')
+    with open(arquivo_modelo, 'w') as f:
         json.dump(modelo, f, indent=4)
     
     print(f"Modelo de dashboard para {nome_dataset} criado.")
@@ -81,4 +154,4 @@ def criar_modelo_power_bi(pasta_input='output', nome_dataset='pib_municipios'):
     print(f"2. Importe os arquivos da pasta {pasta_input}")
     print("3. Crie as visualizações conforme o modelo")
     
-    return modelo 
\ No newline at end of file
+    return arquivo_modelo 
\ No newline at end of file
@@ -0,0 +1,46 @@
+import numpy as np
+
+# Semente padrão dos geradores de dados de exemplo
+SEED_PADRAO = 42
+
+def gerador_bloco(seed, indice_bloco):
+    """Gerador aleatório próprio de cada bloco, derivado da semente (blocos reproduzíveis e independentes)"""
+    return np.random.default_rng([seed, indice_bloco])
+
+def gravar_blocos(blocos, arquivo):
+    """Grava um iterador de DataFrames em CSV ou Parquet (pela extensão), um bloco de cada vez"""
+    escritor = None
+    try:
+        for i, bloco in enumerate(blocos):
+            if arquivo.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if escritor is None:
+                    tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                    escritor = pq.ParquetWriter(arquivo, tabela.schema, compression='zstd')
+                else:
+                    tabela = pa.Table.from_pandas(bloco, schema=escritor.schema, preserve_index=False)
+                escritor.write_table(tabela)
+            else:
+                bloco.to_csv(arquivo, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+def gerar_dados(gerar_bloco, num_linhas, arquivo, seed=SEED_PADRAO, linhas_por_bloco=None):
+    """
+    Executa gerar_bloco(rng, inicio, fim), que devolve as linhas [inicio, fim) do dataset
+
+    Sem linhas_por_bloco, gera tudo de uma vez, grava em arquivo e retorna o DataFrame.
+    Com linhas_por_bloco, grava bloco a bloco sem manter o dataset em memória e
+    retorna o caminho do arquivo (para datasets de carga com dezenas de milhões de linhas).
+    """
+    if linhas_por_bloco is None:
+        df = gerar_bloco(gerador_bloco(seed, 0), 0, num_linhas)
+        gravar_blocos([df], arquivo)
+        return df
+
+    blocos = (gerar_bloco(gerador_bloco(seed, i), inicio, min(inicio + linhas_por_bloco, num_linhas))
+              for i, inicio in enumerate(range(0, num_linhas, linhas_por_bloco)))
+    gravar_blocos(blocos, arquivo)
+    return arquivo
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+# Linhas acumuladas nos buffers de colunas antes de virar um bloco de DataFrame
+LINHAS_POR_BLOCO_JSON = 100000
+
+COLUNAS_INDICADORES = ['indicador', 'localidade_id', 'localidade_nome', 'ano', 'valor']
+
+_aviso_ijson_exibido = False
+
+def importar_ijson():
+    """Módulo ijson, ou None (com um aviso na primeira vez) para usar response.json()"""
+    global _aviso_ijson_exibido
+    try:
+        import ijson
+        return ijson
+    except ImportError:
+        if not _aviso_ijson_exibido:
+            print("ijson não encontrado. Tente instalar com: pip install ijson (usando response.json())")
+            _aviso_ijson_exibido = True
+        return None
+
+def _bloco(colunas):
+    # Mesma construção do achatamento em memória: arrays de objetos e inferência dos tipos
+    return pd.DataFrame({nome: np.array(valores, dtype=object) for nome, valores in colunas.items()}).infer_objects()
+
+def _concatenar(blocos, colunas):
+    blocos = list(blocos)
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    if len(blocos) == 1:
+        return blocos[0]
+    return pd.concat(blocos, ignore_index=True)
+
+def blocos_registros(arquivo, prefixo, campos, linhas_por_bloco=LINHAS_POR_BLOCO_JSON):
+    """
+    Lê uma lista de objetos planos de um JSON (por exemplo [{"data": ..., "valor": ...}]) em blocos
+
+    Parâmetros:
+    arquivo: Arquivo binário aberto
+    prefixo (str): Caminho ijson da lista ('item' para a raiz, 'projecao.item' para {"projecao": [...]})
+    campos (list): Campos de cada objeto que viram colunas (campos ausentes ficam None)
+    """
+    ijson = importar_ijson()
+    if ijson is None:
+        raise ImportError("ijson")
+
+    colunas = {campo: [] for campo in campos}
+    atual = None
+    for caminho, evento, valor in ijson.parse(arquivo, use_float=True):
+        if caminho == prefixo:
+            if evento == 'start_map':
+                atual = dict.fromkeys(campos)
+            elif evento == 'end_map':
+                for campo in campos:
+                    colunas[campo].append(atual[campo])
+                if len(colunas[campos[0]]) >= linhas_por_bloco:
+                    yield _bloco(colunas)
+                    colunas = {campo: [] for campo in campos}
+        elif atual is not None and evento not in ('map_key', 'start_map', 'start_array', 'end_map', 'end_array'):
+            campo = caminho[len(prefixo) + 1:]
+            if campo in colunas:
+                atual[campo] = valor
+    if colunas[campos[0]]:
+        yield _bloco(colunas)
+
+def ler_registros(arquivo, prefixo, campos, linhas_por_bloco=LINHAS_POR_BLOCO_JSON):
+    """DataFrame com os campos de uma lista de objetos planos, decodificada em blocos"""
+    return _concatenar(blocos_registros(arquivo, prefixo, campos, linhas_por_bloco), campos)
+
+def blocos_indicadores_ibge(arquivo, linhas_por_bloco=LINHAS_POR_BLOCO_JSON):
+    """
+    Decodifica a resposta da API de indicadores do IBGE evento a evento, em blocos de linhas
+
+    Cada ponto não nulo das séries vira uma linha (indicador, localidade_id,
+    localidade_nome, ano, valor), como em achatar_resultados_indicadores, sem
+    montar a árvore de objetos do JSON inteiro: a memória fica limitada aos
+    buffers de um bloco e aos pontos de uma localidade.
+    """
+    ijson = importar_ijson()
+    if ijson is None:
+        raise ImportError("ijson")
+
+    prefixo_localidade = 'item.resultados.item.localidades.item'
+    prefixo_serie = prefixo_localidade + '.series.item.serie'
+
+    colunas = {nome: [] for nome in COLUNAS_INDICADORES}
+    indicador = None
+    pendentes = []  # Localidades lidas antes do nome do indicador, se vier depois dos resultados
+    localidade_id = localidade_nome = None
+    anos, valores = [], []
+    ano = None
+
+    def anexar(indicador, localidade_id, localidade_nome, anos, valores):
+        colunas['indicador'].extend([indicador] * len(anos))
+        colunas['localidade_id'].extend([localidade_id] * len(anos))
+        colunas['localidade_nome'].extend([localidade_nome] * len(anos))
+        colunas['ano'].extend(anos)
+        colunas['valor'].extend(valores)
+
+    for caminho, evento, valor in ijson.parse(arquivo, use_float=True):
+        if caminho == prefixo_serie:
+            if evento == 'map_key':
+                ano = valor
+        elif caminho.startswith(prefixo_serie):
+            # Valor de um ano da série; pontos nulos são descartados
+            if valor is not None:
+                anos.append(ano)
+                valores.append(valor)
+        elif caminho == prefixo_localidade + '.id':
+            localidade_id = valor
+        elif caminho == prefixo_localidade + '.nome':
+            localidade_nome = valor
+        elif caminho == prefixo_localidade and evento == 'end_map':
+            if indicador is None:
+                pendentes.append((localidade_id, localidade_nome, anos, valores))
+            else:
+                anexar(indicador, localidade_id, localidade_nome, anos, valores)
+            localidade_id = localidade_nome = None
+            anos, valores = [], []
+            if len(colunas['ano']) >= linhas_por_bloco:
+                yield _bloco(colunas)
+                colunas = {nome: [] for nome in COLUNAS_INDICADORES}
+        elif caminho == 'item.indicador':
+            indicador = valor
+        elif caminho == 'item' and evento == 'end_map':
+            for pendente in pendentes:
+                anexar(indicador, *pendente)
+            indicador = None
+            pendentes = []
+    if colunas['ano']:
+        yield _bloco(colunas)
+
+def ler_indicadores_ibge(arquivo, linhas_por_bloco=LINHAS_POR_BLOCO_JSON):
+    """DataFrame longo dos indicadores do IBGE decodificado em blocos (vazio e sem colunas se não houver pontos)"""
+    blocos = list(blocos_indicadores_ibge(arquivo, linhas_por_bloco))
+    if not blocos:
+        return pd.DataFrame()
+    return _concatenar(blocos, COLUNAS_INDICADORES)
@@ -0,0 +1,274 @@
+import pandas as pd
+import numpy as np
+from perfila_dataset import LIMITE_CATEGORIAS, detectar_colunas_data
+
+# Parâmetros dos esboços
+CAPACIDADE_QUANTIS = 2000  # Itens por nível do esboço de quantis
+PRECISAO_HLL = 14  # 2^14 registros, erro padrão ~0,8%
+CAPACIDADE_FREQUENTES = 1000  # Contadores mantidos pelo Misra-Gries
+
+class EsbocoQuantis:
+    """
+    Esboço de quantis no estilo KLL
+
+    Cada nível guarda até `capacidade` valores com peso 2^nível; quando um nível
+    enche, ele é ordenado e metade dos valores (posições pares ou ímpares, ao
+    acaso) sobe para o nível seguinte. Dois esboços se combinam concatenando os
+    níveis e compactando de novo.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_QUANTIS, seed=0):
+        self.capacidade = capacidade
+        self.niveis = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def adicionar(self, valores):
+        self.niveis[0] = np.concatenate([self.niveis[0], np.asarray(valores, dtype=float)])
+        self._compactar()
+
+    def mesclar(self, outro):
+        for nivel, valores in enumerate(outro.niveis):
+            if nivel == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            self.niveis[nivel] = np.concatenate([self.niveis[nivel], valores])
+        self._compactar()
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveis):
+            valores = self.niveis[nivel]
+            if len(valores) > self.capacidade:
+                valores = np.sort(valores)
+                resto = valores[len(valores) - len(valores) % 2:]
+                promovidos = valores[self.rng.integers(2):len(valores) - len(resto):2]
+                self.niveis[nivel] = resto
+                if nivel + 1 == len(self.niveis):
+                    self.niveis.append(np.empty(0))
+                self.niveis[nivel + 1] = np.concatenate([self.niveis[nivel + 1], promovidos])
+            nivel += 1
+
+    def quantis(self, qs):
+        valores = np.concatenate(self.niveis)
+        if len(valores) == 0:
+            return [np.nan for _ in qs]
+        pesos = np.concatenate([np.full(len(v), 2.0 ** nivel) for nivel, v in enumerate(self.niveis)])
+        ordem = np.argsort(valores, kind='stable')
+        valores = valores[ordem]
+        acumulado = np.cumsum(pesos[ordem])
+        posicoes = np.searchsorted(acumulado, np.asarray(qs) * acumulado[-1], side='left')
+        return list(valores[np.minimum(posicoes, len(valores) - 1)])
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos (HyperLogLog), combinável pelo máximo dos registros"""
+
+    def __init__(self, precisao=PRECISAO_HLL):
+        self.precisao = precisao
+        self.registros = np.zeros(1 << precisao, dtype=np.uint8)
+
+    def adicionar(self, serie):
+        if len(serie) == 0:
+            return
+        hashes = pd.util.hash_pandas_object(serie, index=False).to_numpy(dtype=np.uint64)
+        bits_resto = 64 - self.precisao
+        indices = (hashes >> np.uint64(bits_resto)).astype(np.int64)
+        resto = hashes & np.uint64((1 << bits_resto) - 1)
+        # frexp devolve o número de bits significativos (exato, pois resto < 2^53)
+        _, tamanho_bits = np.frexp(resto.astype(np.float64))
+        posicao = (bits_resto - tamanho_bits + 1).astype(np.uint8)
+        np.maximum.at(self.registros, indices, posicao)
+
+    def mesclar(self, outro):
+        np.maximum(self.registros, outro.registros, out=self.registros)
+
+    def estimar(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / np.sum(2.0 ** -self.registros.astype(float))
+        zeros = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and zeros > 0:
+            estimativa = m * np.log(m / zeros)
+        return int(round(estimativa))
+
+class ContadorFrequentes:
+    """
+    Valores mais frequentes pelo algoritmo de Misra-Gries, combinável
+
+    Enquanto o número de valores distintos não passa da capacidade, as
+    contagens são exatas (`exato` permanece True).
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_FREQUENTES):
+        self.capacidade = capacidade
+        self.contagens = pd.Series(dtype='int64')
+        self.exato = True
+
+    def adicionar(self, serie):
+        contagens = serie.value_counts()
+        contagens = contagens[contagens > 0]
+        contagens.index = pd.Index(contagens.index.tolist(), dtype=object)
+        self._combinar(contagens)
+
+    def mesclar(self, outro):
+        self._combinar(outro.contagens)
+        self.exato = self.exato and outro.exato
+
+    def _combinar(self, contagens):
+        total = self.contagens.add(contagens, fill_value=0).astype('int64')
+        if len(total) > self.capacidade:
+            total = total.sort_values(ascending=False)
+            limiar = total.iloc[self.capacidade]
+            total = total[total > limiar] - limiar
+            self.exato = False
+        self.contagens = total
+
+    def mais_frequentes(self, n=None):
+        contagens = self.contagens.sort_values(ascending=False, kind='stable')
+        return contagens if n is None else contagens.head(n)
+
+class AcumuladorColuna:
+    """Estatísticas combináveis de uma coluna: contagens, nulos, momentos, extremos e esboços"""
+
+    def __init__(self, numerica):
+        self.numerica = numerica
+        self.tipo = None
+        self.contagem = 0
+        self.nulos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = np.nan
+        self.maximo = np.nan
+        self.distintos = HyperLogLog()
+        self.quantis = EsbocoQuantis() if numerica else None
+        self.frequentes = None if numerica else ContadorFrequentes()
+
+    def adicionar(self, serie):
+        self.tipo = combinar_tipos(self.tipo, serie.dtype)
+        nulos = serie.isna()
+        self.nulos += int(nulos.sum())
+        validos = serie[~nulos]
+        self.distintos.adicionar(validos)
+
+        if self.numerica:
+            valores = validos.to_numpy(dtype=float)
+            if len(valores) > 0:
+                media_bloco = valores.mean()
+                self._combinar_momentos(len(valores), media_bloco, ((valores - media_bloco) ** 2).sum(),
+                                        valores.min(), valores.max())
+                self.quantis.adicionar(valores)
+        else:
+            self.contagem += len(validos)
+            self.frequentes.adicionar(validos)
+
+    def _combinar_momentos(self, n, media, m2, minimo, maximo):
+        # Combinação de Welford/Chan para média e variância
+        total = self.contagem + n
+        delta = media - self.media
+        self.media += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.contagem * n / total
+        self.contagem = total
+        self.minimo = np.nanmin([self.minimo, minimo])
+        self.maximo = np.nanmax([self.maximo, maximo])
+
+    def mesclar(self, outro):
+        self.tipo = combinar_tipos(self.tipo, outro.tipo)
+        self.nulos += outro.nulos
+        self.distintos.mesclar(outro.distintos)
+        if self.numerica:
+            if outro.contagem > 0:
+                self._combinar_momentos(outro.contagem, outro.media, outro.m2, outro.minimo, outro.maximo)
+                self.quantis.mesclar(outro.quantis)
+        else:
+            self.contagem += outro.contagem
+            self.frequentes.mesclar(outro.frequentes)
+
+    def desvio_padrao(self):
+        return np.sqrt(self.m2 / (self.contagem - 1)) if self.contagem > 1 else np.nan
+
+def combinar_tipos(tipo_a, tipo_b):
+    """Tipo comum a dois blocos (por exemplo, int64 + float64 quando um bloco tem nulos)"""
+    if tipo_a is None or tipo_a == tipo_b:
+        return tipo_b
+    if tipo_b is None:
+        return tipo_a
+    try:
+        return np.result_type(tipo_a, tipo_b)
+    except TypeError:
+        return np.dtype(object)
+
+def coluna_numerica(serie):
+    """Mesmo critério de select_dtypes(include=['number']): booleanos não contam"""
+    return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+
+def acumular_blocos(blocos, acumuladores=None):
+    """Atualiza (ou cria) os acumuladores por coluna percorrendo um iterador de DataFrames"""
+    acumuladores = acumuladores if acumuladores is not None else {}
+    for bloco in blocos:
+        for col in bloco.columns:
+            if col not in acumuladores:
+                acumuladores[col] = AcumuladorColuna(coluna_numerica(bloco[col]))
+            acumuladores[col].adicionar(bloco[col])
+    return acumuladores
+
+def perfil_dos_acumuladores(acumuladores, limite_categorias=LIMITE_CATEGORIAS):
+    """
+    Monta um perfil com as mesmas chaves de perfila_dataset.calcular_perfil
+
+    Quantis e número de valores distintos são aproximados; as contagens por
+    categoria só entram quando são exatas.
+    """
+    colunas = list(acumuladores)
+    primeiro = next(iter(acumuladores.values()), None)
+    num_registros = primeiro.contagem + primeiro.nulos if primeiro else 0
+
+    nulos = pd.Series({col: a.nulos for col, a in acumuladores.items()}, dtype='int64')
+    colunas_numericas = pd.Index([col for col, a in acumuladores.items() if a.numerica])
+    colunas_categoricas = pd.Index([col for col, a in acumuladores.items() if not a.numerica])
+
+    estatisticas = None
+    if len(colunas_numericas) > 0:
+        linhas = {}
+        for col in colunas_numericas:
+            a = acumuladores[col]
+            q25, q50, q75 = a.quantis.quantis([0.25, 0.5, 0.75])
+            linhas[col] = {
+                'count': float(a.contagem),
+                'mean': a.media if a.contagem else np.nan,
+                'std': a.desvio_padrao(),
+                'min': a.minimo, '25%': q25, '50%': q50, '75%': q75, 'max': a.maximo
+            }
+        estatisticas = pd.DataFrame.from_dict(linhas, orient='index')
+
+    cardinalidade = {}
+    contagem_categorias = {}
+    for col in colunas_categoricas:
+        frequentes = acumuladores[col].frequentes
+        if frequentes.exato:
+            cardinalidade[col] = len(frequentes.contagens)
+            if cardinalidade[col] <= limite_categorias:
+                contagem_categorias[col] = frequentes.mais_frequentes()
+        else:
+            cardinalidade[col] = acumuladores[col].distintos.estimar()
+
+    amostra = pd.DataFrame({col: pd.Series(dtype=a.tipo) for col, a in acumuladores.items()})
+    return {
+        'num_registros': num_registros,
+        'num_colunas': len(colunas),
+        'colunas': colunas,
+        'tipos_dados': {col: str(a.tipo) for col, a in acumuladores.items()},
+        'valores_nulos': nulos,
+        'percentual_nulos': nulos / num_registros * 100 if num_registros else nulos * np.nan,
+        'colunas_numericas': colunas_numericas,
+        'colunas_categoricas': colunas_categoricas,
+        'colunas_data': detectar_colunas_data(amostra),
+        'estatisticas': estatisticas,
+        'cardinalidade': cardinalidade,
+        'contagem_categorias': contagem_categorias,
+        'valores_distintos_aprox': {col: a.distintos.estimar() for col, a in acumuladores.items()}
+    }
+
+def blocos_parquet(caminho, linhas_por_bloco=500000, colunas=None):
+    """Lê um arquivo Parquet em blocos de DataFrame (requer pyarrow)"""
+    import pyarrow.parquet as pq
+    arquivo = pq.ParquetFile(caminho)
+    for lote in arquivo.iter_batches(batch_size=linhas_por_bloco, columns=colunas):
+        yield lote.to_pandas()
@@ -0,0 +1,84 @@
+import os
+from instrumentacao import etapa
+
+# Formatos gravados por padrão; Excel é opcional por ser lento e limitado em linhas
+FORMATOS_PADRAO = ('csv', 'parquet')
+LINHAS_POR_BLOCO_CSV = 100000
+LIMITE_LINHAS_EXCEL = 1048576 - 1  # Uma linha fica para o cabeçalho
+LIMITE_CARDINALIDADE_CATEGORICA = 0.5  # Fração máxima de valores distintos para virar categoria
+
+def converter_categoricas(df, limite=LIMITE_CARDINALIDADE_CATEGORICA):
+    """Converte colunas de texto com poucos valores distintos em categorias (dictionary encoding)"""
+    df = df.copy(deep=False)
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        num_registros = len(df[col])
+        if num_registros > 0 and df[col].nunique() <= num_registros * limite:
+            df[col] = df[col].astype('category')
+    return df
+
+def escrever_csv(df, caminho_base, linhas_por_bloco=LINHAS_POR_BLOCO_CSV):
+    """Grava o CSV em blocos de linhas para limitar a memória da serialização"""
+    caminho = f'{caminho_base}.csv'
+    for inicio in range(0, max(len(df), 1), linhas_por_bloco):
+        df.iloc[inicio:inicio + linhas_por_bloco].to_csv(
+            caminho, index=False, mode='w' if inicio == 0 else 'a', header=inicio == 0)
+    return caminho
+
+def escrever_parquet(df, caminho_base, compressao='zstd'):
+    """Grava Parquet com categorias dictionary-encoded e compressão (requer pyarrow)"""
+    caminho = f'{caminho_base}.parquet'
+    converter_categoricas(df).to_parquet(caminho, index=False, compression=compressao)
+    return caminho
+
+def escrever_feather(df, caminho_base, compressao='zstd'):
+    """Grava Arrow IPC/Feather com categorias dictionary-encoded (requer pyarrow)"""
+    caminho = f'{caminho_base}.feather'
+    converter_categoricas(df).reset_index(drop=True).to_feather(caminho, compression=compressao)
+    return caminho
+
+def escrever_excel(df, caminho_base):
+    """Grava Excel (requer openpyxl); recusa datasets acima do limite de linhas do formato"""
+    if len(df) > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"{len(df)} linhas excedem o limite do Excel ({LIMITE_LINHAS_EXCEL})")
+    caminho = f'{caminho_base}.xlsx'
+    df.to_excel(caminho, index=False)
+    return caminho
+
+# Escritores disponíveis, por nome de formato
+ESCRITORES = {
+    'csv': escrever_csv,
+    'parquet': escrever_parquet,
+    'feather': escrever_feather,
+    'excel': escrever_excel
+}
+
+def exportar_para_bi(df, nome_dataset, pasta_output='output', formatos=FORMATOS_PADRAO, tempos=None):
+    """
+    Grava o dataset nos formatos pedidos para importação no Power BI ou Tableau
+
+    Parâmetros:
+    df (DataFrame): Dataset a ser exportado
+    nome_dataset (str): Nome base dos arquivos ({nome_dataset}_para_bi.<ext>)
+    pasta_output (str): Pasta onde os arquivos serão salvos
+    formatos (iterable): Nomes dos formatos em ESCRITORES
+    tempos (dict): Se informado, recebe os segundos gastos em cada formato
+
+    Retorna um dict formato -> caminho dos arquivos gravados com sucesso.
+    """
+    caminho_base = os.path.join(pasta_output, f'{nome_dataset}_para_bi')
+    arquivos = {}
+    for formato in formatos:
+        escritor = ESCRITORES.get(formato)
+        if escritor is None:
+            print(f"Formato de exportação desconhecido: {formato}")
+            continue
+        with etapa('exportacao', formato=formato) as medicao:
+            try:
+                arquivos[formato] = escritor(df, caminho_base)
+                medicao.registrar(linhas=len(df), bytes_saida=os.path.getsize(arquivos[formato]))
+            except Exception as e:
+                print(f"Erro ao exportar em {formato}: {e}")
+                medicao.registrar(erro=str(e))
+        if tempos is not None:
+            tempos[formato] = medicao.segundos
+    return arquivos
@@ -1,38 +1,185 @@
 import pandas as pd
-import requests
+import json
 import os
+from armazena_dados import gravar_dataset
+from cliente_http import baixar_para_arquivo
+from decodifica_json import importar_ijson, ler_registros
+from instrumentacao import etapa
+from concurrent.futures import ThreadPoolExecutor
+
+# URL da API do BCB para séries temporais do SGS
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados"
+
+# Armazenamento local das séries (um Parquet por série)
+PASTA_SERIES = 'dados_bcb'
+
+# A API recusa consultas de séries diárias com mais de 10 anos por requisição
+DIAS_POR_JANELA = 3650
+DATA_INICIAL_PADRAO = '1986-01-01'
+MAX_REQUISICOES_SIMULTANEAS = 8
+
+def caminho_serie(codigo, pasta_series=PASTA_SERIES):
+    """Caminho do arquivo local de uma série SGS"""
+    return os.path.join(pasta_series, f'sgs_{codigo}.parquet')
+
+def ler_serie_local(codigo, pasta_series=PASTA_SERIES):
+    """Lê a série armazenada localmente, ou None se ainda não existir"""
+    caminho = caminho_serie(codigo, pasta_series)
+    if not os.path.exists(caminho):
+        return None
+    return pd.read_parquet(caminho)
+
+def ultima_data_local(codigo, pasta_series=PASTA_SERIES):
+    """Retorna a última data já armazenada para a série, lendo só a coluna de datas"""
+    caminho = caminho_serie(codigo, pasta_series)
+    if not os.path.exists(caminho):
+        return None
+    datas = pd.read_parquet(caminho, columns=['data'])['data']
+    if len(datas) == 0:
+        return None
+    return datas.max()
+
+def dividir_janelas(inicio, fim, dias_por_janela=DIAS_POR_JANELA):
+    """Divide o intervalo [inicio, fim] em janelas aceitas pela API"""
+    janelas = []
+    atual = inicio
+    while atual <= fim:
+        fim_janela = min(atual + pd.Timedelta(days=dias_por_janela - 1), fim)
+        janelas.append((atual, fim_janela))
+        atual = fim_janela + pd.Timedelta(days=1)
+    return janelas
+
+def baixar_janela(codigo, inicio, fim, url_sgs=URL_SGS, pasta_series=PASTA_SERIES):
+    """
+    Baixa uma janela de datas de uma série SGS
+
+    O corpo é gravado em streaming num arquivo temporário da pasta das séries e
+    decodificado de lá, sem passar inteiro pela memória.
+    """
+    params = {
+        'formato': 'json',
+        'dataInicial': inicio.strftime('%d/%m/%Y'),
+        'dataFinal': fim.strftime('%d/%m/%Y')
+    }
+    caminho = os.path.join(pasta_series, f'.sgs_{codigo}_{inicio:%Y%m%d}.json')
+    try:
+        response, total_bytes, _ = baixar_para_arquivo(url_sgs.format(codigo=codigo), caminho, params=params,
+                                                       serie=codigo, inicio=params['dataInicial'])
+
+        # A API responde 404 quando não há observações na janela
+        if response.status_code == 404:
+            return pd.DataFrame(columns=['data', 'valor'])
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro ao acessar a API do BCB (série {codigo}): {response.status_code}")
+
+        with etapa('parse', serie=codigo) as medicao:
+            with open(caminho, 'rb') as f:
+                if importar_ijson() is None:
+                    df = pd.DataFrame(json.load(f), columns=['data', 'valor'])
+                else:
+                    df = ler_registros(f, 'item', ['data', 'valor'])
+            medicao.registrar(linhas=len(df), bytes_entrada=total_bytes)
+        return df
+    finally:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+def atualizar_series(codigos, pasta_series=PASTA_SERIES, data_final=None, url_sgs=URL_SGS):
+    """
+    Busca apenas as datas posteriores às já armazenadas e anexa ao Parquet de cada série
+
+    As janelas de todas as séries são baixadas em paralelo. Uma janela que falha
+    não descarta as demais: cada série grava as janelas baixadas até a primeira
+    falha (as seguintes são pedidas de novo na próxima execução, a partir da
+    última data gravada).
+
+    Retorna um dict código -> erro das séries que não foram atualizadas por completo.
+    """
+    if not os.path.exists(pasta_series):
+        os.makedirs(pasta_series)
+
+    data_final = pd.Timestamp(data_final or pd.Timestamp.today()).normalize()
+
+    tarefas = []
+    for codigo in codigos:
+        ultima = ultima_data_local(codigo, pasta_series)
+        inicio = pd.Timestamp(DATA_INICIAL_PADRAO) if ultima is None else ultima + pd.Timedelta(days=1)
+        for janela in dividir_janelas(inicio, data_final):
+            tarefas.append((codigo, janela[0], janela[1]))
+
+    with ThreadPoolExecutor(max_workers=MAX_REQUISICOES_SIMULTANEAS) as executor:
+        futuros = [executor.submit(baixar_janela, *tarefa, url_sgs=url_sgs, pasta_series=pasta_series)
+                   for tarefa in tarefas]
+
+    # Janelas em ordem cronológica por série; a primeira falha interrompe a série
+    novos_por_codigo = {}
+    falhas = {}
+    for (codigo, inicio, _), futuro in zip(tarefas, futuros):
+        if codigo in falhas:
+            continue
+        try:
+            df_janela = futuro.result()
+        except Exception as e:
+            falhas[codigo] = f"janela a partir de {inicio:%d/%m/%Y}: {e}"
+            print(f"Erro ao baixar a série SGS {codigo} ({falhas[codigo]})")
+            continue
+        if len(df_janela) > 0:
+            novos_por_codigo.setdefault(codigo, []).append(df_janela)
+
+    for codigo, partes in novos_por_codigo.items():
+        novos = pd.concat(partes, ignore_index=True)
+        novos['data'] = pd.to_datetime(novos['data'], format='%d/%m/%Y')
+        novos['valor'] = pd.to_numeric(novos['valor'], errors='coerce')
+
+        existentes = ler_serie_local(codigo, pasta_series)
+        if existentes is not None:
+            novos = pd.concat([existentes, novos], ignore_index=True)
+        novos = novos.drop_duplicates(subset='data', keep='last').sort_values('data').reset_index(drop=True)
+        novos.to_parquet(caminho_serie(codigo, pasta_series), index=False)
+        print(f"Série SGS {codigo}: {sum(len(p) for p in partes)} novas observações")
+    return falhas
+
+def extrair_dados_bcb(codigos=432, pasta_series=PASTA_SERIES, url_sgs=URL_SGS):
+    """
+    Extrai séries temporais do Banco Central do Brasil (SGS)
+
+    Parâmetros:
+    codigos (int ou list): Código de uma série SGS (padrão: taxa Selic - 432) ou lista de códigos
+    pasta_series (str): Pasta do armazenamento local incremental das séries
+    url_sgs (str): Modelo da URL da série, com {codigo} (pode apontar para um servidor local de testes)
+    """
+    lista_codigos = codigos if isinstance(codigos, (list, tuple)) else [codigos]
 
-def extrair_dados_bcb():
-    """Extrai dados econômicos do Banco Central do Brasil"""
-    
-    # URL da API do BCB para séries temporais (exemplo: taxa Selic - 432)
-    url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados?formato=json"
-    
     try:
-        response = requests.get(url)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Converter para DataFrame
-            df = pd.DataFrame(data)
-            
-            # Converter tipos de dados
-            df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y')
-            df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
-            
-            # Adicionar coluna de ano para facilitar agregações
-            df['ano'] = df['data'].dt.year
-            df['mes'] = df['data'].dt.month
-            
-            # Salvar dados
-            df.to_csv('taxa_selic_historica.csv', index=False)
-            print(f"Dados da taxa Selic salvos em 'taxa_selic_historica.csv'")
-            
-            return df
-        else:
-            print(f"Erro ao acessar a API do BCB: {response.status_code}")
+        falhas = atualizar_series(lista_codigos, pasta_series, url_sgs=url_sgs)
+
+        # Séries com falha seguem com o que já está armazenado localmente
+        frames = []
+        for codigo in lista_codigos:
+            df_serie = ler_serie_local(codigo, pasta_series)
+            if df_serie is None:
+                if codigo in falhas:
+                    print(f"Série SGS {codigo} indisponível: sem dados locais")
+                continue
+            if codigo in falhas:
+                print(f"Série SGS {codigo}: usando os dados locais até {df_serie['data'].max():%d/%m/%Y}")
+            if len(lista_codigos) > 1:
+                df_serie.insert(0, 'serie', codigo)
+            frames.append(df_serie)
+
+        if not frames:
+            print("Nenhum dado retornado pela API do BCB")
             return None
+        df = pd.concat(frames, ignore_index=True)
+
+        # Adicionar coluna de ano para facilitar agregações
+        df['ano'] = df['data'].dt.year
+        df['mes'] = df['data'].dt.month
+
+        # Salvar dados no armazenamento colunar
+        gravar_dataset(df, 'taxa_selic' if lista_codigos == [432] else 'series_bcb')
+
+        return df
     except Exception as e:
         print(f"Erro ao processar dados do BCB: {e}")
-        return None 
\ No newline at end of file
+        return None
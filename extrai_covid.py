@@ -1,41 +1,111 @@
 import pandas as pd
 import numpy as np
-import requests
 import os
+from armazena_dados import gravar_dataset
+from cache_http import requisitar_com_cache, carregar_dataframe_cache, salvar_dataframe_cache
+from dados_sinteticos import gerar_dados, SEED_PADRAO
+from instrumentacao import etapa
+import time
 
-def extrair_dados_covid():
-    """Extrai dados de COVID-19 do Brasil.io (baseado em dados do Ministério da Saúde)"""
-    
-    # URL para download dos dados (fonte alternativa já que a API direta requer autenticação)
-    url = "https://data.brasil.io/dataset/covid19/caso.csv.gz"
-    
+# Casos de COVID-19 do Brasil.io (fonte alternativa já que a API direta requer autenticação)
+URL_COVID = "https://data.brasil.io/dataset/covid19/caso.csv.gz"
+
+# Parâmetros do modo streaming
+LINHAS_POR_BLOCO = 200000  # Linhas por bloco na leitura do CSV comprimido
+JANELA_DIAS = 180  # Últimos 6 meses
+
+# Unidades da federação usadas nos dados de exemplo
+ESTADOS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT',
+           'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Tipos explícitos das colunas do caso.csv do Brasil.io (evita inferência por bloco)
+# Contagens com células em branco no arquivo real: inteiros anuláveis
+TIPOS_COVID = {
+    'state': 'object',
+    'city': 'object',
+    'place_type': 'object',
+    'confirmed': 'Int64',
+    'deaths': 'Int64',
+    'order_for_place': 'Int64',
+    'is_last': 'bool',
+    'estimated_population_2019': 'float64',
+    'estimated_population': 'float64',
+    'city_ibge_code': 'float64',
+    'confirmed_per_100k_inhabitants': 'float64',
+    'death_rate': 'float64'
+}
+
+def ler_covid_em_blocos(file_path, janela_dias=JANELA_DIAS, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê o CSV comprimido em blocos e mantém apenas a janela de datas mais recente
+
+    A data máxima é atualizada a cada bloco; blocos já retidos são podados quando
+    ela avança. O pico de memória acompanha o tamanho da janela, não o histórico.
+
+    Registra a etapa 'parse' (descompressão e parse acontecem juntos no read_csv)
+    com as linhas lidas e o tempo gasto no filtro da janela.
+    """
+    colunas = pd.read_csv(file_path, compression='gzip', nrows=0).columns
+    tipos = {col: tipo for col, tipo in TIPOS_COVID.items() if col in colunas}
+    tem_data = 'date' in colunas
+
+    with etapa('parse', fonte='covid19') as medicao:
+        medicao.registrar(bytes_entrada=os.path.getsize(file_path))
+        leitor = pd.read_csv(file_path, compression='gzip', chunksize=linhas_por_bloco,
+                             dtype=tipos, parse_dates=['date'] if tem_data else None)
+
+        if not tem_data:
+            df = pd.concat(list(leitor))
+            medicao.registrar(linhas=len(df))
+            return df
+
+        janela = pd.Timedelta(days=janela_dias)
+        retidos = []
+        data_maxima = None
+        linhas_lidas = 0
+        segundos_filtro = 0.0
+        for bloco in leitor:
+            linhas_lidas += len(bloco)
+            inicio_filtro = time.perf_counter()
+            maxima_bloco = bloco['date'].max()
+            if pd.notna(maxima_bloco) and (data_maxima is None or maxima_bloco > data_maxima):
+                data_maxima = maxima_bloco
+                # Podar blocos anteriores que saíram da janela
+                retidos = [b[b['date'] >= data_maxima - janela] for b in retidos]
+                retidos = [b for b in retidos if len(b) > 0]
+            if data_maxima is not None:
+                bloco = bloco[bloco['date'] >= data_maxima - janela]
+                if len(bloco) > 0:
+                    retidos.append(bloco)
+            segundos_filtro += time.perf_counter() - inicio_filtro
+
+        if not retidos:
+            df = pd.DataFrame({col: pd.Series(dtype=tipos.get(col, 'object')) for col in colunas})
+        else:
+            df = pd.concat(retidos)
+        medicao.registrar(linhas=len(df), linhas_lidas=linhas_lidas, segundos_filtro=segundos_filtro)
+        return df
+
+def extrair_dados_covid(url=URL_COVID):
+    """
+    Extrai dados de COVID-19 do Brasil.io (baseado em dados do Ministério da Saúde)
+
+    Parâmetros:
+    url (str): Endereço do caso.csv.gz (pode apontar para um servidor local de testes)
+    """
     try:
-        # Criar diretório temporário se não existir
-        temp_dir = 'temp'
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-            
-        # Baixar o arquivo
-        file_path = os.path.join(temp_dir, 'covid19_data.csv.gz')
-        response = requests.get(url, stream=True)
+        # Baixar o arquivo em blocos para o cache em disco (GET condicional)
+        response = requisitar_com_cache(url)
         
         if response.status_code == 200:
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Ler arquivo comprimido
-            df = pd.read_csv(file_path, compression='gzip')
+            df = carregar_dataframe_cache(response)
+            if df is None:
+                # Ler arquivo comprimido em blocos, filtrando os últimos 6 meses por bloco
+                df = ler_covid_em_blocos(response.caminho)
+                salvar_dataframe_cache(response, df)
             
-            # Filtrar apenas os últimos 6 meses para reduzir tamanho
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                latest_date = df['date'].max()
-                six_months_ago = latest_date - pd.Timedelta(days=180)
-                df = df[df['date'] >= six_months_ago]
-            
-            # Salvar versão processada
-            df.to_csv('covid19_brasil.csv', index=False)
-            print(f"Dados de COVID-19 salvos em 'covid19_brasil.csv'")
+            # Salvar versão processada, particionada por estado
+            gravar_dataset(df, 'covid19')
             return df
         else:
             print(f"Erro ao baixar dados: {response.status_code}")
@@ -44,37 +114,34 @@ def extrair_dados_covid():
         print(f"Erro ao processar dados de COVID-19: {e}")
         return criar_dados_covid_exemplo()
 
-def criar_dados_covid_exemplo():
-    """Cria dados sintéticos de COVID-19 como exemplo"""
-    import numpy as np
-    
-    # Criar dataset de exemplo
-    np.random.seed(42)
-    
-    # Lista de estados
-    estados = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT',
-               'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
-    
-    # Criar datas para 6 meses
-    dates = pd.date_range(start='2023-06-01', end='2023-12-31')
+def criar_dados_covid_exemplo(num_linhas=None, seed=SEED_PADRAO, linhas_por_bloco=None,
+                              arquivo='covid19_brasil_exemplo.csv'):
+    """
+    Cria dados sintéticos de COVID-19 como exemplo
+
+    Por padrão gera uma linha por estado e dia entre 2023-06-01 e 2023-12-31.
+    Com num_linhas maior, a grade estado x dia se repete (várias notificações
+    por estado e dia), o que permite gerar datasets de carga de qualquer tamanho.
+    Com linhas_por_bloco, grava em blocos e retorna o caminho do arquivo.
+    """
+    datas = pd.date_range(start='2023-06-01', end='2023-12-31')
+    tamanho_grade = len(ESTADOS) * len(datas)
+    if num_linhas is None:
+        num_linhas = tamanho_grade
     
-    # Criar dataframe
-    data = []
-    for state in estados:
-        for date in dates:
-            # Valores fictícios com alguma correlação
-            cases_base = np.random.randint(100, 5000)
-            deaths_base = int(cases_base * np.random.uniform(0.01, 0.05))
-            
-            data.append({
-                'estado': state,
-                'data': date,
-                'casos': cases_base,
-                'obitos': deaths_base,
-                'populacao': np.random.randint(500000, 20000000)
-            })
+    def gerar_bloco(rng, inicio, fim):
+        n = fim - inicio
+        posicao = np.arange(inicio, fim) % tamanho_grade
+        # Valores fictícios com alguma correlação
+        casos = rng.integers(100, 5000, n)
+        return pd.DataFrame({
+            'estado': pd.Categorical.from_codes(posicao // len(datas), ESTADOS),
+            'data': datas[posicao % len(datas)],
+            'casos': casos,
+            'obitos': (casos * rng.uniform(0.01, 0.05, n)).astype(np.int64),
+            'populacao': rng.integers(500000, 20000000, n)
+        })
     
-    df = pd.DataFrame(data)
-    df.to_csv('covid19_brasil_exemplo.csv', index=False)
-    print(f"Dados de exemplo de COVID-19 salvos em 'covid19_brasil_exemplo.csv'")
-    return df 
\ No newline at end of file
+    resultado = gerar_dados(gerar_bloco, num_linhas, arquivo, seed, linhas_por_bloco)
+    print(f"Dados de exemplo de COVID-19 salvos em '{arquivo}'")
+    return resultado
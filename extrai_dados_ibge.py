@@ -1,147 +1,348 @@
 import pandas as pd
 import numpy as np
-import requests
 import os
+from armazena_dados import gravar_dataset, gravar_blocos_dataset, ler_dataset, ler_catalogo
+from cache_http import requisitar_com_cache, carregar_dataframe_cache, salvar_dataframe_cache
+from decodifica_json import importar_ijson, blocos_indicadores_ibge, ler_indicadores_ibge, ler_registros
+from dados_sinteticos import gerar_dados, SEED_PADRAO
+from instrumentacao import etapa
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def extrair_dados_ibge_demograficos():
-    """Extrai dados demográficos do IBGE"""
-    
-    # URL da API do IBGE para dados populacionais
-    url = "https://servicodados.ibge.gov.br/api/v1/projecoes/populacao"
-    response = requests.get(url)
+# URLs da API do IBGE: projeção populacional e PIB dos municípios
+URL_PROJECAO_POPULACAO = "https://servicodados.ibge.gov.br/api/v1/projecoes/populacao"
+URL_PIB_MUNICIPIOS = "https://servicodados.ibge.gov.br/api/v1/pesquisas/indicadores/47001/resultados"
+
+# Vários indicadores e localidades por requisição, com IDs separados por '|'
+URL_INDICADORES = "https://servicodados.ibge.gov.br/api/v1/pesquisas/indicadores/{indicadores}/resultados/{localidades}"
+TAMANHO_MAXIMO_URL = 2000  # Limite seguro para servidores e proxies
+SEPARADOR_IDS = '%7C'  # '|' já codificado, para o tamanho medido ser o que vai na requisição
+MAX_REQUISICOES_SIMULTANEAS = 4
+
+# Indicadores extraídos no modo em lote (dataset indicadores_ibge); acrescente outros IDs da API de pesquisas
+INDICADORES_PADRAO = [47001]
+
+# Lista de municípios dos dados de exemplo (alguns exemplos)
+MUNICIPIOS_EXEMPLO = [
+    {'id': '3550308', 'nome': 'São Paulo'},
+    {'id': '3304557', 'nome': 'Rio de Janeiro'},
+    {'id': '5300108', 'nome': 'Brasília'},
+    {'id': '2927408', 'nome': 'Salvador'},
+    {'id': '3106200', 'nome': 'Belo Horizonte'},
+    {'id': '2304400', 'nome': 'Fortaleza'},
+    {'id': '1302603', 'nome': 'Manaus'},
+    {'id': '2611606', 'nome': 'Recife'},
+    {'id': '5103403', 'nome': 'Cuiabá'},
+    {'id': '4106902', 'nome': 'Curitiba'}
+]
+
+def extrair_dados_ibge_demograficos(url=URL_PROJECAO_POPULACAO):
+    """Extrai dados demográficos do IBGE (url pode apontar para um servidor local de testes)"""
+    response = requisitar_com_cache(url)
     
     if response.status_code == 200:
-        data = response.json()
-        
-        # Criar dataframe com dados de projeção populacional
-        df_projecao = pd.DataFrame({
-            'data': [item['data'] for item in data['projecao']],
-            'populacao': [item['populacao'] for item in data['projecao']],
-            'periodo': [item['periodo'] for item in data['projecao']]
-        })
+        df_projecao = carregar_dataframe_cache(response)
+        if df_projecao is None:
+            with etapa('parse', fonte='demografia') as medicao:
+                # Criar dataframe com dados de projeção populacional
+                if importar_ijson() is None:
+                    data = response.json()
+                    df_projecao = pd.DataFrame({
+                        'data': [item['data'] for item in data['projecao']],
+                        'populacao': [item['populacao'] for item in data['projecao']],
+                        'periodo': [item['periodo'] for item in data['projecao']]
+                    })
+                else:
+                    with open(response.caminho, 'rb') as f:
+                        df_projecao = ler_registros(f, 'projecao.item', ['data', 'populacao', 'periodo'])
+                medicao.registrar(linhas=len(df_projecao), bytes_entrada=os.path.getsize(response.caminho))
+            salvar_dataframe_cache(response, df_projecao)
         
         # Salvar dados
-        df_projecao.to_csv('dados_populacionais_brasil.csv', index=False)
-        print(f"Dados salvos em 'dados_populacionais_brasil.csv'")
+        gravar_dataset(df_projecao, 'demografia')
         return df_projecao
     else:
         print(f"Erro ao acessar a API: {response.status_code}")
         print("Criando dados demográficos de exemplo...")
         return criar_dados_demograficos_exemplo()
 
-def extrair_pib_municipios():
-    """Extrai dados do PIB dos municípios do IBGE"""
-    
-    # URL da API do IBGE para PIB dos municípios
-    url = "https://servicodados.ibge.gov.br/api/v1/pesquisas/indicadores/47001/resultados"
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        
-        # Transformando em dataframe
-        pib_data = []
-        for item in data:
-            indicador = item['indicador']
-            for resultado in item['resultados']:
-                for localidade in resultado['localidades']:
-                    for serie in localidade['series']:
-                        for data_point in serie['serie'].items():
-                            if data_point[1] is not None:  # Verificar se o valor não é nulo
-                                pib_data.append({
-                                    'indicador': indicador,
-                                    'localidade_id': localidade['id'],
-                                    'localidade_nome': localidade['nome'],
-                                    'ano': data_point[0],
-                                    'valor': data_point[1]
-                                })
-        
-        # Criando dataframe
-        df = pd.DataFrame(pib_data)
-        
-        # Salvar para importar na ferramenta de BI
-        df.to_csv('pib_municipios.csv', index=False)
-        print(f"Dados salvos em 'pib_municipios.csv'")
-        return df
-    else:
+def achatar_resultados_indicadores(data):
+    """
+    Converte o JSON de resultados de indicadores do IBGE em formato longo
+
+    Em vez de um dict por ponto, cada série contribui com suas listas de anos e
+    valores; indicador e localidade são expandidos por códigos com np.repeat e
+    os valores nulos são removidos por máscara. O resultado é idêntico ao do
+    laço aninhado original (indicador, localidade_id, localidade_nome, ano, valor).
+    """
+    indicadores, localidade_ids, localidade_nomes, contagens = [], [], [], []
+    anos, valores = [], []
+    for item in data:
+        indicador = item['indicador']
+        for resultado in item['resultados']:
+            for localidade in resultado['localidades']:
+                for serie in localidade['series']:
+                    pontos = serie['serie']
+                    anos.extend(pontos.keys())
+                    valores.extend(pontos.values())
+                    indicadores.append(indicador)
+                    localidade_ids.append(localidade['id'])
+                    localidade_nomes.append(localidade['nome'])
+                    contagens.append(len(pontos))
+
+    if not anos:
+        return pd.DataFrame()
+
+    # Código da série de origem de cada ponto
+    codigos = np.repeat(np.arange(len(contagens)), contagens)
+
+    valores = np.array(valores, dtype=object)
+    validos = np.not_equal(valores, None)
+    if not validos.any():
+        return pd.DataFrame()
+    codigos = codigos[validos]
+
+    df = pd.DataFrame({
+        'indicador': np.array(indicadores, dtype=object)[codigos],
+        'localidade_id': np.array(localidade_ids, dtype=object)[codigos],
+        'localidade_nome': np.array(localidade_nomes, dtype=object)[codigos],
+        'ano': np.array(anos, dtype=object)[validos],
+        'valor': valores[validos]
+    })
+    return df.infer_objects()
+
+def decodificar_indicadores(response):
+    """
+    DataFrame longo de uma resposta da API de indicadores
+
+    Com ijson, o corpo é decodificado do arquivo em cache evento a evento, em blocos
+    (decodifica_json.ler_indicadores_ibge); sem ele, pela árvore de response.json().
+    O resultado é o mesmo nos dois casos.
+    """
+    if importar_ijson() is None:
+        return achatar_resultados_indicadores(response.json())
+    with open(response.caminho, 'rb') as f:
+        return ler_indicadores_ibge(f)
+
+def baixar_indicadores(url, fonte, nome_dataset=None, carregar=True):
+    """
+    Baixa e achata uma resposta da API de indicadores; retorna None se a API não responder 200
+
+    Com nome_dataset, o resultado também é gravado no armazenamento colunar. Com
+    ijson, os blocos decodificados do arquivo em cache vão direto para o lago
+    (gravar_blocos_dataset), sem montar o DataFrame: troca velocidade por memória.
+    Em 1 milhão de linhas (bench_json_streaming.py), decodificar e gravar leva
+    cerca de 2,5x o tempo de json.load mais o achatamento da árvore, com metade do
+    pico de memória (~235 MB contra ~445 MB).
+
+    Com carregar=False, nada é lido de volta: retorna a entrada do dataset no
+    catálogo, para chamadores que só usam o lago (o modo em lote do Executa). Com
+    carregar=True, o DataFrame retornado é lido do lago: a leitura soma tempo e
+    o DataFrame inteiro ao pico (~295 MB, ainda um terço a menos que a árvore).
+    """
+    response = requisitar_com_cache(url)
+    if response.status_code != 200:
         print(f"Erro ao acessar a API: {response.status_code}")
+        return None
+    
+    df = carregar_dataframe_cache(response)
+    if df is None:
+        with etapa('parse', fonte=fonte) as medicao:
+            if nome_dataset is not None and importar_ijson() is not None:
+                try:
+                    with open(response.caminho, 'rb') as f:
+                        gravar_blocos_dataset(blocos_indicadores_ibge(f), nome_dataset)
+                    if not carregar:
+                        entrada = ler_catalogo()[nome_dataset]
+                        medicao.registrar(linhas=entrada['num_registros'],
+                                          bytes_entrada=os.path.getsize(response.caminho))
+                        return entrada
+                    df = ler_dataset(nome_dataset)
+                except ValueError as e:
+                    # Blocos com tipos incompatíveis: decodifica tudo em memória
+                    print(f"Erro ao gravar blocos de '{nome_dataset}': {e}")
+                    df = decodificar_indicadores(response)
+                    gravar_dataset(df, nome_dataset)
+            else:
+                df = decodificar_indicadores(response)
+                if nome_dataset is not None:
+                    gravar_dataset(df, nome_dataset)
+            medicao.registrar(linhas=len(df), bytes_entrada=os.path.getsize(response.caminho))
+        salvar_dataframe_cache(response, df)
+    elif nome_dataset is not None:
+        gravar_dataset(df, nome_dataset)
+    if nome_dataset is not None and not carregar:
+        return ler_catalogo()[nome_dataset]
+    return df
+
+def extrair_pib_municipios(url=URL_PIB_MUNICIPIOS, carregar=True):
+    """
+    Extrai dados do PIB dos municípios do IBGE (url pode apontar para um servidor local de testes)
+
+    Com carregar=False, retorna a entrada do dataset no catálogo do lago em vez do
+    DataFrame (veja baixar_indicadores); os dados de exemplo, usados se a API
+    falhar, são sempre retornados como DataFrame.
+    """
+    # Gravado no armazenamento colunar, particionado por ano
+    df = baixar_indicadores(url, 'pib_municipios', nome_dataset='pib_municipios', carregar=carregar)
+    if df is None:
         print("Criando dados de PIB municipal de exemplo...")
         return criar_dados_pib_exemplo()
+    return df
 
-def criar_dados_demograficos_exemplo():
-    """Cria dados demográficos de exemplo"""
-    import numpy as np
+def montar_lotes(indicadores, localidades=None, url=URL_INDICADORES, tamanho_maximo_url=TAMANHO_MAXIMO_URL):
+    """
+    Agrupa indicadores e localidades em URLs com IDs separados por '|' sem passar do tamanho máximo
+
+    Os indicadores são agrupados primeiro, deixando espaço para ao menos a maior
+    localidade; depois, para cada grupo, as localidades ocupam o espaço restante.
+    Sem localidades, cada lote pede todas as localidades dos seus indicadores.
+    Retorna a lista de URLs.
+    """
+    def agrupar(ids, espaco):
+        grupos, atual = [], []
+        for id_ in ids:
+            if atual and len(SEPARADOR_IDS.join(atual + [id_])) > espaco:
+                grupos.append(atual)
+                atual = []
+            atual.append(id_)
+        if atual:
+            grupos.append(atual)
+        return grupos
     
-    # Criar dataset de exemplo
-    np.random.seed(42)
+    indicadores = [str(indicador) for indicador in indicadores]
+    localidades = [str(localidade) for localidade in localidades] if localidades else []
+    # Espaço para os IDs: o tamanho máximo menos o resto da URL
+    espaco = tamanho_maximo_url - len(url.format(indicadores='', localidades=''))
+    maior_localidade = max(map(len, localidades), default=0)
+    if max(map(len, indicadores)) + maior_localidade > espaco:
+        raise ValueError(f"tamanho_maximo_url ({tamanho_maximo_url}) não comporta nem um indicador e uma localidade")
     
-    # Criar datas para 10 anos
-    anos = range(2010, 2024)
+    lotes = []
+    for grupo_indicadores in agrupar(indicadores, espaco - maior_localidade):
+        parte_indicadores = SEPARADOR_IDS.join(grupo_indicadores)
+        if not localidades:
+            lotes.append(url.format(indicadores=parte_indicadores, localidades='').rstrip('/'))
+            continue
+        for grupo_localidades in agrupar(localidades, espaco - len(parte_indicadores)):
+            lotes.append(url.format(indicadores=parte_indicadores, localidades=SEPARADOR_IDS.join(grupo_localidades)))
+    return lotes
+
+def extrair_indicadores_ibge(indicadores=INDICADORES_PADRAO, localidades=None, url=URL_INDICADORES,
+                             tamanho_maximo_url=TAMANHO_MAXIMO_URL, max_workers=MAX_REQUISICOES_SIMULTANEAS,
+                             nome_dataset='indicadores_ibge'):
+    """
+    Extrai vários indicadores do IBGE para várias localidades em lotes simultâneos
     
-    # Criar dataframe
-    data = []
-    populacao_base = 200000000  # População base em 2010
+    Parâmetros:
+    indicadores (list): IDs dos indicadores (por exemplo [47001, 60029])
+    localidades (list): Filtros de localidade da API: códigos de município ou de UF,
+        ou expressões como 'N6[all]' (todos os municípios) e 'N6[N3[35]]' (municípios de SP);
+        None para o padrão da API
+    url (str): Modelo da URL com {indicadores} e {localidades} (pode apontar para um servidor local de testes)
+    tamanho_maximo_url (int): Tamanho máximo de cada URL
+    max_workers (int): Lotes baixados ao mesmo tempo
+    nome_dataset (str): Nome do dataset no armazenamento colunar
     
-    for ano in anos:
-        # Crescimento populacional com alguma variação
-        crescimento = 1 + np.random.uniform(0.005, 0.015)  # Entre 0.5% e 1.5% de crescimento
-        populacao_base *= crescimento
-        
-        data.append({
-            'data': f'{ano}-07-01',
-            'populacao': int(populacao_base),
-            'periodo': f'{ano}'
-        })
+    Retorna um DataFrame longo com o mesmo esquema de extrair_pib_municipios
+    (indicador, localidade_id, localidade_nome, ano, valor). Se algum lote falhar
+    (erro de conexão ou resposta diferente de 200), retorna os dados de exemplo sem
+    gravar o dataset: os lotes baixados ficam no cache para a próxima execução.
+    """
+    lotes = montar_lotes(indicadores, localidades, url, tamanho_maximo_url)
+    print(f"{len(indicadores)} indicadores em {len(lotes)} requisições")
+    
+    resultados = [None] * len(lotes)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(baixar_indicadores, lote, nome_dataset): i for i, lote in enumerate(lotes)}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:
+                print(f"Erro ao baixar o lote {lotes[i]}: {e}")
     
-    df = pd.DataFrame(data)
-    df.to_csv('dados_populacionais_brasil_exemplo.csv', index=False)
-    print(f"Dados demográficos de exemplo salvos em 'dados_populacionais_brasil_exemplo.csv'")
+    falhas = sum(1 for df in resultados if df is None)
+    if falhas:
+        print(f"{falhas} de {len(lotes)} lotes não foram baixados")
+        print("Criando dados de indicadores de exemplo...")
+        return criar_dados_pib_exemplo()
+    frames = [df for df in resultados if len(df) > 0]
+    if not frames:
+        return pd.DataFrame(columns=['indicador', 'localidade_id', 'localidade_nome', 'ano', 'valor'])
+    
+    # Localidades pedidas em mais de um lote não se repetem no resultado
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(
+        subset=['indicador', 'localidade_id', 'ano'], ignore_index=True)
+    gravar_dataset(df, nome_dataset)
     return df
 
-def criar_dados_pib_exemplo():
-    """Cria dados de PIB municipal de exemplo"""
-    import numpy as np
-    
-    # Criar dataset de exemplo
-    np.random.seed(42)
+def criar_dados_demograficos_exemplo(seed=SEED_PADRAO, arquivo='dados_populacionais_brasil_exemplo.csv'):
+    """Cria dados demográficos de exemplo"""
+    rng = np.random.default_rng(seed)
     
-    # Lista de municípios (alguns exemplos)
-    municipios = [
-        {'id': '3550308', 'nome': 'São Paulo'},
-        {'id': '3304557', 'nome': 'Rio de Janeiro'},
-        {'id': '5300108', 'nome': 'Brasília'},
-        {'id': '2927408', 'nome': 'Salvador'},
-        {'id': '3106200', 'nome': 'Belo Horizonte'},
-        {'id': '2304400', 'nome': 'Fortaleza'},
-        {'id': '1302603', 'nome': 'Manaus'},
-        {'id': '2611606', 'nome': 'Recife'},
-        {'id': '5103403', 'nome': 'Cuiabá'},
-        {'id': '4106902', 'nome': 'Curitiba'}
-    ]
+    # Criar datas para 14 anos
+    anos = np.arange(2010, 2024)
     
-    # Anos
-    anos = range(2010, 2021)
+    # Crescimento populacional com alguma variação, entre 0.5% e 1.5% ao ano
+    populacao_base = 200000000  # População base em 2010
+    crescimento = 1 + rng.uniform(0.005, 0.015, len(anos))
     
-    # Criar dataframe
-    data = []
+    df = pd.DataFrame({
+        'data': [f'{ano}-07-01' for ano in anos],
+        'populacao': (populacao_base * np.cumprod(crescimento)).astype(np.int64),
+        'periodo': anos.astype(str)
+    })
+    df.to_csv(arquivo, index=False)
+    print(f"Dados demográficos de exemplo salvos em '{arquivo}'")
+    return df
+
+def identificar_municipios(indices):
+    """Código e nome de cada município de exemplo; além da lista fixa, municípios fictícios numerados"""
+    ids = (9000000 + pd.Series(indices)).astype(str).to_numpy(dtype=object)
+    nomes = ('Município ' + (pd.Series(indices) + 1).astype(str)).to_numpy(dtype=object)
+    conhecidos = np.flatnonzero(indices < len(MUNICIPIOS_EXEMPLO))
+    for i in conhecidos:
+        ids[i] = MUNICIPIOS_EXEMPLO[indices[i]]['id']
+        nomes[i] = MUNICIPIOS_EXEMPLO[indices[i]]['nome']
+    return ids, nomes
+
+def criar_dados_pib_exemplo(num_linhas=None, seed=SEED_PADRAO, linhas_por_bloco=None,
+                            arquivo='pib_municipios_exemplo.csv'):
+    """
+    Cria dados de PIB municipal de exemplo
+
+    Cada município tem uma linha por ano de 2010 a 2020. Por padrão são os 10
+    municípios de MUNICIPIOS_EXEMPLO; com num_linhas maior, entram municípios
+    fictícios até completar o tamanho pedido. Com linhas_por_bloco, grava em
+    blocos e retorna o caminho do arquivo.
+    """
+    anos = np.arange(2010, 2021)
+    num_anos = len(anos)
+    if num_linhas is None:
+        num_linhas = len(MUNICIPIOS_EXEMPLO) * num_anos
+    if linhas_por_bloco is not None:
+        # Blocos com municípios inteiros, para a série de cada um sair de um só sorteio
+        linhas_por_bloco = max(num_anos, linhas_por_bloco - linhas_por_bloco % num_anos)
     
-    for municipio in municipios:
-        pib_base = np.random.randint(1000000, 100000000)  # PIB base inicial
+    def gerar_bloco(rng, inicio, fim):
+        indices = np.arange(inicio // num_anos, (fim - 1) // num_anos + 1)
+        ids, nomes = identificar_municipios(indices)
         
-        for ano in anos:
-            # Crescimento do PIB com alguma variação
-            crescimento = 1 + np.random.normal(0.03, 0.02)  # Média de 3% com desvio de 2%
-            pib_base *= crescimento
-            
-            data.append({
-                'indicador': 'PIB Municipal',
-                'localidade_id': municipio['id'],
-                'localidade_nome': municipio['nome'],
-                'ano': str(ano),
-                'valor': round(pib_base, 2)
-            })
+        # PIB base inicial e crescimento anual com média de 3% e desvio de 2%
+        pib_base = rng.integers(1000000, 100000000, len(indices))
+        crescimento = 1 + rng.normal(0.03, 0.02, (len(indices), num_anos))
+        valores = np.round(pib_base[:, None] * np.cumprod(crescimento, axis=1), 2)
+        
+        df = pd.DataFrame({
+            'indicador': 'PIB Municipal',
+            'localidade_id': np.repeat(ids, num_anos),
+            'localidade_nome': np.repeat(nomes, num_anos),
+            'ano': np.tile(anos.astype(str), len(indices)).astype(object),
+            'valor': valores.ravel()
+        })
+        # O último bloco pode terminar no meio de um município
+        return df.iloc[:fim - inicio]
     
-    df = pd.DataFrame(data)
-    df.to_csv('pib_municipios_exemplo.csv', index=False)
-    print(f"Dados de PIB municipal de exemplo salvos em 'pib_municipios_exemplo.csv'")
-    return df 
\ No newline at end of file
+    resultado = gerar_dados(gerar_bloco, num_linhas, arquivo, seed, linhas_por_bloco)
+    print(f"Dados de PIB municipal de exemplo salvos em '{arquivo}'")
+    return resultado
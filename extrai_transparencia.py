@@ -1,65 +1,208 @@
 import pandas as pd
 import numpy as np
-import requests
+import json
 import os
+from armazena_dados import gravar_dataset, gravar_e_juntar_blocos
+from cliente_http import requisitar
+from dados_sinteticos import gerar_dados, SEED_PADRAO
+from instrumentacao import etapa
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-def extrair_dados_servidores():
-    """Extrai dados de servidores do Portal da Transparência"""
-    
-    # URL da API do Portal da Transparência (amostra limitada para não sobrecarregar a API)
-    url = "http://api.portaldatransparencia.gov.br/api-de-dados/servidores"
-    
-    # Parâmetros para a consulta
-    params = {
-        "pagina": 1,
-        "tamanhoPagina": 100  # Limitando a 100 registros para exemplo
-    }
-    
-    # Headers necessários (substitua pela sua chave de API se necessário)
+# URL da API do Portal da Transparência
+URL_SERVIDORES = "http://api.portaldatransparencia.gov.br/api-de-dados/servidores"
+
+# Chave de acesso (você precisa se registrar no portal para obter uma chave)
+CHAVE_API = "sua-chave-aqui"
+
+# O portal limita a 90 requisições por minuto em horário comercial
+REQUISICOES_POR_SEGUNDO = 1.5
+MAX_REQUISICOES_SIMULTANEAS = 4
+# Linhas do CSV de preparo lidas por vez ao publicar no lago
+LINHAS_POR_BLOCO_PUBLICACAO = 100000
+
+# Valores sorteados nos dados de exemplo
+ORGAOS_EXEMPLO = ['Ministério da Educação', 'Ministério da Saúde', 'Ministério da Economia',
+                  'Ministério da Defesa', 'Outros']
+CARGOS_EXEMPLO = ['Analista', 'Técnico', 'Especialista', 'Assistente', 'Coordenador']
+
+class LimitadorTaxa:
+    """Limita o número de requisições por segundo compartilhado entre threads"""
+
+    def __init__(self, requisicoes_por_segundo):
+        self.intervalo = 1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        self.proxima = time.monotonic()
+        self.trava = threading.Lock()
+
+    def aguardar(self):
+        with self.trava:
+            agora = time.monotonic()
+            espera = self.proxima - agora
+            self.proxima = max(agora, self.proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+def baixar_pagina(limitador, url, pagina, tamanho_pagina, headers):
+    """Baixa uma página da API (o cliente HTTP repete com backoff exponencial em 429/5xx)"""
+    params = {"pagina": pagina, "tamanhoPagina": tamanho_pagina}
+    response = requisitar(url, params=params, headers=headers, limitador=limitador, pagina=pagina)
+    if response.status_code != 200:
+        raise RuntimeError(f"Erro ao acessar a API na página {pagina}: {response.status_code}")
+    with etapa('parse', fonte='servidores', pagina=pagina) as medicao:
+        dados = response.json()
+        medicao.registrar(linhas=len(dados), bytes_entrada=len(response.content))
+    return dados
+
+def ler_checkpoint(arquivo_checkpoint, url, tamanho_pagina):
+    """Lê o checkpoint de uma extração interrompida com os mesmos parâmetros"""
+    if not os.path.exists(arquivo_checkpoint):
+        return None
+    with open(arquivo_checkpoint) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('url') != url or checkpoint.get('tamanho_pagina') != tamanho_pagina:
+        return None
+    if checkpoint.get('concluido'):
+        return None
+    return checkpoint
+
+def gravar_checkpoint(arquivo_checkpoint, checkpoint):
+    caminho_tmp = arquivo_checkpoint + '.tmp'
+    with open(caminho_tmp, 'w') as f:
+        json.dump(checkpoint, f, indent=4)
+    os.replace(caminho_tmp, arquivo_checkpoint)
+
+def extrair_dados_servidores(url=URL_SERVIDORES, chave_api=CHAVE_API, tamanho_pagina=100,
+                             max_paginas=None, max_workers=MAX_REQUISICOES_SIMULTANEAS,
+                             requisicoes_por_segundo=REQUISICOES_POR_SEGUNDO,
+                             arquivo_saida='servidores_federais.csv',
+                             arquivo_checkpoint='servidores_federais_checkpoint.json'):
+    """
+    Extrai dados de servidores do Portal da Transparência, página a página
+
+    As páginas são baixadas em paralelo pelo cliente HTTP compartilhado e
+    gravadas em ordem no CSV de saída assim que ficam contíguas. O checkpoint
+    guarda a última página gravada, permitindo retomar uma extração interrompida.
+    Se a extração for interrompida, retorna os dados de exemplo e só grava o
+    dataset no armazenamento colunar quando todas as páginas forem extraídas.
+
+    Parâmetros:
+    url (str): Endpoint da API (pode apontar para um servidor local de testes)
+    chave_api (str): Valor do header chave-api-dados
+    tamanho_pagina (int): Registros por página
+    max_paginas (int): Limite de páginas a extrair (None para todas)
+    max_workers (int): Requisições simultâneas
+    requisicoes_por_segundo (float): Limite de taxa compartilhado entre as threads
+    """
     headers = {
         "accept": "*/*",
-        "chave-api-dados": "sua-chave-aqui"  # Você precisa se registrar no portal para obter uma chave
+        "chave-api-dados": chave_api
     }
     
-    try:
-        response = requests.get(url, params=params, headers=headers)
-        
-        if response.status_code == 200:
-            data = response.json()
-            df = pd.DataFrame(data)
-            df.to_csv('servidores_federais.csv', index=False)
-            print(f"Dados salvos em 'servidores_federais.csv'")
-            return df
-        else:
-            print(f"Erro ao acessar a API: {response.status_code}")
-            # Como alternativa, vamos criar dados sintéticos para exemplo
-            return criar_dados_servidores_exemplo()
-    except Exception as e:
-        print(f"Erro ao acessar a API: {e}")
+    checkpoint = ler_checkpoint(arquivo_checkpoint, url, tamanho_pagina)
+    if checkpoint is None or not os.path.exists(arquivo_saida):
+        checkpoint = {'url': url, 'tamanho_pagina': tamanho_pagina, 'ultima_pagina': 0,
+                      'colunas': None, 'concluido': False}
+        if os.path.exists(arquivo_saida):
+            os.remove(arquivo_saida)
+    else:
+        print(f"Retomando extração a partir da página {checkpoint['ultima_pagina'] + 1}")
+
+    limitador = LimitadorTaxa(requisicoes_por_segundo)
+    proxima_pagina = checkpoint['ultima_pagina'] + 1
+    proxima_gravar = proxima_pagina
+    ultima_pagina = max_paginas if max_paginas else float('inf')
+    concluidas = {}
+    erro = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pendentes = {}
+        while pendentes or (erro is None and proxima_pagina <= ultima_pagina):
+            # Manter até max_workers páginas em andamento
+            while erro is None and len(pendentes) < max_workers and proxima_pagina <= ultima_pagina:
+                futuro = executor.submit(baixar_pagina, limitador, url,
+                                         proxima_pagina, tamanho_pagina, headers)
+                pendentes[futuro] = proxima_pagina
+                proxima_pagina += 1
+
+            feitos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                pagina = pendentes.pop(futuro)
+                try:
+                    dados = futuro.result()
+                except Exception as e:
+                    erro = erro or e
+                    continue
+                concluidas[pagina] = dados
+                # Uma página vazia ou incompleta marca o fim do conjunto
+                if len(dados) < tamanho_pagina:
+                    ultima_pagina = min(ultima_pagina, pagina)
+
+            # Gravar as páginas contíguas já concluídas
+            while proxima_gravar in concluidas and proxima_gravar <= ultima_pagina:
+                df_pagina = pd.DataFrame(concluidas.pop(proxima_gravar))
+                if len(df_pagina) > 0:
+                    if checkpoint['colunas'] is None:
+                        checkpoint['colunas'] = list(df_pagina.columns)
+                    df_pagina = df_pagina.reindex(columns=checkpoint['colunas'])
+                    df_pagina.to_csv(arquivo_saida, mode='a', index=False,
+                                     header=not os.path.exists(arquivo_saida))
+                checkpoint['ultima_pagina'] = proxima_gravar
+                gravar_checkpoint(arquivo_checkpoint, checkpoint)
+                proxima_gravar += 1
+
+    if erro is not None:
+        # As páginas já gravadas ficam no CSV e no checkpoint para a próxima execução,
+        # mas um conjunto parcial não é publicado como o dataset de servidores
+        print(f"Erro ao acessar a API: {erro}")
+        print(f"Extração interrompida após a página {checkpoint['ultima_pagina']}; execute novamente para retomar")
+        return criar_dados_servidores_exemplo()
+
+    checkpoint['concluido'] = True
+    gravar_checkpoint(arquivo_checkpoint, checkpoint)
+
+    if not os.path.exists(arquivo_saida):
         # Como alternativa, vamos criar dados sintéticos para exemplo
         return criar_dados_servidores_exemplo()
 
-def criar_dados_servidores_exemplo():
-    """Cria dados sintéticos como exemplo de servidores"""
-    import numpy as np
-    
-    # Criar dataset de exemplo com 1000 servidores
-    np.random.seed(42)
-    n = 1000
+    # O CSV é a área de preparo retomável; o resultado final vai para o armazenamento colunar,
+    # publicado em blocos para não montar o CSV inteiro e sua cópia em Arrow de uma vez
+    print(f"{checkpoint['ultima_pagina']} páginas extraídas em '{arquivo_saida}'")
+    try:
+        return gravar_e_juntar_blocos(pd.read_csv(arquivo_saida, chunksize=LINHAS_POR_BLOCO_PUBLICACAO),
+                                      'servidores')
+    except ValueError as e:
+        # Um bloco inferido com tipos diferentes dos do primeiro (coluna só com nulos, por exemplo)
+        print(f"Publicação em blocos indisponível, gravando o CSV inteiro: {e}")
+        df = pd.read_csv(arquivo_saida)
+        gravar_dataset(df, 'servidores')
+        return df
+
+def criar_dados_servidores_exemplo(num_linhas=1000, seed=SEED_PADRAO, linhas_por_bloco=None,
+                                   arquivo='servidores_federais_exemplo.csv'):
+    """
+    Cria dados sintéticos como exemplo de servidores
+
+    As datas de ingresso são semanais a partir de 2000-01-01 e recomeçam após
+    2023, para qualquer num_linhas. Com linhas_por_bloco, grava em blocos e
+    retorna o caminho do arquivo.
+    """
+    primeiro_ingresso = pd.Timestamp('2000-01-01')
+    num_semanas = (pd.Timestamp('2023-12-31') - primeiro_ingresso).days // 7 + 1
     
-    # Dados sintéticos
-    df = pd.DataFrame({
-        'id': range(1, n+1),
-        'nome': [f'Servidor {i}' for i in range(1, n+1)],
-        'orgao': np.random.choice(['Ministério da Educação', 'Ministério da Saúde', 
-                                  'Ministério da Economia', 'Ministério da Defesa', 
-                                  'Outros'], n),
-        'cargo': np.random.choice(['Analista', 'Técnico', 'Especialista', 
-                                  'Assistente', 'Coordenador'], n),
-        'salario': np.random.normal(8000, 3000, n),
-        'data_ingresso': pd.date_range(start='2000-01-01', periods=n, freq='W')
-    })
+    def gerar_bloco(rng, inicio, fim):
+        n = fim - inicio
+        ids = np.arange(inicio + 1, fim + 1)
+        return pd.DataFrame({
+            'id': ids,
+            'nome': 'Servidor ' + pd.Series(ids).astype(str),
+            # Categorias a partir dos códigos sorteados, sem materializar milhões de strings
+            'orgao': pd.Categorical.from_codes(rng.integers(0, len(ORGAOS_EXEMPLO), n), ORGAOS_EXEMPLO),
+            'cargo': pd.Categorical.from_codes(rng.integers(0, len(CARGOS_EXEMPLO), n), CARGOS_EXEMPLO),
+            'salario': rng.normal(8000, 3000, n),
+            'data_ingresso': primeiro_ingresso + pd.to_timedelta(7 * ((ids - 1) % num_semanas), unit='D')
+        })
     
-    df.to_csv('servidores_federais_exemplo.csv', index=False)
-    print(f"Dados de exemplo salvos em 'servidores_federais_exemplo.csv'")
-    return df 
\ No newline at end of file
+    resultado = gerar_dados(gerar_bloco, num_linhas, arquivo, seed, linhas_por_bloco)
+    print(f"Dados de exemplo salvos em '{arquivo}'")
+    return resultado
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import pickle
+from instrumentacao import etapa
+from concurrent.futures import ProcessPoolExecutor
+
+# Configuração padrão dos gráficos
+DPI_PADRAO = 300
+FORMATO_PADRAO = 'png'  # Qualquer formato aceito pelo matplotlib: 'png', 'svg', 'pdf'...
+ESTILO = 'seaborn-v0_8-whitegrid'
+
+def _desenhar_valores_ausentes(ax, dados):
+    # dados: fração de nulos por bloco de linhas (perfila_dataset.mapa_completude)
+    import seaborn as sns
+    sns.heatmap(dados, vmin=0, vmax=1, yticklabels=False, cmap='viridis', ax=ax,
+                cbar_kws={'label': 'Fração de valores ausentes'})
+    ax.set_ylabel('Blocos de registros')
+
+def _desenhar_histograma(ax, dados):
+    import seaborn as sns
+    sns.histplot(dados, kde=True, ax=ax)
+
+def _desenhar_barras(ax, dados):
+    import seaborn as sns
+    sns.barplot(x=dados.index, y=dados.values, ax=ax)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def _desenhar_correlacao(ax, dados):
+    import numpy as np
+    import seaborn as sns
+    mask = np.triu(np.ones_like(dados, dtype=bool))
+    sns.heatmap(dados, mask=mask, annot=True, cmap='coolwarm', linewidths=.5, ax=ax)
+
+def _desenhar_serie_temporal(ax, dados):
+    dados.plot(ax=ax)
+
+def _desenhar_dispersao(ax, dados):
+    # dados: histograma 2D de calcula_correlacao.agregar_dispersao
+    import numpy as np
+    from matplotlib.colors import LogNorm
+    contagens = np.ma.masked_equal(dados['contagens'].T, 0)
+    malha = ax.pcolormesh(dados['bordas_x'], dados['bordas_y'], contagens, norm=LogNorm(), cmap='viridis')
+    ax.figure.colorbar(malha, ax=ax, label='Registros')
+    ax.set_xlabel(dados['coluna_x'])
+    ax.set_ylabel(dados['coluna_y'])
+
+# Funções de desenho por tipo de gráfico; cada uma recebe o Axes e os dados já agregados
+DESENHISTAS = {
+    'valores_ausentes': _desenhar_valores_ausentes,
+    'histograma': _desenhar_histograma,
+    'barras': _desenhar_barras,
+    'correlacao': _desenhar_correlacao,
+    'serie_temporal': _desenhar_serie_temporal,
+    'dispersao': _desenhar_dispersao
+}
+
+def tarefa_grafico(tipo, arquivo, titulo, dados, figsize=(10, 6), impressao=None):
+    """
+    Descreve um gráfico a ser renderizado: tipo, arquivo de saída (sem extensão), título e dados
+
+    impressao identifica os dados sem precisar percorrê-los de novo (por exemplo
+    pipeline_incremental.impressao_coluna); sem ela, o hash usa os próprios dados.
+    """
+    return {'tipo': tipo, 'arquivo': arquivo, 'titulo': titulo, 'dados': dados, 'figsize': figsize,
+            'impressao': impressao}
+
+def renderizar_tarefa(tarefa, caminho, dpi=DPI_PADRAO, formato=FORMATO_PADRAO):
+    """Renderiza um gráfico com a API orientada a objetos (sem o estado global do pyplot)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.style
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with matplotlib.style.context(ESTILO):
+        fig = Figure(figsize=tarefa['figsize'])
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        DESENHISTAS[tarefa['tipo']](ax, tarefa['dados'])
+        ax.set_title(tarefa['titulo'])
+        fig.tight_layout()
+        fig.savefig(caminho, dpi=dpi, format=formato)
+    return caminho
+
+def _renderizar_com_tratamento(tarefa, caminho, dpi, formato):
+    # Retorna (caminho ou None em caso de erro, segundos gastos)
+    gerado = None
+    with etapa('grafico', arquivo=tarefa['arquivo'], tipo=tarefa['tipo']) as medicao:
+        try:
+            gerado = renderizar_tarefa(tarefa, caminho, dpi, formato)
+            medicao.registrar(bytes_saida=os.path.getsize(caminho))
+        except Exception as e:
+            print(f"Erro ao gerar o gráfico {os.path.basename(caminho)}: {e}")
+            medicao.registrar(erro=str(e))
+    return gerado, medicao.segundos
+
+def impressao_dados(dados):
+    """Impressão dos dados de um gráfico: hashes vetorizados para objetos do pandas, pickle para os demais"""
+    import pandas as pd
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(dados, (pd.Series, pd.DataFrame)):
+        # O índice entra no hash: rótulos das barras, meses da série temporal, colunas da correlação
+        colunas = dados.columns if isinstance(dados, pd.DataFrame) else [dados.name]
+        digest.update(json.dumps([str(col) for col in colunas] + [str(dados.index.dtype)]).encode())
+        digest.update(pd.util.hash_pandas_object(dados, index=True).to_numpy().tobytes())
+    else:
+        digest.update(pickle.dumps(dados))
+    return digest.hexdigest()
+
+def hash_tarefa(tarefa, dpi, formato):
+    """Hash da impressão dos dados e dos parâmetros do gráfico, usado para pular gráficos inalterados"""
+    impressao = tarefa.get('impressao') or impressao_dados(tarefa['dados'])
+    parametros = [tarefa['tipo'], tarefa['arquivo'], tarefa['titulo'], list(tarefa['figsize']), impressao,
+                  dpi, formato]
+    return hashlib.sha256(json.dumps(parametros, default=str).encode()).hexdigest()
+
+def renderizar_graficos(tarefas, pasta_output, dpi=DPI_PADRAO, formato=FORMATO_PADRAO,
+                        max_processos=None, pular_inalterados=True, arquivo_hashes=None, tempos=None):
+    """
+    Renderiza uma lista de gráficos em um pool de processos com backend Agg
+
+    Parâmetros:
+    tarefas (list): Gráficos criados com tarefa_grafico
+    pasta_output (str): Pasta onde os arquivos serão salvos
+    dpi (int): Resolução dos arquivos raster
+    formato (str): Formato de saída ('png', 'svg', ...)
+    max_processos (int): Processos do pool (1 renderiza no processo atual)
+    pular_inalterados (bool): Não renderiza gráficos cujo hash dos dados não mudou desde a última execução
+    arquivo_hashes (str): Manifesto dos hashes (padrão: .graficos_hash.json na pasta de saída); datasets
+        processados em paralelo na mesma pasta devem usar um manifesto cada
+    tempos (dict): Se informado, recebe os segundos de renderização de cada gráfico renderizado
+
+    Retorna a lista de arquivos gerados ou mantidos.
+    """
+    from pipeline_incremental import ler_manifesto, gravar_manifesto
+
+    arquivo_hashes = arquivo_hashes or os.path.join(pasta_output, '.graficos_hash.json')
+    # Um manifesto ilegível (gravação interrompida) só faz os gráficos serem renderizados de novo
+    hashes = ler_manifesto(arquivo_hashes) if pular_inalterados else {}
+
+    pendentes = []
+    arquivos = []
+    for tarefa in tarefas:
+        caminho = os.path.join(pasta_output, f"{tarefa['arquivo']}.{formato}")
+        hash_atual = hash_tarefa(tarefa, dpi, formato)
+        if pular_inalterados and hashes.get(caminho) == hash_atual and os.path.exists(caminho):
+            arquivos.append(caminho)
+            continue
+        pendentes.append((tarefa, caminho, hash_atual))
+
+    if max_processos is None:
+        max_processos = min(len(pendentes), os.cpu_count() or 1)
+
+    if max_processos <= 1:
+        resultados = [_renderizar_com_tratamento(t, c, dpi, formato) for t, c, _ in pendentes]
+    else:
+        with ProcessPoolExecutor(max_workers=max_processos) as executor:
+            futuros = [executor.submit(_renderizar_com_tratamento, t, c, dpi, formato) for t, c, _ in pendentes]
+            resultados = [futuro.result() for futuro in futuros]
+    gerados = [gerado for gerado, _ in resultados]
+    if tempos is not None:
+        for (tarefa, _, _), (_, duracao) in zip(pendentes, resultados):
+            tempos[tarefa['arquivo']] = duracao
+
+    for (_, caminho, hash_atual), gerado in zip(pendentes, gerados):
+        if gerado is not None:
+            hashes[caminho] = hash_atual
+            arquivos.append(caminho)
+
+    if pular_inalterados:
+        gravar_manifesto(arquivo_hashes, hashes)
+
+    renderizados = sum(1 for gerado in gerados if gerado is not None)
+    print(f"Gráficos: {renderizados} renderizados, {len(tarefas) - len(pendentes)} inalterados")
+    return arquivos
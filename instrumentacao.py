@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Configuração herdada pelos processos filhos (pools de caracterização e de gráficos) via ambiente
+VARIAVEL_ARQUIVO = 'INSTRUMENTACAO_ARQUIVO'
+VARIAVEL_PERFILAR = 'INSTRUMENTACAO_PERFILAR'
+VARIAVEL_PERFILADOR = 'INSTRUMENTACAO_PERFILADOR'
+
+ARQUIVO_METRICAS = 'metricas_execucao.jsonl'
+ARQUIVO_RELATORIO = 'relatorio_etapas.json'
+
+_trava = threading.Lock()
+_local = threading.local()
+_medicoes = []
+
+def memoria_rss_mb():
+    """Memória residente atual do processo (Linux: /proc/self/statm; demais: pico via resource)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Medicao:
+    """Dados de uma etapa; o código instrumentado informa linhas e bytes com registrar()"""
+
+    def __init__(self, nome, caminho, atributos):
+        self.nome = nome
+        self.caminho = caminho
+        self.atributos = dict(atributos)
+        self.linhas = None
+        self.bytes_entrada = None
+        self.bytes_saida = None
+        self.segundos = None
+
+    def registrar(self, linhas=None, bytes_entrada=None, bytes_saida=None, **atributos):
+        if linhas is not None:
+            self.linhas = int(linhas)
+        if bytes_entrada is not None:
+            self.bytes_entrada = int(bytes_entrada)
+        if bytes_saida is not None:
+            self.bytes_saida = int(bytes_saida)
+        self.atributos.update(atributos)
+
+def configurar_instrumentacao(pasta_output='output', arquivo=ARQUIVO_METRICAS, perfilar=(), perfilador='cprofile'):
+    """
+    Liga a gravação das etapas em JSON lines e, opcionalmente, o perfilamento de algumas delas
+
+    Parâmetros:
+    pasta_output (str): Pasta do arquivo de métricas e dos perfis
+    arquivo (str): Nome do arquivo JSON lines (None para só manter as etapas em memória)
+    perfilar (iterable): Nomes das etapas a perfilar ('*' para todas)
+    perfilador (str): 'cprofile' (.prof, para pstats/snakeviz) ou 'pyinstrument' (.html), se instalado
+    """
+    if not os.path.exists(pasta_output):
+        os.makedirs(pasta_output)
+    if arquivo:
+        caminho = os.path.abspath(os.path.join(pasta_output, arquivo))
+        # Cada execução começa um arquivo novo
+        open(caminho, 'w').close()
+        os.environ[VARIAVEL_ARQUIVO] = caminho
+    else:
+        os.environ.pop(VARIAVEL_ARQUIVO, None)
+    os.environ[VARIAVEL_PERFILAR] = ','.join(perfilar)
+    os.environ[VARIAVEL_PERFILADOR] = perfilador
+
+def _etapas_perfiladas():
+    return {nome for nome in os.environ.get(VARIAVEL_PERFILAR, '').split(',') if nome}
+
+@contextmanager
+def _perfilar(nome, caminho):
+    # Perfila o bloco com cProfile ou pyinstrument e grava o resultado ao lado do arquivo de métricas
+    arquivo = os.environ.get(VARIAVEL_ARQUIVO)
+    pasta = os.path.dirname(arquivo) if arquivo else os.path.abspath('output')
+    base = os.path.join(pasta, f"perfil_{caminho.replace('/', '.')}_{os.getpid()}_{int(time.time() * 1000)}")
+    if os.environ.get(VARIAVEL_PERFILADOR) == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument não encontrado. Tente instalar com: pip install pyinstrument (usando cProfile)")
+        else:
+            perfilador = Profiler()
+            perfilador.start()
+            try:
+                yield
+            finally:
+                perfilador.stop()
+                with open(base + '.html', 'w') as f:
+                    f.write(perfilador.output_html())
+            return
+
+    import cProfile
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield
+    finally:
+        perfilador.disable()
+        perfilador.dump_stats(base + '.prof')
+
+def _emitir(registro):
+    arquivo = os.environ.get(VARIAVEL_ARQUIVO)
+    with _trava:
+        _medicoes.append(registro)
+        if arquivo:
+            with open(arquivo, 'a') as f:
+                f.write(json.dumps(registro, default=str) + '\n')
+
+@contextmanager
+def etapa(nome, **atributos):
+    """
+    Mede uma etapa: duração, variação de memória residente e, se informados, linhas e bytes
+
+    Uso:
+        with etapa('parse', fonte='ibge') as medicao:
+            df = ...
+            medicao.registrar(linhas=len(df), bytes_entrada=tamanho)
+
+    Etapas aninhadas na mesma thread ganham o caminho da etapa externa ('extracao/parse').
+    """
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    caminho = '/'.join(pilha + [nome])
+    medicao = Medicao(nome, caminho, atributos)
+
+    perfilar = _etapas_perfiladas()
+    perfilador = _perfilar(nome, caminho) if '*' in perfilar or nome in perfilar else None
+
+    pilha.append(nome)
+    memoria_inicial = memoria_rss_mb()
+    inicio_relogio = time.time()
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        if perfilador is not None:
+            with perfilador:
+                yield medicao
+        else:
+            yield medicao
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        medicao.segundos = time.perf_counter() - inicio
+        pilha.pop()
+        _emitir({
+            'etapa': nome,
+            'caminho': caminho,
+            'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(inicio_relogio)),
+            'segundos': medicao.segundos,
+            'linhas': medicao.linhas,
+            'bytes_entrada': medicao.bytes_entrada,
+            'bytes_saida': medicao.bytes_saida,
+            'memoria_delta_mb': memoria_rss_mb() - memoria_inicial,
+            'pid': os.getpid(),
+            'atributos': medicao.atributos,
+            'erro': erro
+        })
+
+def instrumentar(nome=None, **atributos):
+    """Decorador que mede cada chamada da função como uma etapa (padrão: o nome da função)"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with etapa(nome or funcao.__name__, **atributos):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def medicoes():
+    """Etapas registradas por este processo (as dos processos filhos ficam só no arquivo de métricas)"""
+    with _trava:
+        return list(_medicoes)
+
+def ler_medicoes(arquivo):
+    """Lê as etapas gravadas em JSON lines, de todos os processos"""
+    with open(arquivo) as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+def resumir_medicoes(registros):
+    """Totais por caminho de etapa: chamadas, segundos, linhas, bytes, maior variação de memória e erros"""
+    resumo = {}
+    for registro in registros:
+        total = resumo.setdefault(registro['caminho'], {
+            'chamadas': 0, 'segundos': 0.0, 'linhas': 0, 'bytes_entrada': 0, 'bytes_saida': 0,
+            'maior_memoria_delta_mb': 0.0, 'erros': 0
+        })
+        total['chamadas'] += 1
+        total['segundos'] += registro['segundos']
+        for campo in ('linhas', 'bytes_entrada', 'bytes_saida'):
+            total[campo] += registro[campo] or 0
+        total['maior_memoria_delta_mb'] = max(total['maior_memoria_delta_mb'], registro['memoria_delta_mb'])
+        total['erros'] += 1 if registro['erro'] else 0
+    return dict(sorted(resumo.items(), key=lambda item: item[1]['segundos'], reverse=True))
+
+def gravar_relatorio(pasta_output='output', arquivo=ARQUIVO_RELATORIO):
+    """Grava o resumo das etapas (do arquivo de métricas, se configurado, ou da memória) e o retorna"""
+    arquivo_metricas = os.environ.get(VARIAVEL_ARQUIVO)
+    registros = ler_medicoes(arquivo_metricas) if arquivo_metricas and os.path.exists(arquivo_metricas) else medicoes()
+    resumo = resumir_medicoes(registros)
+    with open(os.path.join(pasta_output, arquivo), 'w') as f:
+        json.dump(resumo, f, indent=4)
+    return resumo
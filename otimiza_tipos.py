@@ -0,0 +1,88 @@
+import pandas as pd
+import numpy as np
+from perfila_dataset import detectar_colunas_data
+
+# Colunas de texto com até esta fração de valores distintos viram categorias
+LIMITE_CARDINALIDADE_CATEGORICA = 0.5
+
+# Nomes de colunas de ano que os extratores entregam como texto
+COLUNAS_ANO = ('ano', 'year', 'periodo')
+
+def _sem_novos_nulos(original, convertida):
+    """A conversão é segura se não transformou nenhum valor presente em nulo"""
+    return int(convertida.isna().sum()) == int(original.isna().sum())
+
+def _compactar_texto(serie, nome, limite_categorias):
+    # Datas: converter uma única vez para datetime
+    if nome in detectar_colunas_data(serie.to_frame()):
+        convertida = pd.to_datetime(serie, errors='coerce')
+        if _sem_novos_nulos(serie, convertida):
+            return convertida
+
+    # Anos em texto ('2010'): converter para inteiro
+    if nome.lower() in COLUNAS_ANO:
+        convertida = pd.to_numeric(serie, errors='coerce')
+        if _sem_novos_nulos(serie, convertida):
+            return _compactar_numero(convertida)
+
+    # Texto repetido: categoria
+    if len(serie) > 0 and serie.nunique() <= len(serie) * limite_categorias:
+        return serie.astype('category')
+    return serie
+
+def _compactar_numero(serie):
+    if pd.api.types.is_integer_dtype(serie):
+        return pd.to_numeric(serie, downcast='integer')
+    if pd.api.types.is_float_dtype(serie):
+        valores = serie.to_numpy()
+        # Floats sem nulos e sem parte fracionária viram inteiro
+        if (len(valores) > 0 and not np.isnan(valores).any() and np.array_equal(valores, np.round(valores))
+                and np.abs(valores).max() < 2 ** 53):
+            return pd.to_numeric(serie.astype('int64'), downcast='integer')
+        # float32 apenas se nenhum valor mudar
+        reduzida = valores.astype(np.float32)
+        if np.array_equal(reduzida.astype(valores.dtype), valores, equal_nan=True):
+            return pd.Series(reduzida, index=serie.index, name=serie.name)
+    return serie
+
+def compactar_tipos(df, limite_categorias=LIMITE_CARDINALIDADE_CATEGORICA, verbose=True):
+    """
+    Reduz a memória do DataFrame extraído sem perder informação
+
+    Texto com poucos valores distintos vira categoria, colunas de data são
+    convertidas para datetime e anos em texto para inteiro; inteiros e floats
+    são reduzidos ao menor tipo que representa todos os valores.
+
+    Retorna (DataFrame compactado, relatório) com o tipo de cada coluna alterada
+    e a memória antes e depois, em bytes.
+    """
+    memoria_antes = int(df.memory_usage(deep=True).sum())
+    colunas = {}
+    alteracoes = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_bool_dtype(serie) or isinstance(serie.dtype, pd.CategoricalDtype):
+            nova = serie
+        elif pd.api.types.is_numeric_dtype(serie):
+            nova = _compactar_numero(serie)
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            nova = _compactar_texto(serie, str(col), limite_categorias)
+        else:
+            nova = serie
+        if nova.dtype != serie.dtype:
+            alteracoes[col] = (str(serie.dtype), str(nova.dtype))
+        colunas[col] = nova
+
+    compactado = pd.DataFrame(colunas, index=df.index)
+    memoria_depois = int(compactado.memory_usage(deep=True).sum())
+    relatorio = {
+        'memoria_antes': memoria_antes,
+        'memoria_depois': memoria_depois,
+        'alteracoes': alteracoes
+    }
+
+    if verbose:
+        reducao = memoria_antes / memoria_depois if memoria_depois else float('inf')
+        print(f"Tipos compactados: {memoria_antes / 1024 ** 2:.1f} MB -> "
+              f"{memoria_depois / 1024 ** 2:.1f} MB ({reducao:.1f}x menor)")
+    return compactado, relatorio
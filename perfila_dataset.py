@@ -0,0 +1,96 @@
+import pandas as pd
+import numpy as np
+
+# Colunas não numéricas com até este número de categorias têm a contagem completa guardada
+LIMITE_CATEGORIAS = 30
+BLOCOS_COMPLETUDE = 200  # Linhas do mapa de completude, independente do tamanho do dataset
+
+def detectar_colunas_data(df):
+    """Colunas de data: pelo nome ('data'/'date') ou pelo tipo datetime"""
+    return [col for col in df.columns
+            if 'data' in col.lower() or 'date' in col.lower() or pd.api.types.is_datetime64_any_dtype(df[col])]
+
+def estatisticas_numericas(df_numerico):
+    """Equivalente a describe().transpose(), calculado de forma vetorizada sobre todas as colunas"""
+    agregados = df_numerico.agg(['count', 'mean', 'std', 'min', 'max']).transpose()
+    quantis = df_numerico.quantile([0.25, 0.5, 0.75]).transpose()
+    quantis.columns = ['25%', '50%', '75%']
+    estatisticas = pd.concat([agregados, quantis], axis=1)
+    estatisticas['count'] = estatisticas['count'].astype(float)
+    return estatisticas[['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']]
+
+def calcular_perfil(df, limite_categorias=LIMITE_CATEGORIAS):
+    """
+    Calcula de uma vez o perfil do dataset usado pelos arquivos de saída e pelos gráficos
+
+    Retorna um dict com contagem de nulos (um único isna() sobre o DataFrame),
+    estatísticas numéricas, cardinalidade e contagem de categorias. Cada coluna
+    não numérica passa por um único value_counts, do qual saem tanto a
+    cardinalidade quanto as categorias mais frequentes.
+    """
+    nulos = df.isna().sum()
+    num_registros = len(df)
+
+    colunas_numericas = df.select_dtypes(include=['number']).columns
+    colunas_categoricas = df.select_dtypes(exclude=['number']).columns
+
+    estatisticas = None
+    if len(colunas_numericas) > 0:
+        estatisticas = estatisticas_numericas(df[colunas_numericas])
+
+    cardinalidade = {}
+    contagem_categorias = {}
+    for col in colunas_categoricas:
+        contagens = df[col].value_counts()
+        contagens = contagens[contagens > 0]  # Categorias sem ocorrência em colunas 'category'
+        cardinalidade[col] = len(contagens)
+        if len(contagens) <= limite_categorias:
+            contagem_categorias[col] = contagens
+
+    return {
+        'num_registros': num_registros,
+        'num_colunas': len(df.columns),
+        'colunas': list(df.columns),
+        'tipos_dados': {col: str(dtype) for col, dtype in df.dtypes.items()},
+        'valores_nulos': nulos,
+        'percentual_nulos': nulos / num_registros * 100 if num_registros else nulos.astype(float) * np.nan,
+        'colunas_numericas': colunas_numericas,
+        'colunas_categoricas': colunas_categoricas,
+        'colunas_data': detectar_colunas_data(df),
+        'estatisticas': estatisticas,
+        'cardinalidade': cardinalidade,
+        'contagem_categorias': contagem_categorias
+    }
+
+def mapa_completude(df, num_blocos=BLOCOS_COMPLETUDE):
+    """
+    Fração de valores ausentes por bloco de linhas e coluna
+
+    As linhas são divididas em até `num_blocos` faixas contíguas; para cada coluna
+    a máscara de nulos é somada por faixa com np.add.reduceat. O resultado tem
+    tamanho fixo (blocos x colunas), qualquer que seja o número de registros.
+    """
+    num_registros = len(df)
+    num_blocos = max(1, min(num_blocos, num_registros))
+    inicios = np.linspace(0, num_registros, num_blocos + 1).astype(np.int64)[:-1]
+    tamanhos = np.diff(np.append(inicios, num_registros))
+
+    fracoes = {}
+    for col in df.columns:
+        nulos = df[col].isna().to_numpy()
+        if num_registros == 0:
+            fracoes[col] = np.zeros(num_blocos)
+        else:
+            fracoes[col] = np.add.reduceat(nulos, inicios, dtype=np.int64) / tamanhos
+    return pd.DataFrame(fracoes, index=pd.Index(inicios, name='linha_inicial'))
+
+def perfil_para_info(perfil):
+    """Converte o perfil no dict gravado em {nome}_info.json"""
+    return {
+        'num_registros': perfil['num_registros'],
+        'num_colunas': perfil['num_colunas'],
+        'colunas': perfil['colunas'],
+        'tipos_dados': perfil['tipos_dados'],
+        'valores_nulos': {col: int(v) for col, v in perfil['valores_nulos'].items()},
+        'percentual_nulos': {col: float(v) for col, v in perfil['percentual_nulos'].items()}
+    }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Manifesto de cada dataset na pasta de saída: impressão digital e arquivos de cada etapa
+PREFIXO_MANIFESTO = '.manifesto_'
+
+def hashes_linhas(df):
+    """Hash de 64 bits de cada linha (vetorizado, sem o índice)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def impressao_digital(df, hashes=None):
+    """
+    Impressão digital rápida do conteúdo do DataFrame: colunas, tipos e valores, na ordem das linhas
+
+    Parâmetros:
+    hashes (ndarray): Hashes das linhas já calculados com hashes_linhas, para não repetir o cálculo
+    """
+    if hashes is None:
+        hashes = hashes_linhas(df)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([(str(col), str(tipo)) for col, tipo in df.dtypes.items()]).encode())
+    digest.update(np.ascontiguousarray(hashes).tobytes())
+    return digest.hexdigest()
+
+def impressoes_particoes(hashes, particoes):
+    """
+    Impressão digital de cada partição (por exemplo o mês de uma coluna de data)
+
+    A soma dos hashes das linhas não depende da ordem: anexar dias ao fim do dataset
+    só muda a impressão das partições que receberam linhas novas.
+    Retorna um dict partição (str) -> impressão.
+    """
+    hashes = pd.Series(hashes, index=particoes.index)
+    misturados = (hashes ^ (hashes >> np.uint64(31))) * np.uint64(0x9E3779B97F4A7C15)
+    tamanhos = hashes.groupby(particoes, dropna=False).size()
+    somas = hashes.groupby(particoes, dropna=False).sum()
+    somas_misturadas = misturados.groupby(particoes, dropna=False).sum()
+    return {str(particao): f'{tamanho}-{int(soma):x}-{int(soma_misturada):x}'
+            for particao, tamanho, soma, soma_misturada
+            in zip(tamanhos.index, tamanhos.to_numpy(), somas.to_numpy(), somas_misturadas.to_numpy())}
+
+def impressao_coluna(serie):
+    """
+    Impressão digital de uma coluna que não depende da ordem das linhas (tipo, tamanho e soma dos hashes)
+
+    Identifica os dados de um gráfico sem serializá-los, por exemplo a coluna de um histograma.
+    """
+    hashes = pd.util.hash_pandas_object(serie, index=False).to_numpy()
+    misturados = (hashes ^ (hashes >> np.uint64(31))) * np.uint64(0x9E3779B97F4A7C15)
+    return f'{serie.dtype}-{len(hashes)}-{int(hashes.sum()):x}-{int(misturados.sum()):x}'
+
+def impressao_parametros(*partes):
+    """Impressão digital de valores serializáveis em JSON (parâmetros, impressões de dependências)"""
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.blake2b(texto.encode(), digest_size=16).hexdigest()
+
+def caminho_manifesto(pasta_output, nome_dataset):
+    return os.path.join(pasta_output, f'{PREFIXO_MANIFESTO}{nome_dataset}.json')
+
+def ler_manifesto(arquivo):
+    """Lê o manifesto de etapas; um arquivo ausente ou corrompido equivale a um manifesto vazio"""
+    if not os.path.exists(arquivo):
+        return {}
+    try:
+        with open(arquivo) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def gravar_manifesto(arquivo, manifesto):
+    caminho_tmp = arquivo + '.tmp'
+    with open(caminho_tmp, 'w') as f:
+        json.dump(manifesto, f, indent=4)
+    os.replace(caminho_tmp, arquivo)
+
+def executar_grafo(etapas, entradas, arquivo_manifesto, impressoes=None, forcar=False):
+    """
+    Executa um grafo de etapas, pulando as que já rodaram com as mesmas entradas e parâmetros
+
+    Parâmetros:
+    etapas (dict): nome -> {'funcao', 'depende_de' (nomes de entradas ou etapas),
+        'parametros' (opcional), 'gera_arquivos' (opcional)}. A função recebe os
+        resultados das dependências como argumentos nomeados.
+    entradas (dict): nome -> valor das entradas do grafo (por exemplo o DataFrame)
+    arquivo_manifesto (str): JSON com a impressão digital e os arquivos de cada etapa
+    impressoes (dict): Impressões digitais já calculadas das entradas (as demais são calculadas aqui)
+    forcar (bool): Executa todas as etapas, ignorando o manifesto
+
+    A impressão de uma etapa combina seus parâmetros com as impressões das
+    dependências. Etapas com gera_arquivos retornam a lista de arquivos gravados
+    (None se falharam) e são puladas quando a impressão é a do manifesto e os
+    arquivos existem. As demais só produzem resultados em memória e rodam apenas
+    se alguma etapa que depende delas precisar rodar.
+
+    Retorna (resultados, executadas): resultados das etapas executadas e a lista de seus nomes.
+    """
+    impressoes = dict(impressoes or {})
+    for nome, valor in entradas.items():
+        if nome not in impressoes:
+            impressoes[nome] = (impressao_digital(valor) if isinstance(valor, pd.DataFrame)
+                                else impressao_parametros(valor))
+    for nome, definicao in etapas.items():
+        impressoes[nome] = impressao_parametros(nome, definicao.get('parametros'),
+                                                [impressoes[dep] for dep in definicao.get('depende_de', ())])
+
+    manifesto = ler_manifesto(arquivo_manifesto)
+    resultados = dict(entradas)
+    executadas = []
+
+    def obter(nome):
+        if nome in resultados:
+            return resultados[nome]
+        definicao = etapas[nome]
+        argumentos = {dep: obter(dep) for dep in definicao.get('depende_de', ())}
+        resultados[nome] = definicao['funcao'](**argumentos)
+        executadas.append(nome)
+        return resultados[nome]
+
+    for nome, definicao in etapas.items():
+        if not definicao.get('gera_arquivos'):
+            continue
+        registro = manifesto.get(nome, {})
+        atualizada = (not forcar and registro.get('impressao') == impressoes[nome]
+                      and all(os.path.exists(arquivo) for arquivo in registro.get('arquivos', [])))
+        if atualizada:
+            continue
+        arquivos = obter(nome)
+        if arquivos is None:
+            # Etapa que falhou: sai do manifesto para rodar de novo na próxima execução
+            manifesto.pop(nome, None)
+        else:
+            manifesto[nome] = {'impressao': impressoes[nome], 'arquivos': sorted(arquivos)}
+        # Gravado a cada etapa: uma falha no meio não perde o que já foi concluído
+        gravar_manifesto(arquivo_manifesto, manifesto)
+
+    puladas = [nome for nome, definicao in etapas.items()
+               if definicao.get('gera_arquivos') and nome not in executadas]
+    if puladas:
+        print(f"Etapas inalteradas desde a última execução: {', '.join(puladas)}")
+    return resultados, executadas